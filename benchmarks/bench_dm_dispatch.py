@@ -0,0 +1,83 @@
+# party_bot/benchmarks/bench_dm_dispatch.py
+
+# Koszt obsługi jednego zdarzenia DM w zależności od liczby otwartych rozmów:
+# bot.wait_for (predykat każdej rozmowy sprawdzany przy każdym zdarzeniu)
+# kontra DmConversationDispatcher (jeden odczyt ze słownika).
+# Uruchamianie z katalogu głównego bota (potrzebny config.py):
+#     python -m benchmarks.bench_dm_dispatch
+
+import asyncio
+import time
+
+import disnake
+
+from cogs.party_conversations import DmConversationDispatcher
+
+FLOW_COUNTS = [10, 100, 1_000, 5_000]
+EVENTS = 2_000
+USER_BASE = 1_000_000
+CHANNEL_BASE = 5_000_000
+
+
+class FakeMessage:
+    __slots__ = ("author", "channel", "guild", "content")
+
+    def __init__(self, user_id: int, channel_id: int):
+        self.author = disnake.Object(user_id)
+        self.channel = disnake.Object(channel_id)
+        self.guild = None
+        self.content = "nazwa"
+
+
+def events_from_outside_flows(count: int) -> list[FakeMessage]:
+    # Zdarzenia od użytkowników bez otwartej rozmowy - najczęstszy przypadek, a zarazem najdroższy dla wait_for
+    return [FakeMessage(9_000_000 + i, 9_500_000 + i) for i in range(count)]
+
+
+async def bench_wait_for(flows: int) -> float:
+    client = disnake.Client()
+    waiters = []
+    for i in range(flows):
+        user_id, channel_id = USER_BASE + i, CHANNEL_BASE + i
+
+        def check(message, user_id=user_id, channel_id=channel_id):
+            return message.author.id == user_id and message.channel.id == channel_id
+
+        waiters.append(asyncio.ensure_future(client.wait_for("message", check=check, timeout=600)))
+    await asyncio.sleep(0)
+    events = events_from_outside_flows(EVENTS)
+    started = time.perf_counter()
+    for event in events:
+        client.dispatch("message", event)
+    elapsed = time.perf_counter() - started
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    return elapsed / EVENTS
+
+
+async def bench_dispatcher(flows: int) -> float:
+    dispatcher = DmConversationDispatcher()
+    waiters = [asyncio.ensure_future(dispatcher.wait_for_message(USER_BASE + i, CHANNEL_BASE + i, timeout=600))
+               for i in range(flows)]
+    await asyncio.sleep(0)
+    events = events_from_outside_flows(EVENTS)
+    started = time.perf_counter()
+    for event in events:
+        dispatcher.dispatch_message(event)
+    elapsed = time.perf_counter() - started
+    dispatcher.stop()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    return elapsed / EVENTS
+
+
+async def main():
+    print(f"{'rozmowy':>8} | {'wait_for [us/zdarzenie]':>24} | {'dispatcher [us/zdarzenie]':>26}")
+    for flows in FLOW_COUNTS:
+        wait_for_cost = await bench_wait_for(flows)
+        dispatcher_cost = await bench_dispatcher(flows)
+        print(f"{flows:>8} | {wait_for_cost * 1e6:>24.2f} | {dispatcher_cost * 1e6:>26.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,359 @@
+# party_bot/benchmarks/bench_party_load.py
+
+# Benchmark obciążeniowy PartyManagementCog bez Discorda: cog działa na atrapie HTTP i gatewaya
+# (benchmarks/fake_discord.py) z opóźnieniem i limitami 429 per trasa. Scenariusze:
+#   creation  - lawina tworzenia party z formularza,
+#   join      - lawina kliknięć "Poproś o dołączenie" na jednym ogłoszeniu,
+#   commands  - seria komend w DM od liderów,
+#   expiry    - masowe wygaśnięcie party w harmonogramie terminów (następca extension_check_loop).
+# Raport: przepustowość, p50/p99 czasu obsługi zdarzenia, wywołania REST per operacja, 429, szczytowy RSS.
+# Do tego porównanie wywołań REST na edycję/usunięcie zapisanej wiadomości party: fetch_message() + operacja
+# (ścieżka sprzed PartyMessageHandles) kontra PartialMessage z zapisanych ID - liczone na licznikach atrapy.
+# Kod wyjścia 1, gdy p99 opóźnienia wywołań INTERACTION dodanego przez kolejki REST coga (oczekiwanie bez czasu,
+# w którym bucket miał inne żądanie w locie - tyle trwa też blokada bucketu disnake) przekroczy
+# --max-interaction-wait-ms. Całe oczekiwanie jest tylko raportowane: lawina tworzenia party w jednej gildii
+# to setki kolejnych wywołań jednego bucketu, a lawina próśb - limit 10 wiadomości/s w DM lidera.
+# Dane party trafiają do katalogu tymczasowego. Uruchamianie z katalogu głównego bota (potrzebny config.py):
+#     python -m benchmarks.bench_party_load [--parties 50] [--clicks 100] [--commands 100]
+#         [--latency-ms 40] [--route-latency "POST /guilds/{guild_id}/channels=120"]
+#         [--rate-limit "POST /channels/{channel_id}/messages=10/1"] [--backend json|sqlite]
+#         [--max-interaction-wait-ms 1500]
+
+import argparse
+import asyncio
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import disnake
+from disnake.ext import commands
+
+import config
+from benchmarks.fake_discord import FakeDiscord, RateLimit
+from cogs.party_outbound import RestPriority
+
+DEFAULT_RATE_LIMITS = {
+    "POST /channels/{channel_id}/messages": (10, 1.0),
+    "POST /guilds/{guild_id}/channels": (50, 1.0),
+}
+USER_BASE = 300_000_000_000_000_000
+# Discord czeka na pierwszą odpowiedź 3 s; wywołania, na które czeka użytkownik, muszą wyjść dużo wcześniej.
+MAX_INTERACTION_WAIT_MS = 1500
+
+
+class WorkloadResult:
+    def __init__(self, name: str, operations: int, wall_seconds: float, latencies: list[float],
+                 rest_calls: Counter, rate_limited: Counter, peak_rss_mb: float):
+        self.name = name
+        self.operations = operations
+        self.wall_seconds = wall_seconds
+        self.latencies = sorted(latencies)
+        self.rest_calls = rest_calls
+        self.rate_limited = rate_limited
+        self.peak_rss_mb = peak_rss_mb
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return float("nan")
+        return self.latencies[min(len(self.latencies) - 1, max(0, math.ceil(q / 100 * len(self.latencies)) - 1))]
+
+
+def peak_rss_mb() -> float:
+    # Linux podaje ru_maxrss w KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_route_values(entries: list[str], parse_value) -> dict:
+    parsed = {}
+    for entry in entries:
+        route, _, value = entry.rpartition("=")
+        if not route:
+            raise SystemExit(f"BŁĄD: Oczekiwano 'METODA /ścieżka=wartość', otrzymano: {entry}")
+        parsed[route.strip()] = parse_value(value)
+    return parsed
+
+
+def parse_rate_limit(value: str) -> tuple[int, float]:
+    limit, _, per_seconds = value.partition("/")
+    return int(limit), float(per_seconds or 1)
+
+
+def prepare_config(data_dir: str, args):
+    """Dane benchmarku tylko w katalogu tymczasowym; bez endpointu metryk, shardingu i opóźnień sprzątania DM."""
+    config.DATA_DIR = data_dir
+    config.PARTY_DATA_FILE = os.path.join(data_dir, "party_data.json")
+    config.PARTY_JOURNAL_FILE = os.path.join(data_dir, "party_data.json.journal")
+    config.PARTY_SQLITE_FILE = os.path.join(data_dir, "party_data.sqlite3")
+    config.PARTY_ROOM_POOL_FILE = os.path.join(data_dir, "party_room_pool.json")
+    config.PARTY_LEADER_DIRECTORY_FILE = os.path.join(data_dir, "party_leaders.sqlite3")
+    config.PARTY_STORAGE_BACKEND = args.backend
+    config.PARTY_ROOM_POOL_SIZE = 0
+    config.PARTY_CREATION_MODE = "modal"
+    config.DM_MESSAGE_DELETE_DELAY = 0
+    config.METRICS_PORT = None
+    config.SHARD_COUNT = None
+    for name in ("PARTY_BOT_WORKER_ID", "PARTY_BOT_WORKER_COUNT", "PARTY_BOT_SHARD_IDS"):
+        os.environ.pop(name, None)
+
+
+class LoadHarness:
+    def __init__(self, args):
+        self.args = args
+        self.bot = commands.Bot(command_prefix=config.DEFAULT_COMMAND_PREFIX, intents=disnake.Intents.all())
+        rate_limits = dict(DEFAULT_RATE_LIMITS)
+        rate_limits.update(parse_route_values(args.rate_limit, parse_rate_limit))
+        self.fake = FakeDiscord(
+            self.bot, default_latency_seconds=args.latency_ms / 1000,
+            route_latency=parse_route_values(args.route_latency, lambda value: float(value) / 1000),
+            rate_limits={route: RateLimit(limit, per) for route, (limit, per) in rate_limits.items()},
+            seed=args.seed)
+        self.rate_limit_config = rate_limits
+        self._event_tasks: list[asyncio.Task] | None = None
+        self._finished_at: dict[asyncio.Task, float] = {}
+        original_schedule_event = self.bot._schedule_event
+
+        def schedule_event(*schedule_args, **schedule_kwargs):
+            task = original_schedule_event(*schedule_args, **schedule_kwargs)
+            if self._event_tasks is not None:
+                self._event_tasks.append(task)
+                task.add_done_callback(self._record_finish)
+            return task
+
+        self.bot._schedule_event = schedule_event
+
+    def _record_finish(self, task: asyncio.Task):
+        self._finished_at[task] = time.perf_counter()
+
+    async def setup(self):
+        from cogs import party_manager
+        self.pm = party_manager
+        self.fake.connect_bot()
+        self.users = [USER_BASE + i for i in range(self.args.parties + self.args.clicks + 10)]
+        self.guild = self.fake.add_guild(self.users, [config.STWORZ_PARTY_CHANNEL_NAME,
+                                                      config.SZUKAM_PARTY_CHANNEL_NAME])
+        self.create_channel = disnake.utils.get(self.guild.text_channels, name=config.STWORZ_PARTY_CHANNEL_NAME)
+        self.announce_channel = disnake.utils.get(self.guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME)
+        self.cog = party_manager.PartyManagementCog(self.bot)
+        self.bot.add_cog(self.cog)
+        await asyncio.sleep(0)
+
+    async def teardown(self):
+        self.bot.remove_cog(self.cog.qualified_name)
+        self.fake.disconnect_bot()
+        await asyncio.sleep(0.1)
+
+    async def _settle(self):
+        """Czeka na zakończenie odświeżeń wiadomości i zapis danych party po scenariuszu."""
+        while self.cog.renders.stats()["pending_parties"]:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(self.pm.PARTY_RENDER_COALESCE_SECONDS + 0.1)
+        while self.cog.renders.stats()["pending_parties"]:
+            await asyncio.sleep(0.05)
+        await self.pm.commit_party_data()
+
+    async def run_events(self, name: str, events: list[tuple[str, dict]]) -> WorkloadResult:
+        """Wysyła wszystkie zdarzenia naraz; czas zdarzenia = od parsera do końca wszystkich listenerów."""
+        calls_before, limited_before = Counter(self.fake.calls), Counter(self.fake.rate_limited)
+        latencies = []
+        pending = []
+        started = time.perf_counter()
+        for event, payload in events:
+            self._event_tasks = []
+            dispatched = time.perf_counter()
+            self.fake.dispatch_event(event, payload)
+            pending.append((dispatched, self._event_tasks))
+        self._event_tasks = None
+        for dispatched, tasks in pending:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            latencies.append(max(self._finished_at.pop(task) for task in tasks) - dispatched if tasks else 0.0)
+        wall = time.perf_counter() - started
+        await self._settle()
+        return WorkloadResult(name, len(events), wall, latencies, self.fake.calls - calls_before,
+                              self.fake.rate_limited - limited_before, peak_rss_mb())
+
+    # --- Scenariusze ---
+    async def creation_storm(self) -> WorkloadResult:
+        events = [("INTERACTION_CREATE", self.fake.modal_submit(
+            self.guild, self.create_channel.id, leader_id, self.pm.encode_custom_id("create_modal"),
+            {"game": "1", "party_name": f"Bench {i}"})) for i, leader_id in enumerate(self.users[:self.args.parties])]
+        return await self.run_events("creation", events)
+
+    async def join_storm(self) -> WorkloadResult:
+        party_id = next(iter(self.pm.active_parties))
+        clickers = self.users[self.args.parties:self.args.parties + self.args.clicks]
+        events = [("INTERACTION_CREATE", self.fake.button_click(
+            self.guild, self.announce_channel.id, user_id, self.pm.encode_custom_id("join", party_id), party_id))
+                  for user_id in clickers]
+        return await self.run_events("join", events)
+
+    async def dm_command_burst(self) -> WorkloadResult:
+        leaders = [party_data["leader_id"] for party_data in self.pm.active_parties.values()]
+        prefix = config.DEFAULT_COMMAND_PREFIX
+        events = []
+        for i in range(self.args.commands):
+            content = f"{prefix}lista_czlonkow" if i % 2 == 0 else f"{prefix}zmien_nazwe_party Bench {i}"
+            events.append(("MESSAGE_CREATE", self.fake.dm_message(leaders[i % len(leaders)], content)))
+        return await self.run_events("commands", events)
+
+    async def _message_calls(self, operations) -> int:
+        """Wywołania REST tras pojedynczej wiadomości (GET/PATCH/DELETE) wysłane przez `operations`."""
+        def count():
+            return sum(calls for route, calls in self.fake.calls.items() if route.endswith("/messages/{message_id}"))
+        before = count()
+        await asyncio.gather(*operations)
+        return count() - before
+
+    async def message_handle_comparison(self) -> dict[str, tuple[int, int, int]]:
+        """Edycja ogłoszeń party i usuwanie wiadomości: fetch_message() + operacja kontra PartyMessageHandles.
+
+        Zwraca operacja -> (liczba operacji, wywołania REST przed, wywołania REST po).
+        """
+        messages = self.cog.messages
+        channel = self.announce_channel
+        party_ids = list(self.pm.active_parties)
+        embed = disnake.Embed(title="Bench")
+
+        async def fetch_and_edit(message_id: int):
+            message = await channel.fetch_message(message_id)
+            await message.edit(embed=embed)
+
+        async def fetch_and_delete(message_id: int):
+            message = await channel.fetch_message(message_id)
+            await message.delete()
+
+        scratch = [message.id for message in await asyncio.gather(*(channel.send("bench") for _ in party_ids * 2))]
+        before_deletes, after_deletes = scratch[:len(party_ids)], scratch[len(party_ids):]
+        comparison = {
+            "edycja ogłoszenia": (
+                len(party_ids),
+                await self._message_calls(fetch_and_edit(party_id) for party_id in party_ids),
+                await self._message_calls(messages.edit("bench_emblem", messages.partial(channel, party_id), embed=embed)
+                                          for party_id in party_ids)),
+            "usunięcie wiadomości": (
+                len(party_ids),
+                await self._message_calls(fetch_and_delete(message_id) for message_id in before_deletes),
+                await self._message_calls(messages.delete("bench_delete", messages.partial(channel, message_id))
+                                          for message_id in after_deletes)),
+        }
+        await self._settle()
+        return comparison
+
+    async def mass_expiry(self) -> WorkloadResult:
+        calls_before, limited_before = Counter(self.fake.calls), Counter(self.fake.rate_limited)
+        party_ids = list(self.pm.active_parties)
+        latencies = []
+        original_disband = self.cog.disband_party
+
+        async def timed_disband(party_id, *disband_args, **disband_kwargs):
+            disband_started = time.perf_counter()
+            try:
+                return await original_disband(party_id, *disband_args, **disband_kwargs)
+            finally:
+                latencies.append(time.perf_counter() - disband_started)
+
+        self.cog.disband_party = timed_disband
+        expired_at = time.time() - 1
+        for party_id in party_ids:
+            self.pm.active_parties.update_fields(party_id, expiry_timestamp=expired_at)
+        started = time.perf_counter()
+        self.cog.deadlines.start()
+        while len(latencies) < len(party_ids):
+            await asyncio.sleep(0.01)
+        wall = time.perf_counter() - started
+        self.cog.disband_party = original_disband
+        await self._settle()
+        return WorkloadResult("expiry", len(party_ids), wall, latencies, self.fake.calls - calls_before,
+                              self.fake.rate_limited - limited_before, peak_rss_mb())
+
+
+def print_report(harness: LoadHarness, results: list[WorkloadResult]):
+    print()
+    print(f"Opóźnienie REST: {harness.args.latency_ms} ms (±25%), limity: "
+          + ", ".join(f"{route} {limit}/{per:g}s" for route, (limit, per) in harness.rate_limit_config.items()))
+    print(f"{'scenariusz':>10} | {'zdarzeń':>7} | {'czas [s]':>8} | {'zdarzeń/s':>9} | {'p50 [ms]':>8} | "
+          f"{'p99 [ms]':>8} | {'REST':>6} | {'429':>5} | {'RSS [MB]':>8}")
+    for result in results:
+        print(f"{result.name:>10} | {result.operations:>7} | {result.wall_seconds:>8.2f} | "
+              f"{result.operations / result.wall_seconds:>9.1f} | {result.percentile(50) * 1000:>8.1f} | "
+              f"{result.percentile(99) * 1000:>8.1f} | {sum(result.rest_calls.values()):>6} | "
+              f"{sum(result.rate_limited.values()):>5} | {result.peak_rss_mb:>8.1f}")
+    for result in results:
+        print(f"\nWywołania REST - {result.name} (na zdarzenie):")
+        for route, count in result.rest_calls.most_common():
+            limited = result.rate_limited.get(route, 0)
+            print(f"  {count:>6}  {count / max(result.operations, 1):>6.2f}  {route}"
+                  + (f"  (429: {limited})" if limited else ""))
+    if harness.fake.unknown_routes:
+        print(f"\nWARN: Trasy bez atrapy odpowiedzi: {dict(harness.fake.unknown_routes)}")
+
+
+def print_message_handle_report(comparison: dict[str, tuple[int, int, int]]):
+    print("\nWywołania REST na zapisanej wiadomości (przed: fetch_message() + operacja, po: PartyMessageHandles):")
+    for operation, (count, before, after) in comparison.items():
+        print(f"  {operation:>22}: {count:>4} operacji, przed {before / max(count, 1):.2f}, "
+              f"po {after / max(count, 1):.2f} wywołania na operację")
+
+
+def check_interaction_wait(harness: LoadHarness, limit_ms: float) -> bool:
+    """Sprawdza p99 opóźnienia wywołań REST klasy INTERACTION przez kolejki coga (False = przekroczone)."""
+    outbound = harness.cog.outbound
+    p99_delay = outbound.wait_percentile(RestPriority.INTERACTION, 99, delay_only=True)
+    if p99_delay is None:
+        print("INFO: Brak wywołań REST klasy INTERACTION - nie sprawdzam czasu oczekiwania.")
+        return True
+    p99_wait = outbound.wait_percentile(RestPriority.INTERACTION, 99)
+    summary = (f"p99 opóźnienia wywołań INTERACTION przez kolejki REST {p99_delay * 1000:.0f} ms "
+               f"(całe oczekiwanie z blokadą bucketu: {p99_wait * 1000:.0f} ms)")
+    if p99_delay * 1000 > limit_ms:
+        print(f"BŁĄD: {summary} > {limit_ms:g} ms.")
+        return False
+    print(f"INFO: {summary}, limit {limit_ms:g} ms.")
+    return True
+
+
+async def main(args):
+    harness = LoadHarness(args)
+    await harness.setup()
+    results = [await harness.creation_storm()]
+    message_handles = None
+    if len(harness.pm.active_parties) < args.parties:
+        print(f"WARN: Utworzono tylko {len(harness.pm.active_parties)} z {args.parties} party.")
+    if harness.pm.active_parties:
+        results.append(await harness.join_storm())
+        results.append(await harness.dm_command_burst())
+        message_handles = await harness.message_handle_comparison()
+        results.append(await harness.mass_expiry())
+    await harness.teardown()
+    print_report(harness, results)
+    if message_handles:
+        print_message_handle_report(message_handles)
+    return 0 if check_interaction_wait(harness, args.max_interaction_wait_ms) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark obciążeniowy PartyManagementCog na atrapie Discorda.")
+    parser.add_argument("--parties", type=int, default=50, help="liczba party w lawinie tworzenia")
+    parser.add_argument("--clicks", type=int, default=100, help="liczba kliknięć dołączenia na jednym ogłoszeniu")
+    parser.add_argument("--commands", type=int, default=100, help="liczba komend w DM")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="domyślne opóźnienie wywołania REST")
+    parser.add_argument("--route-latency", action="append", default=[],
+                        help='opóźnienie trasy, np. "POST /guilds/{guild_id}/channels=120" (ms)')
+    parser.add_argument("--rate-limit", action="append", default=[],
+                        help='limit trasy, np. "POST /channels/{channel_id}/messages=5/1" (żądań/sekund)')
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--max-interaction-wait-ms", type=float, default=MAX_INTERACTION_WAIT_MS,
+                        help="dopuszczalne p99 opóźnienia wywołań INTERACTION przez kolejki REST")
+    cli_args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix="party_bench_")
+    try:
+        prepare_config(workdir, cli_args)
+        sys.exit(asyncio.run(main(cli_args)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,64 @@
+# party_bot/benchmarks/bench_party_registry.py
+
+# Porównanie czasu wyszukiwania w PartyRegistry z dawnym liniowym skanem po dict.
+# Uruchamianie z katalogu głównego bota (potrzebny config.py):
+#     python -m benchmarks.bench_party_registry
+
+import random
+import timeit
+
+from cogs.party_manager import PartyRegistry
+
+PARTY_COUNTS = [100, 1_000, 10_000, 100_000]
+LOOKUPS = 2_000
+GUILDS = 50
+
+
+def build_parties(count: int) -> dict:
+    parties = {}
+    for i in range(count):
+        party_id = 10_000_000 + i
+        leader_id = 1_000_000 + i
+        parties[party_id] = {
+            "guild_id": 500 + (i % GUILDS), "leader_id": leader_id, "party_name": f"Party {i}",
+            "member_ids": [leader_id] + [2_000_000 + i * 4 + j for j in range(3)],
+        }
+    return parties
+
+
+def linear_leader_lookup(parties: dict, leader_id: int):
+    return next((pid for pid, pdata in parties.items() if pdata.get("leader_id") == leader_id), None)
+
+
+def linear_member_lookup(parties: dict, user_id: int):
+    return [pid for pid, pdata in parties.items() if user_id in pdata.get("member_ids", [])]
+
+
+def main():
+    rng = random.Random(1234)
+    print(f"{'party':>8} | {'skan lider [us]':>16} | {'indeks lider [us]':>18} | "
+          f"{'skan członek [us]':>18} | {'indeks członek [us]':>20}")
+    for count in PARTY_COUNTS:
+        parties = build_parties(count)
+        registry = PartyRegistry()
+        registry.replace_all(build_parties(count))
+        leader_ids = [1_000_000 + rng.randrange(count) for _ in range(LOOKUPS)]
+        member_ids = [2_000_000 + rng.randrange(count * 4) for _ in range(LOOKUPS)]
+
+        # Skan liniowy jest drogi przy dużej liczbie party - ograniczamy liczbę powtórzeń.
+        scan_lookups = max(10, LOOKUPS * 1_000 // count)
+        scan_leader = timeit.timeit(
+            lambda: [linear_leader_lookup(parties, lid) for lid in leader_ids[:scan_lookups]], number=1) / scan_lookups
+        scan_member = timeit.timeit(
+            lambda: [linear_member_lookup(parties, mid) for mid in member_ids[:scan_lookups]], number=1) / scan_lookups
+        idx_leader = timeit.timeit(
+            lambda: [registry.party_id_led_by(lid) for lid in leader_ids], number=1) / LOOKUPS
+        idx_member = timeit.timeit(
+            lambda: [registry.party_ids_of_member(mid) for mid in member_ids], number=1) / LOOKUPS
+
+        print(f"{count:>8} | {scan_leader * 1e6:>16.2f} | {idx_leader * 1e6:>18.3f} | "
+              f"{scan_member * 1e6:>18.2f} | {idx_member * 1e6:>20.3f}")
+
+
+if __name__ == "__main__":
+    main()
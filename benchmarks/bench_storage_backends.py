@@ -0,0 +1,87 @@
+# party_bot/benchmarks/bench_storage_backends.py
+
+# Porównanie magazynów danych party: JSON (snapshot + dziennik) i SQLite, dla 1k/10k/100k party.
+# Mierzymy: zapis całego stanu, koszt pojedynczych zmian (z potwierdzeniem zapisu) i odczyt przy starcie.
+# Uruchamianie z katalogu głównego bota:
+#     python -m benchmarks.bench_storage_backends
+
+import asyncio
+import copy
+import os
+import tempfile
+import time
+
+from cogs.party_persistence import PartyJournal, apply_party_record
+from cogs.party_storage_sqlite import SqlitePartyStore
+
+PARTY_COUNTS = [1_000, 10_000, 100_000]
+MUTATIONS = 500
+
+
+def make_party(i: int) -> dict:
+    leader_id = 1_000_000 + i
+    return {
+        "emblem_message_id": 10_000_000 + i, "guild_id": 500 + i % 50, "leader_id": leader_id,
+        "party_name": f"Party {i}", "game_name": "Poe2", "category_id": 20_000_000 + i,
+        "settings_channel_id": 30_000_000 + i, "settings_embed_message_id": 40_000_000 + i,
+        "text_channel_id": 50_000_000 + i, "voice_channel_id": 60_000_000 + i, "voice_channel_id_2": 70_000_000 + i,
+        "expiry_timestamp": 1_900_000_000.0 + i, "next_reminder_timestamp": 1_899_990_000.0 + i,
+        "reminder_sent_for_current_cycle": False, "leader_panel_dm_id": None, "extension_reminder_dm_id": None,
+        "member_ids": [leader_id, 2_000_000 + i], "pending_join_requests": [],
+    }
+
+
+async def run_backend(name: str, count: int, workdir: str) -> dict:
+    state = {}
+    if name == "json":
+        store = PartyJournal(os.path.join(workdir, "party_data.json"), os.path.join(workdir, "party_data.json.journal"),
+                             lambda: state, 0.005, 5000)
+    else:
+        store = SqlitePartyStore(os.path.join(workdir, "party_data.sqlite3"), 0.005)
+
+    def emit(record: dict):
+        apply_party_record(state, copy.deepcopy(record))
+        store.append(record)
+
+    start = time.perf_counter()
+    for i in range(count):
+        emit({"op": "create", "party_id": 10_000_000 + i, "data": make_party(i)})
+    await store.commit()
+    if name == "json":
+        await store.compact()
+    populate_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for n in range(MUTATIONS):
+        party_id = 10_000_000 + (n * 7919) % count
+        emit({"op": "member_add", "party_id": party_id, "user_id": 3_000_000 + n})
+        await store.commit()
+    mutation_ms = (time.perf_counter() - start) / MUTATIONS * 1000
+
+    store.flush_sync(compact=False)
+    if name == "sqlite":
+        store.close()
+        reloaded_store = SqlitePartyStore(os.path.join(workdir, "party_data.sqlite3"), 0.005)
+    else:
+        reloaded_store = PartyJournal(store.snapshot_path, store.journal_path, dict, 0.005, 5000)
+    start = time.perf_counter()
+    loaded = reloaded_store.load()
+    load_s = time.perf_counter() - start
+    assert len(loaded) == count
+    if name == "sqlite":
+        reloaded_store.close()
+    return {"populate_s": populate_s, "mutation_ms": mutation_ms, "load_s": load_s}
+
+
+async def main():
+    print(f"{'party':>8} | {'magazyn':>7} | {'zapis stanu [s]':>15} | {'zmiana+commit [ms]':>18} | {'odczyt [s]':>10}")
+    for count in PARTY_COUNTS:
+        for name in ("json", "sqlite"):
+            with tempfile.TemporaryDirectory() as workdir:
+                result = await run_backend(name, count, workdir)
+            print(f"{count:>8} | {name:>7} | {result['populate_s']:>15.2f} | {result['mutation_ms']:>18.2f} | "
+                  f"{result['load_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,346 @@
+# party_bot/benchmarks/fake_discord.py
+
+# Atrapa Discorda w tym samym procesie dla benchmarków obciążeniowych: zamiast HTTPClient.request
+# i adaptera webhooków interakcji odpowiada syntetycznymi danymi, z konfigurowalnym opóźnieniem
+# i limitami (429) per trasa, a zmiany kanałów odsyła do parserów gatewaya jak prawdziwy Discord.
+# Jak disnake trzyma blokadę kubełka (Route.bucket, a dla webhooków para ID i token) przez całe żądanie,
+# więc wywołania w jednym kubełku idą po kolei także tutaj.
+
+import asyncio
+import itertools
+import logging
+import random
+import re
+import time
+from collections import Counter
+
+import disnake
+from disnake.webhook.async_ import async_context
+
+DISCORD_EPOCH_MS = 1420070400000
+BOT_USER_ID = 900_000_000_000_000_001
+APPLICATION_ID = 900_000_000_000_000_002
+
+# Treść ostrzeżenia, które disnake loguje przy 429 (liczone przez RestMetrics coga)
+_RATE_LIMIT_LOG_FORMAT = 'We are being rate limited. Retrying in %.2f seconds. Handled under the bucket "%s"'
+_http_log = logging.getLogger("disnake.http")
+
+
+def route_key(route) -> str:
+    return f"{route.method} {route.path}"
+
+
+_path_patterns: dict[str, re.Pattern] = {}
+
+
+def route_parameters(route) -> dict[str, str]:
+    """Parametry ścieżki odczytane z URL (Route disnake zapamiętuje tylko parametry główne)."""
+    pattern = _path_patterns.get(route.path)
+    if pattern is None:
+        regex = re.sub(r"\\{(\w+)\\}", r"(?P<\1>[^/]+)", re.escape(route.path))
+        pattern = _path_patterns[route.path] = re.compile(regex + "$")
+    match = pattern.search(route.url)
+    return match.groupdict() if match else {}
+
+
+def _timestamp() -> str:
+    return disnake.utils.utcnow().isoformat()
+
+
+class RateLimit:
+    """Kubełek: `limit` żądań na `per_seconds` dla każdej wartości głównego parametru trasy."""
+
+    def __init__(self, limit: int, per_seconds: float):
+        self.limit = limit
+        self.per_seconds = per_seconds
+        self._windows: dict[str, tuple[float, int]] = {}
+
+    def acquire(self, bucket: str) -> float:
+        """0, gdy żądanie mieści się w limicie; w przeciwnym razie czas do zwolnienia kubełka (retry_after)."""
+        now = time.monotonic()
+        window_start, used = self._windows.get(bucket, (now, 0))
+        if now - window_start >= self.per_seconds:
+            window_start, used = now, 0
+        if used >= self.limit:
+            return window_start + self.per_seconds - now
+        self._windows[bucket] = (window_start, used + 1)
+        return 0.0
+
+
+class FakeDiscord:
+    """Syntetyczny Discord: gildie, użytkownicy i odpowiedzi REST dla bota disnake w tym samym procesie."""
+
+    def __init__(self, bot: disnake.Client, default_latency_seconds: float = 0.04, jitter: float = 0.25,
+                 route_latency: dict[str, float] | None = None, rate_limits: dict[str, RateLimit] | None = None,
+                 seed: int = 1234):
+        self.bot = bot
+        self.state = bot._connection
+        self.default_latency_seconds = default_latency_seconds
+        self.jitter = jitter
+        self.route_latency = route_latency or {}
+        self.rate_limits = rate_limits or {}
+        self._rng = random.Random(seed)
+        self._sequence = itertools.count()
+        self._channels: dict[int, dict] = {}
+        self._dm_channels: dict[int, dict] = {}
+        self._users: dict[int, dict] = {}
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.unknown_routes: Counter = Counter()
+        self.interaction_responses: dict[int, float] = {}
+        self._bucket_locks: dict = {}
+        self._original_request = None
+        self._original_webhook_request = None
+
+    # --- Identyfikatory i dane ---
+    def snowflake(self) -> int:
+        # Znacznik czasu w ID ma znaczenie: router liczy z niego czas pierwszej odpowiedzi
+        return ((int(time.time() * 1000) - DISCORD_EPOCH_MS) << 22) | (next(self._sequence) & 0x3FFFFF)
+
+    def user_payload(self, user_id: int, bot: bool = False) -> dict:
+        payload = self._users.get(user_id)
+        if payload is None:
+            payload = self._users[user_id] = {"id": str(user_id), "username": f"user{user_id % 100000}",
+                                              "discriminator": "0", "global_name": None, "avatar": None,
+                                              "bot": bot}
+        return payload
+
+    def member_payload(self, user_id: int, role_ids: tuple = ()) -> dict:
+        return {"user": self.user_payload(user_id), "roles": [str(role_id) for role_id in role_ids],
+                "joined_at": _timestamp(), "deaf": False, "mute": False, "flags": 0}
+
+    def _channel_payload(self, channel_id: int, guild_id: int | None, channel_type: int, name: str,
+                         parent_id: int | None = None) -> dict:
+        payload = {"id": str(channel_id), "type": channel_type, "name": name, "position": len(self._channels),
+                   "permission_overwrites": [], "nsfw": False, "parent_id": str(parent_id) if parent_id else None}
+        if guild_id is not None:
+            payload["guild_id"] = str(guild_id)
+        if channel_type == 2:
+            payload.update(bitrate=64000, user_limit=0)
+        self._channels[channel_id] = payload
+        return payload
+
+    def message_payload(self, channel_id: int, author_id: int, content: str = "", message_id: int | None = None,
+                        embeds: list | None = None, components: list | None = None, flags: int = 0) -> dict:
+        payload = {"id": str(message_id or self.snowflake()), "channel_id": str(channel_id),
+                   "author": self.user_payload(author_id), "content": content or "", "timestamp": _timestamp(),
+                   "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [],
+                   "mention_roles": [], "attachments": [], "embeds": embeds or [], "components": components or [],
+                   "pinned": False, "type": 0, "flags": flags}
+        guild_id = self._channels.get(channel_id, {}).get("guild_id")
+        if guild_id is not None:
+            payload["guild_id"] = guild_id
+        return payload
+
+    # --- Stan gatewaya ---
+    def connect_bot(self):
+        """Ustawia użytkownika bota i podmienia warstwę HTTP (REST i webhooki interakcji) na atrapę."""
+        self.state.user = disnake.ClientUser(state=self.state, data=self.user_payload(BOT_USER_ID, bot=True))
+        self.state.application_id = APPLICATION_ID
+        self._original_request = self.bot.http.request
+        self.bot.http.request = self.http_request
+        adapter = async_context.get()
+        self._original_webhook_request = adapter.request
+        adapter.request = self.webhook_request
+
+    def disconnect_bot(self):
+        if self._original_request is not None:
+            self.bot.http.request = self._original_request
+        if self._original_webhook_request is not None:
+            async_context.get().request = self._original_webhook_request
+
+    def add_guild(self, member_ids: list[int], text_channel_names: list[str]) -> disnake.Guild:
+        """Gildia z członkami i kanałami tekstowymi; bot ma w niej rolę z uprawnieniami administratora."""
+        guild_id, admin_role_id = self.snowflake(), self.snowflake()
+        channels = [self._channel_payload(self.snowflake(), None, 0, name) for name in text_channel_names]
+        data = {
+            "id": str(guild_id), "name": f"Benchmark {guild_id % 1000}", "owner_id": str(BOT_USER_ID),
+            "icon": None, "splash": None, "discovery_splash": None, "afk_channel_id": None, "afk_timeout": 300,
+            "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0,
+            "features": [], "mfa_level": 0, "system_channel_id": None, "system_channel_flags": 0,
+            "rules_channel_id": None, "vanity_url_code": None, "description": None, "banner": None,
+            "premium_tier": 0, "preferred_locale": "pl", "public_updates_channel_id": None, "nsfw_level": 0,
+            "premium_progress_bar_enabled": False, "emojis": [], "stickers": [],
+            "roles": [
+                {"id": str(guild_id), "name": "@everyone", "permissions": "104324673", "position": 0, "color": 0,
+                 "hoist": False, "managed": False, "mentionable": False},
+                {"id": str(admin_role_id), "name": "PartyBot", "permissions": "8", "position": 1, "color": 0,
+                 "hoist": False, "managed": True, "mentionable": False},
+            ],
+            "channels": channels, "member_count": len(member_ids) + 1,
+            "members": [self.member_payload(BOT_USER_ID, (admin_role_id,))] +
+                       [self.member_payload(user_id) for user_id in member_ids],
+            "voice_states": [], "presences": [], "threads": [], "stage_instances": [],
+            "guild_scheduled_events": [], "large": False,
+        }
+        for channel in channels:
+            channel["guild_id"] = str(guild_id)
+        guild = disnake.Guild(data=data, state=self.state)
+        self.state._add_guild(guild)
+        return guild
+
+    def _gateway(self, event: str, data: dict):
+        # Prawdziwy Discord wysyła zdarzenie gatewaya chwilę po odpowiedzi REST
+        parser = self.state.parsers[event]
+        asyncio.get_running_loop().call_soon(parser, data)
+
+    def dispatch_event(self, event: str, data: dict):
+        """Zdarzenie "z gatewaya" (np. INTERACTION_CREATE, MESSAGE_CREATE) przez parser bota."""
+        self.state.parsers[event](data)
+
+    # --- Zdarzenia od użytkowników ---
+    def dm_channel_id(self, user_id: int) -> int:
+        channel = self._dm_channels.get(user_id)
+        if channel is None:
+            channel_id = self.snowflake()
+            channel = self._dm_channels[user_id] = {"id": str(channel_id), "type": 1, "last_message_id": None,
+                                                    "recipients": [self.user_payload(user_id)]}
+            self._channels[channel_id] = channel
+        return int(channel["id"])
+
+    def button_click(self, guild: disnake.Guild | None, channel_id: int, user_id: int, custom_id: str,
+                     message_id: int) -> dict:
+        data = self._interaction_payload(guild, channel_id, user_id, 3,
+                                         {"custom_id": custom_id, "component_type": 2})
+        data["message"] = self.message_payload(channel_id, BOT_USER_ID, message_id=message_id)
+        return data
+
+    def modal_submit(self, guild: disnake.Guild, channel_id: int, user_id: int, custom_id: str,
+                     values: dict[str, str]) -> dict:
+        rows = [{"type": 1, "components": [{"type": 4, "custom_id": key, "value": value}]}
+                for key, value in values.items()]
+        return self._interaction_payload(guild, channel_id, user_id, 5, {"custom_id": custom_id, "components": rows})
+
+    def dm_message(self, user_id: int, content: str) -> dict:
+        return self.message_payload(self.dm_channel_id(user_id), user_id, content)
+
+    def _interaction_payload(self, guild: disnake.Guild | None, channel_id: int, user_id: int, interaction_type: int,
+                             data: dict) -> dict:
+        interaction_id = self.snowflake()
+        payload = {"id": str(interaction_id), "application_id": str(APPLICATION_ID), "type": interaction_type,
+                   "token": f"token-{interaction_id}", "version": 1, "channel_id": str(channel_id), "data": data,
+                   "locale": "pl", "app_permissions": "8", "entitlements": [], "authorizing_integration_owners": {},
+                   "channel": self._channels.get(channel_id) or {"id": str(channel_id), "type": 0}}
+        if guild is not None:
+            payload["guild_id"] = str(guild.id)
+            payload["guild_locale"] = "pl"
+            payload["member"] = dict(self.member_payload(user_id), permissions="104324673")
+        else:
+            payload["user"] = self.user_payload(user_id)
+        return payload
+
+    # --- REST ---
+    def _major_parameter(self, route) -> str:
+        for key in ("channel_id", "guild_id", "webhook_id", "interaction_id"):
+            value = getattr(route, key, None)
+            if value is not None:
+                return str(value)
+        return "global"
+
+    def _bucket_lock(self, bucket) -> asyncio.Lock:
+        lock = self._bucket_locks.get(bucket)
+        if lock is None:
+            lock = self._bucket_locks[bucket] = asyncio.Lock()
+        return lock
+
+    async def _simulate_network(self, key: str, bucket: str):
+        limit = self.rate_limits.get(key)
+        while limit is not None:
+            retry_after = limit.acquire(bucket)
+            if retry_after <= 0:
+                break
+            self.rate_limited[key] += 1
+            _http_log.warning(_RATE_LIMIT_LOG_FORMAT, retry_after, f"{key}:{bucket}")
+            await asyncio.sleep(retry_after)
+        latency = self.route_latency.get(key, self.default_latency_seconds)
+        await asyncio.sleep(latency * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    async def http_request(self, route, *, files=None, form=None, **kwargs):
+        key = route_key(route)
+        self.calls[key] += 1
+        async with self._bucket_lock(route.bucket):
+            await self._simulate_network(key, self._major_parameter(route))
+            return self._respond(route, key, kwargs.get("json"))
+
+    async def webhook_request(self, route, session=None, *, payload=None, multipart=None, files=None, reason=None,
+                              auth_token=None, params=None):
+        key = route_key(route)
+        self.calls[key] += 1
+        async with self._bucket_lock((route.webhook_id, route.webhook_token)):
+            await self._simulate_network(key, str(route.webhook_id))
+        if key == "POST /interactions/{webhook_id}/{webhook_token}/callback":
+            self.interaction_responses.setdefault(route.webhook_id, time.perf_counter())
+            return None
+        if key.startswith("POST /webhooks/") or key.startswith("PATCH /webhooks/"):
+            data = payload or {}
+            return self.message_payload(0, BOT_USER_ID, data.get("content") or "", flags=data.get("flags", 0))
+        return None
+
+    def _respond(self, route, key: str, body: dict | None):
+        body = body or {}
+        path_args = route_parameters(route)
+        if key == "POST /guilds/{guild_id}/channels":
+            parent_id = int(body["parent_id"]) if body.get("parent_id") else None
+            channel = self._channel_payload(self.snowflake(), int(path_args["guild_id"]), body.get("type", 0),
+                                            body.get("name", "kanał"), parent_id)
+            channel["permission_overwrites"] = body.get("permission_overwrites", [])
+            self._gateway("CHANNEL_CREATE", dict(channel))
+            return channel
+        if key == "PATCH /channels/{channel_id}":
+            channel = self._channels.get(int(path_args["channel_id"]))
+            if channel is None:
+                raise disnake.NotFound(_FakeResponse(404), {"message": "Unknown Channel", "code": 10003})
+            channel.update({k: v for k, v in body.items() if k in ("name", "permission_overwrites", "parent_id")})
+            self._gateway("CHANNEL_UPDATE", dict(channel))
+            return channel
+        if key == "DELETE /channels/{channel_id}":
+            channel = self._channels.pop(int(path_args["channel_id"]), None)
+            if channel is None:
+                raise disnake.NotFound(_FakeResponse(404), {"message": "Unknown Channel", "code": 10003})
+            if "guild_id" in channel:
+                self._gateway("CHANNEL_DELETE", dict(channel))
+            return channel
+        if key in ("PUT /channels/{channel_id}/permissions/{target}",
+                   "DELETE /channels/{channel_id}/permissions/{target}"):
+            channel = self._channels.get(int(path_args["channel_id"]))
+            if channel is None:
+                raise disnake.NotFound(_FakeResponse(404), {"message": "Unknown Channel", "code": 10003})
+            overwrites = [overwrite for overwrite in channel.get("permission_overwrites", [])
+                          if str(overwrite["id"]) != path_args["target"]]
+            if route.method == "PUT":
+                overwrites.append({"id": path_args["target"], "type": body["type"], "allow": str(body["allow"]),
+                                   "deny": str(body["deny"])})
+            channel["permission_overwrites"] = overwrites
+            self._gateway("CHANNEL_UPDATE", dict(channel))
+            return None
+        if key == "POST /channels/{channel_id}/messages":
+            return self.message_payload(int(path_args["channel_id"]), BOT_USER_ID, body.get("content"),
+                                        embeds=body.get("embeds"), components=body.get("components"))
+        if key == "PATCH /channels/{channel_id}/messages/{message_id}":
+            return self.message_payload(int(path_args["channel_id"]), BOT_USER_ID, body.get("content"),
+                                        message_id=int(path_args["message_id"]), embeds=body.get("embeds"),
+                                        components=body.get("components"))
+        if key == "POST /users/@me/channels":
+            channel_id = self.dm_channel_id(int(body["recipient_id"]))
+            return self._channels[channel_id]
+        if key == "GET /users/{user_id}":
+            return self.user_payload(int(path_args["user_id"]))
+        if key == "GET /guilds/{guild_id}/members/{user_id}":
+            return self.member_payload(int(path_args["user_id"]))
+        if key == "GET /channels/{channel_id}/messages":
+            return []
+        if key == "GET /channels/{channel_id}/messages/{message_id}":
+            return self.message_payload(int(path_args["channel_id"]), BOT_USER_ID, "",
+                                        message_id=int(path_args["message_id"]))
+        if key.startswith("DELETE ") or key.startswith("PUT ") or key == "PATCH /guilds/{guild_id}/members/{user_id}":
+            return None
+        self.unknown_routes[key] += 1
+        return {}
+
+
+class _FakeResponse:
+    """Minimalna odpowiedź dla wyjątków disnake (HTTPException czyta status i reason)."""
+
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Fake"
@@ -0,0 +1,245 @@
+# party_bot/benchmarks/stress_party_mailbox.py
+
+# Test obciążeniowy skrzynek operacji party (cogs/party_mailbox.py) na atrapie Discorda (benchmarks/fake_discord.py).
+# Każda runda wysyła naraz, w losowej kolejności, sprzeczne operacje na wszystkich party: akceptacje próśb
+# (także podwójne kliknięcia), wyjścia przyciskiem i !opusc, !usun_czlonka, dwie zmiany nazwy i - w co trzecim
+# party - rozwiązanie z panelu lidera. Po rundzie sprawdzane są niezmienniki:
+#   - rozwiązane party nie ma danych ani wpisów w indeksach rejestru,
+#   - członkowie party bez powtórzeń, nikt nie jest jednocześnie członkiem i proszącym,
+#   - indeks członków rejestru zgadza się z member_ids,
+#   - uprawnienie do kategorii party ma dokładnie ten, kto jest w member_ids (brak zgubionych zmian),
+#   - pula nie przekracza docelowego rozmiaru, a pokoje w puli nie dają dostępu nikomu z poprzedniego party,
+#   - nazwa kategorii odpowiada nazwie party, skrzynki są puste, a dane na dysku równe danym w pamięci.
+# Wynik: liczba operacji, czas, przepustowość i naruszenia (kod wyjścia 1, gdy są). --bypass-mailboxes wykonuje
+# te same operacje od razu, bez kolejki party - do porównania (np. wyciek dostępu do pokoju oddanego do puli).
+# Dane party trafiają do katalogu tymczasowego. Uruchamianie z katalogu głównego bota (potrzebny config.py):
+#     python -m benchmarks.stress_party_mailbox [--parties 20] [--members 6] [--rounds 3] [--latency-ms 20]
+#         [--route-latency "PUT /channels/{channel_id}/permissions/{target}=150"] [--pool-size 2]
+#         [--bypass-mailboxes] [--seed 1234]
+
+import argparse
+import asyncio
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import disnake
+
+import config
+from benchmarks.bench_party_load import LoadHarness, prepare_config
+
+PERMISSIONS_ROUTE = "PUT /channels/{channel_id}/permissions/{target}"
+
+
+class MailboxStress:
+    def __init__(self, args):
+        self.args = args
+        self.harness = LoadHarness(args)
+        self.rng = random.Random(args.seed)
+        self.disbanded: set[int] = set()
+        self.operations = 0
+        self.violations: list[str] = []
+
+    @property
+    def pm(self):
+        return self.harness.pm
+
+    @property
+    def cog(self):
+        return self.harness.cog
+
+    async def setup(self):
+        await self.harness.setup()
+        if self.args.bypass_mailboxes:
+            async def submit_directly(party_id, operation, name="operation"):
+                return await operation()
+
+            self.cog.mailboxes.submit = submit_directly
+        await self.harness.creation_storm()
+        users = self.harness.users[self.args.parties:self.args.parties + self.args.parties * self.args.members]
+        self.candidates = {party_id: users[i * self.args.members:(i + 1) * self.args.members]
+                           for i, party_id in enumerate(self.pm.active_parties)}
+
+    async def _until_idle(self):
+        """Czeka, aż skrzynki, sprzątanie i odświeżanie wiadomości skończą pracę."""
+        while len(self.cog.mailboxes) or self.cog.teardown.stats()["pending_retries"]:
+            await asyncio.sleep(0.05)
+        await self.harness._settle()
+        # Zdarzenia gatewaya (CHANNEL_UPDATE) przychodzą chwilę po odpowiedzi REST
+        await asyncio.sleep(0.1)
+
+    # --- Runda sprzecznych operacji ---
+    def _join_requests(self) -> list[tuple[str, dict]]:
+        fake, guild = self.harness.fake, self.harness.guild
+        events = []
+        for party_id, users in self.candidates.items():
+            if party_id not in self.pm.active_parties:
+                continue
+            for user_id in users:
+                if user_id not in self.pm.active_parties[party_id]["member_ids"]:
+                    events.append(("INTERACTION_CREATE", fake.button_click(
+                        guild, self.harness.announce_channel.id, user_id, self.pm.encode_custom_id("join", party_id),
+                        party_id)))
+        return events
+
+    def _conflicting_operations(self, round_no: int) -> list[tuple[str, dict]]:
+        fake, guild, prefix = self.harness.fake, self.harness.guild, config.DEFAULT_COMMAND_PREFIX
+        events = []
+        for index, (party_id, users) in enumerate(self.candidates.items()):
+            party_data = self.pm.active_parties.get(party_id)
+            if party_data is None:
+                continue
+            leader_id = party_data["leader_id"]
+            leader_dm = fake.dm_channel_id(leader_id)
+            pending = list(party_data["pending_join_requests"])
+            for user_id in pending + pending[:1]:
+                events.append(("INTERACTION_CREATE", fake.button_click(
+                    None, leader_dm, leader_id, self.pm.encode_custom_id("join_accept", party_id, user_id),
+                    fake.snowflake())))
+            for user_id in users[:len(users) // 2]:
+                events.append(("INTERACTION_CREATE", fake.button_click(
+                    guild, party_data["settings_channel_id"], user_id, self.pm.encode_custom_id("leave", party_id),
+                    party_data.get("settings_embed_message_id") or fake.snowflake())))
+            if len(users) > 1:
+                events.append(("MESSAGE_CREATE", fake.dm_message(users[1], f"{prefix}opusc {party_id}")))
+                events.append(("MESSAGE_CREATE", fake.dm_message(leader_id, f"{prefix}usun_czlonka {users[-1]}")))
+            for variant in ("A", "B"):
+                events.append(("MESSAGE_CREATE", fake.dm_message(
+                    leader_id, f"{prefix}zmien_nazwe_party Stress {index} r{round_no}{variant}")))
+            if index % 3 == round_no % 3 and party_data.get("leader_panel_dm_id"):
+                # Przycisk panelu lidera obsługuje trwały widok zarejestrowany pod ID wiadomości panelu
+                events.append(("INTERACTION_CREATE", fake.button_click(
+                    None, leader_dm, leader_id, self.pm.encode_custom_id("disband", party_id),
+                    party_data["leader_panel_dm_id"])))
+                self.disbanded.add(party_id)
+        self.rng.shuffle(events)
+        return events
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+        for round_no in range(self.args.rounds):
+            await self.harness.run_events("join", self._join_requests())
+            await self._until_idle()
+            events = self._conflicting_operations(round_no)
+            self.operations += len(events)
+            await self.harness.run_events("conflicts", events)
+            await self._until_idle()
+            self.check_invariants(f"runda {round_no + 1}")
+        return time.perf_counter() - started
+
+    # --- Niezmienniki ---
+    def _violation(self, message: str):
+        self.violations.append(message)
+
+    @staticmethod
+    def _member_overwrites(channel) -> set[int]:
+        return {target.id for target in channel.overwrites if isinstance(target, (disnake.Member, disnake.User))}
+
+    def check_invariants(self, label: str):
+        registry, guild = self.pm.active_parties, self.harness.guild
+        if len(self.cog.mailboxes):
+            self._violation(f"{label}: niepuste skrzynki po rundzie: {self.cog.mailboxes.stats()}")
+        for party_id, users in self.candidates.items():
+            party_data = registry.get(party_id)
+            if party_id in self.disbanded:
+                if party_data is not None:
+                    self._violation(f"{label}: party {party_id} przetrwało rozwiązanie")
+                leaked = [user_id for user_id in users if party_id in registry.party_ids_of_member(user_id)]
+                if leaked:
+                    self._violation(f"{label}: rozwiązane party {party_id} w indeksie członków: {leaked}")
+                continue
+            if party_data is None:
+                self._violation(f"{label}: party {party_id} zniknęło bez rozwiązania")
+                continue
+            members = party_data["member_ids"]
+            if len(members) != len(set(members)):
+                self._violation(f"{label}: party {party_id}: powtórzeni członkowie {members}")
+            both = set(members) & set(party_data["pending_join_requests"])
+            if both:
+                self._violation(f"{label}: party {party_id}: jednocześnie członkowie i proszący {sorted(both)}")
+            for user_id in users:
+                if (party_id in registry.party_ids_of_member(user_id)) != (user_id in members):
+                    self._violation(f"{label}: party {party_id}: indeks członków niezgodny dla {user_id}")
+            category = guild.get_channel(party_data.get("category_id") or 0)
+            if category is None:
+                self._violation(f"{label}: party {party_id}: brak kategorii")
+                continue
+            with_access = self._member_overwrites(category) & set(users)
+            if with_access != set(members) & set(users):
+                self._violation(f"{label}: party {party_id}: uprawnienia {sorted(with_access)} "
+                                f"!= członkowie {sorted(set(members) & set(users))}")
+            if not category.name.startswith(f"🎉 {party_data['party_name']} ("):
+                self._violation(f"{label}: party {party_id}: kategoria '{category.name}' "
+                                f"!= nazwa '{party_data['party_name']}'")
+        pooled = self.cog.room_pool.size(guild.id)
+        if pooled > self.cog.room_pool.target_size:
+            self._violation(f"{label}: pula pokoi urosła do {pooled} (cel {self.cog.room_pool.target_size})")
+        every_candidate = {user_id for users in self.candidates.values() for user_id in users}
+        for room_id in self.cog.room_pool.resource_ids():
+            channel = guild.get_channel(room_id)
+            leaked = self._member_overwrites(channel) & every_candidate if channel is not None else set()
+            if leaked:
+                self._violation(f"{label}: pokój w puli {room_id} daje dostęp: {sorted(leaked)}")
+
+    def check_persisted(self):
+        in_memory = {party_id: (sorted(party_data["member_ids"]), party_data["party_name"])
+                     for party_id, party_data in self.pm.active_parties.items()}
+        stored = {int(party_id): (sorted(party_data["member_ids"]), party_data["party_name"])
+                  for party_id, party_data in self.pm._party_store.load().items()}
+        if stored != in_memory:
+            differing = sorted(party_id for party_id in stored.keys() | in_memory.keys()
+                               if stored.get(party_id) != in_memory.get(party_id))
+            self._violation(f"dane na dysku różne od danych w pamięci dla party: {differing}")
+
+
+async def main(args) -> int:
+    stress = MailboxStress(args)
+    await stress.setup()
+    parties = len(stress.pm.active_parties)
+    wall = await stress.run()
+    mailbox_stats = stress.cog.mailboxes.stats() if not args.bypass_mailboxes else None
+    await stress.harness.teardown()
+    stress.check_persisted()
+    print()
+    print(f"Party: {parties}, kandydatów na party: {args.members}, rund: {args.rounds}, "
+          f"skrzynki: {'pominięte' if args.bypass_mailboxes else 'włączone'}")
+    print(f"Operacji: {stress.operations} w {wall:.2f} s ({stress.operations / wall:.1f}/s), "
+          f"rozwiązanych party: {len(stress.disbanded)}")
+    if mailbox_stats is not None:
+        print(f"Skrzynki: {mailbox_stats}")
+    if stress.violations:
+        print(f"\nNaruszenia niezmienników ({len(stress.violations)}):")
+        for violation in stress.violations:
+            print(f"  - {violation}")
+        return 1
+    print("Niezmienniki zachowane.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sprzeczne operacje na party a skrzynki operacji (atrapa Discorda).")
+    parser.add_argument("--parties", type=int, default=20, help="liczba party")
+    parser.add_argument("--members", type=int, default=6, help="kandydaci na członków jednego party")
+    parser.add_argument("--rounds", type=int, default=3, help="rundy sprzecznych operacji")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="domyślne opóźnienie wywołania REST")
+    parser.add_argument("--route-latency", action="append", default=[],
+                        help='opóźnienie trasy w ms (domyślnie 150 dla zmian uprawnień - szersze okna wyścigów)')
+    parser.add_argument("--pool-size", type=int, default=2,
+                        help="pula pokoi na gildię (rozwiązane party oddają do niej pokoje)")
+    parser.add_argument("--bypass-mailboxes", action="store_true", help="operacje z pominięciem skrzynek")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--seed", type=int, default=1234)
+    cli_args = parser.parse_args()
+    # Pozostałe parametry LoadHarness
+    cli_args.clicks = cli_args.parties * cli_args.members
+    cli_args.route_latency = cli_args.route_latency or [f"{PERMISSIONS_ROUTE}=150"]
+    cli_args.rate_limit = []
+    workdir = tempfile.mkdtemp(prefix="party_stress_")
+    try:
+        prepare_config(workdir, cli_args)
+        config.PARTY_ROOM_POOL_SIZE = cli_args.pool_size
+        sys.exit(asyncio.run(main(cli_args)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,117 @@
+# party_bot/cluster.py
+
+# Uruchamia bota jako kilka procesów roboczych (każdy to main.py z własnym zakresem shardów),
+# żeby serializacja danych, renderowanie embedów i parsowanie zdarzeń korzystały z kilku rdzeni.
+# Procesy dzielą katalog liderów (SQLite), a zdarzenia DM przekazują sobie przez gniazda Unix.
+# Uruchamianie z katalogu głównego bota (wymaga SHARD_COUNT w config.py):
+#     python cluster.py
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from cogs.party_cluster import SHARD_IDS_ENV, WORKER_COUNT_ENV, WORKER_ID_ENV, ClusterLayout
+
+try:
+    import config
+except ModuleNotFoundError:
+    print("BŁĄD KRYTYCZNY: Plik config.py nie został znaleziony!")
+    exit()
+
+SHARD_COUNT = getattr(config, "SHARD_COUNT", None)
+# Domyślnie jeden proces na rdzeń, ale nie więcej niż shardów.
+CLUSTER_WORKERS = getattr(config, "CLUSTER_WORKERS", None)
+# Proces, który padł, jest uruchamiany ponownie po tym czasie (podwajanym przy kolejnych awariach, do minuty).
+CLUSTER_RESTART_DELAY_SECONDS = getattr(config, "CLUSTER_RESTART_DELAY_SECONDS", 5)
+CLUSTER_RESTART_MAX_DELAY_SECONDS = 60
+# Proces działający dłużej niż tyle sekund uznajemy za stabilny - opóźnienie restartu wraca do wartości początkowej.
+CLUSTER_STABLE_AFTER_SECONDS = 300
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+class Worker:
+    def __init__(self, worker_id: int, shard_ids: list[int], worker_count: int):
+        self.worker_id = worker_id
+        self.shard_ids = shard_ids
+        self.worker_count = worker_count
+        self.process: subprocess.Popen | None = None
+        self.started_at = 0.0
+        self.restart_delay = CLUSTER_RESTART_DELAY_SECONDS
+        self.restart_at: float | None = None
+
+    def start(self):
+        env = dict(os.environ)
+        env[WORKER_ID_ENV] = str(self.worker_id)
+        env[WORKER_COUNT_ENV] = str(self.worker_count)
+        env[SHARD_IDS_ENV] = ",".join(str(shard_id) for shard_id in self.shard_ids)
+        self.process = subprocess.Popen([sys.executable, MAIN_SCRIPT], env=env)
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        print(f"INFO: Proces {self.worker_id} (PID {self.process.pid}) obsługuje shardy {self.shard_ids}.")
+
+    def poll(self):
+        """Sprawdza proces; po awarii planuje restart z rosnącym opóźnieniem."""
+        now = time.monotonic()
+        if self.process is None:
+            if self.restart_at is not None and now >= self.restart_at:
+                self.start()
+            return
+        exit_code = self.process.poll()
+        if exit_code is None:
+            return
+        if now - self.started_at >= CLUSTER_STABLE_AFTER_SECONDS:
+            self.restart_delay = CLUSTER_RESTART_DELAY_SECONDS
+        print(f"WARN: Proces {self.worker_id} zakończył się z kodem {exit_code}. "
+              f"Restart za {self.restart_delay} s.")
+        self.process = None
+        self.restart_at = now + self.restart_delay
+        self.restart_delay = min(self.restart_delay * 2, CLUSTER_RESTART_MAX_DELAY_SECONDS)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+
+
+def main():
+    if not SHARD_COUNT:
+        print("BŁĄD KRYTYCZNY: Tryb klastra wymaga ustawienia SHARD_COUNT w config.py.")
+        return
+    worker_count = min(CLUSTER_WORKERS or os.cpu_count() or 1, SHARD_COUNT)
+    layout = ClusterLayout(worker_count, SHARD_COUNT)
+    workers = [Worker(worker_id, layout.shard_ids_of(worker_id), worker_count) for worker_id in range(worker_count)]
+    print(f"INFO: Klaster: {worker_count} procesów, {SHARD_COUNT} shardów.")
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    for worker in workers:
+        worker.start()
+    while not stopping:
+        time.sleep(1)
+        for worker in workers:
+            worker.poll()
+
+    print("INFO: Zatrzymywanie klastra...")
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        if worker.process is None:
+            continue
+        try:
+            worker.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            print(f"WARN: Proces {worker.worker_id} nie zakończył się w 30 s - zabijam.")
+            worker.process.kill()
+    print("INFO: Klaster zatrzymany.")
+
+
+if __name__ == "__main__":
+    main()
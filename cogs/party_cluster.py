@@ -0,0 +1,337 @@
+# party_bot/cogs/party_cluster.py
+
+import asyncio
+import itertools
+import json
+import os
+from typing import Any, Awaitable, Callable
+
+import disnake
+
+# Zmienne środowiskowe ustawiane procesom roboczym przez cluster.py
+WORKER_ID_ENV = "PARTY_BOT_WORKER_ID"
+WORKER_COUNT_ENV = "PARTY_BOT_WORKER_COUNT"
+SHARD_IDS_ENV = "PARTY_BOT_SHARD_IDS"
+
+# Zdarzenia DM trafiają od Discorda zawsze do sharda 0
+DM_SHARD_ID = 0
+
+
+class ClusterIpcError(Exception):
+    """Proces roboczy nie odpowiedział albo zgłosił błąd przy obsłudze żądania."""
+
+
+def worker_shard_ids(worker_id: int, worker_count: int, shard_count: int) -> list[int]:
+    """Ciągły zakres shardów procesu roboczego; pierwsze procesy dostają o jeden shard więcej przy reszcie z dzielenia."""
+    per_worker, extra = divmod(shard_count, worker_count)
+    start = worker_id * per_worker + min(worker_id, extra)
+    return list(range(start, start + per_worker + (1 if worker_id < extra else 0)))
+
+
+def shard_ids_from_env() -> list[int] | None:
+    """SHARD_IDS nadane przez cluster.py (np. "0,1,2"); None, gdy proces nie działa w klastrze."""
+    raw = os.environ.get(SHARD_IDS_ENV)
+    if not raw:
+        return None
+    return [int(shard_id) for shard_id in raw.split(",") if shard_id.strip()]
+
+
+def worker_from_env() -> tuple[int, int] | None:
+    """(worker_id, worker_count) procesu roboczego klastra albo None poza klastrem."""
+    worker_id, worker_count = os.environ.get(WORKER_ID_ENV), os.environ.get(WORKER_COUNT_ENV)
+    if worker_id is None or worker_count is None:
+        return None
+    return int(worker_id), int(worker_count)
+
+
+def worker_file_path(path: str, worker_id: int) -> str:
+    """party_room_pool.json -> party_room_pool.worker1.json (pliki, których procesy nie mogą dzielić)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{worker_id}{ext}"
+
+
+class ClusterLayout:
+    """Przydział shardów do procesów roboczych (ten sam wzór w cluster.py i w każdym procesie)."""
+
+    def __init__(self, worker_count: int, shard_count: int):
+        if not 1 <= worker_count <= shard_count:
+            raise ValueError(f"Liczba procesów ({worker_count}) musi być w zakresie 1..SHARD_COUNT ({shard_count}).")
+        self.worker_count = worker_count
+        self.shard_count = shard_count
+        self._worker_of_shard = {shard_id: worker_id for worker_id in range(worker_count)
+                                 for shard_id in worker_shard_ids(worker_id, worker_count, shard_count)}
+
+    def shard_ids_of(self, worker_id: int) -> list[int]:
+        return worker_shard_ids(worker_id, self.worker_count, self.shard_count)
+
+    def worker_of_shard(self, shard_id: int) -> int:
+        return self._worker_of_shard[shard_id]
+
+
+class _PeerConnection:
+    """Trwałe połączenie do jednego procesu: żądania z numerem, odpowiedzi dopasowywane po numerze."""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._connect_lock = asyncio.Lock()
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError as e:
+                raise ClusterIpcError(f"Brak połączenia z {self.socket_path}: {e}") from e
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_responses(reader))
+
+    async def _read_responses(self, reader: asyncio.StreamReader):
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if response["ok"]:
+                    future.set_result(response.get("data"))
+                else:
+                    future.set_exception(ClusterIpcError(response.get("error", "nieznany błąd")))
+        except (OSError, ValueError) as e:
+            print(f"WARN: Połączenie IPC z {self.socket_path} przerwane: {e!r}")
+        finally:
+            self._fail_pending(ClusterIpcError(f"Połączenie z {self.socket_path} zamknięte."))
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+
+    def _fail_pending(self, error: Exception):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def send(self, message: dict, future: asyncio.Future | None = None):
+        await self._ensure_connected()
+        if future is not None:
+            self._pending[message["id"]] = future
+        self._writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        await self._writer.drain()
+
+    def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._fail_pending(ClusterIpcError("IPC zatrzymane."))
+
+
+class ClusterIpc:
+    """Lokalne IPC między procesami roboczymi klastra: gniazdo Unix na proces, JSON w liniach.
+
+    Każdy proces nasłuchuje na `party_bot_worker<N>.sock` i obsługuje żądania zarejestrowane
+    przez `handle(op, handler)`. `call()` czeka na odpowiedź (z limitem czasu), `send()`
+    tylko wysyła. Połączenia do pozostałych procesów są trwałe i nawiązywane przy pierwszym użyciu.
+    """
+
+    def __init__(self, worker_id: int, worker_count: int, socket_dir: str, request_timeout_seconds: float = 5.0):
+        self.worker_id = worker_id
+        self.worker_count = worker_count
+        self.socket_dir = socket_dir
+        self.request_timeout_seconds = request_timeout_seconds
+        self._handlers: dict[str, Callable[[Any], Awaitable[Any]]] = {}
+        self._peers: dict[int, _PeerConnection] = {}
+        self._request_ids = itertools.count(1)
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+        self.requests_sent = 0
+        self.requests_served = 0
+        self.requests_failed = 0
+
+    def stats(self) -> dict:
+        return {"worker_id": self.worker_id, "requests_sent": self.requests_sent,
+                "requests_served": self.requests_served, "requests_failed": self.requests_failed}
+
+    def socket_path(self, worker_id: int) -> str:
+        return os.path.join(self.socket_dir, f"party_bot_worker{worker_id}.sock")
+
+    def handle(self, op: str, handler: Callable[[Any], Awaitable[Any]]):
+        if op in self._handlers:
+            raise ValueError(f"Operacja IPC '{op}' jest już zarejestrowana.")
+        self._handlers[op] = handler
+
+    async def start(self):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        path = self.socket_path(self.worker_id)
+        if os.path.exists(path):
+            os.remove(path)  # Gniazdo po poprzednim uruchomieniu tego procesu
+        self._server = await asyncio.start_unix_server(self._serve_connection, path=path)
+        print(f"INFO: IPC procesu {self.worker_id}/{self.worker_count} nasłuchuje na {path}.")
+
+    async def stop(self):
+        for peer in self._peers.values():
+            peer.close()
+        self._peers.clear()
+        for writer in self._connections:
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _peer(self, worker_id: int) -> _PeerConnection:
+        peer = self._peers.get(worker_id)
+        if peer is None:
+            peer = self._peers[worker_id] = _PeerConnection(self.socket_path(worker_id))
+        return peer
+
+    async def call(self, worker_id: int, op: str, data: Any = None) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        message = {"id": next(self._request_ids), "op": op, "data": data}
+        self.requests_sent += 1
+        try:
+            await self._peer(worker_id).send(message, future)
+            return await asyncio.wait_for(future, timeout=self.request_timeout_seconds)
+        except asyncio.TimeoutError as e:
+            self.requests_failed += 1
+            raise ClusterIpcError(f"Proces {worker_id} nie odpowiedział na '{op}' "
+                                  f"w ciągu {self.request_timeout_seconds} s.") from e
+        except ClusterIpcError:
+            self.requests_failed += 1
+            raise
+
+    async def send(self, worker_id: int, op: str, data: Any = None) -> bool:
+        self.requests_sent += 1
+        try:
+            await self._peer(worker_id).send({"id": None, "op": op, "data": data})
+            return True
+        except ClusterIpcError as e:
+            self.requests_failed += 1
+            print(f"WARN: Nie udało się przekazać '{op}' do procesu {worker_id}: {e}")
+            return False
+
+    async def broadcast(self, op: str, data: Any = None):
+        """Wysyła do wszystkich pozostałych procesów (bez czekania na odpowiedzi)."""
+        await asyncio.gather(*(self.send(worker_id, op, data)
+                               for worker_id in range(self.worker_count) if worker_id != self.worker_id))
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        self._connections.add(writer)
+        try:
+            while line := await reader.readline():
+                loop.create_task(self._serve_request(json.loads(line), writer))
+        except (OSError, ValueError) as e:
+            print(f"WARN: Błąd odczytu żądania IPC: {e!r}")
+        except asyncio.CancelledError:
+            pass  # Zamykanie pętli zdarzeń przy wyłączaniu procesu
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _serve_request(self, request: dict, writer: asyncio.StreamWriter):
+        handler = self._handlers.get(request.get("op"))
+        if handler is None:
+            response = {"id": request.get("id"), "ok": False, "error": f"Nieznana operacja '{request.get('op')}'."}
+        else:
+            try:
+                response = {"id": request.get("id"), "ok": True, "data": await handler(request.get("data"))}
+            except Exception as e:
+                print(f"BŁĄD: Obsługa żądania IPC '{request.get('op')}' nie powiodła się: {e!r}")
+                response = {"id": request.get("id"), "ok": False, "error": repr(e)}
+        self.requests_served += 1
+        if request.get("id") is None or writer.is_closing():
+            return
+        writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+        try:
+            await writer.drain()
+        except OSError:
+            pass
+
+
+class ClusterGateway:
+    """Przekazywanie zdarzeń DM z procesu sharda 0 do procesu, który ma dane party.
+
+    Discord wysyła wiadomości, reakcje i kliknięcia przycisków z DM tylko do sharda 0, a party
+    lidera może żyć w innym procesie. W procesie sharda 0 parsery zdarzeń gatewaya są owinięte:
+    - komenda w DM idzie do jednego procesu wskazanego przez `command_shard(data)`,
+    - zwykła wiadomość i reakcja w DM są obsługiwane lokalnie i rozsyłane do pozostałych
+      procesów (rozmowy i odpowiedzi na przypomnienia filtrują je jednym odczytem ze słownika),
+    - kliknięcie w DM idzie do procesu wskazanego przez `interaction_shard(data)`.
+    Proces docelowy parsuje surowe dane własnym parserem, więc handlery coga się nie zmieniają.
+    Odpowiedzi na interakcje idą przez HTTP (token interakcji), więc działają z każdego procesu.
+    """
+
+    FORWARDED_EVENTS = ("MESSAGE_CREATE", "MESSAGE_REACTION_ADD", "INTERACTION_CREATE")
+
+    def __init__(self, bot: disnake.Client, layout: ClusterLayout, ipc: ClusterIpc, command_prefix: str,
+                 command_shard: Callable[[dict], Awaitable[int | None]],
+                 interaction_shard: Callable[[dict], Awaitable[int | None]]):
+        self.bot = bot
+        self.layout = layout
+        self.ipc = ipc
+        self.command_prefix = command_prefix
+        self.command_shard = command_shard
+        self.interaction_shard = interaction_shard
+        self._parsers = bot._connection.parsers
+        self._original_parsers = {event: self._parsers[event] for event in self.FORWARDED_EVENTS}
+        self._tasks: set[asyncio.Task] = set()
+        self.events_forwarded = 0
+        self.events_broadcast = 0
+        self.events_received = 0
+        ipc.handle("gateway_event", self._on_forwarded_event)
+        if DM_SHARD_ID in layout.shard_ids_of(ipc.worker_id):
+            for event in self.FORWARDED_EVENTS:
+                self._parsers[event] = self._make_parser(event)
+
+    def stats(self) -> dict:
+        return {"events_forwarded": self.events_forwarded, "events_broadcast": self.events_broadcast,
+                "events_received": self.events_received, **self.ipc.stats()}
+
+    def uninstall(self):
+        self._parsers.update(self._original_parsers)
+        for task in self._tasks:
+            task.cancel()
+
+    def _make_parser(self, event: str):
+        original = self._original_parsers[event]
+
+        def parse(data: dict):
+            if data.get("guild_id") is not None:
+                original(data)  # Zdarzenia z gildii tego procesu - bez zmian
+                return
+            task = asyncio.get_running_loop().create_task(self._route_dm_event(event, data))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return parse
+
+    def _is_command(self, data: dict) -> bool:
+        return (data.get("content") or "").startswith(self.command_prefix)
+
+    async def _route_dm_event(self, event: str, data: dict):
+        original = self._original_parsers[event]
+        if event == "MESSAGE_CREATE" and data.get("author", {}).get("bot"):
+            original(data)
+            return
+        if event == "INTERACTION_CREATE" or (event == "MESSAGE_CREATE" and self._is_command(data)):
+            resolve = self.interaction_shard if event == "INTERACTION_CREATE" else self.command_shard
+            shard_id = await resolve(data)
+            worker_id = self.layout.worker_of_shard(shard_id) if shard_id is not None else self.ipc.worker_id
+            if worker_id != self.ipc.worker_id:
+                if await self.ipc.send(worker_id, "gateway_event", {"event": event, "data": data}):
+                    self.events_forwarded += 1
+                    return
+            original(data)  # Nasze party albo przekazanie się nie udało - obsługujemy tutaj
+            return
+        original(data)
+        self.events_broadcast += 1
+        await self.ipc.broadcast("gateway_event", {"event": event, "data": data})
+
+    async def _on_forwarded_event(self, message: dict):
+        self.events_received += 1
+        self._original_parsers[message["event"]](message["data"])
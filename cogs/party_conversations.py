@@ -0,0 +1,117 @@
+# party_bot/cogs/party_conversations.py
+
+import asyncio
+import time
+from typing import Collection
+
+import disnake
+
+from cogs.party_scheduler import DeadlineScheduler
+
+
+class ConversationReplaced(Exception):
+    """Ten sam użytkownik zaczął w tym DM nowy krok rozmowy - starszy przepływ powinien się po cichu zakończyć."""
+
+
+class _PendingStep:
+    __slots__ = ("kind", "future", "message_id", "emojis")
+
+    def __init__(self, kind: str, future: asyncio.Future, message_id: int | None = None,
+                 emojis: Collection[str] = ()):
+        self.kind = kind
+        self.future = future
+        self.message_id = message_id
+        self.emojis = emojis
+
+
+class DmConversationDispatcher:
+    """Rozmowy w DM (kroki tworzenia party) bez `bot.wait_for`.
+
+    `bot.wait_for` sprawdza predykat każdego oczekującego przepływu przy każdym zdarzeniu
+    `message`/`reaction_add`, więc koszt zdarzenia rośnie z liczbą otwartych rozmów. Tutaj
+    każda rozmowa ma co najwyżej jeden oczekujący krok pod kluczem (user_id, dm_channel_id)
+    i zdarzenie trafia do niego jednym odczytem ze słownika. Limity czasu kroków pilnuje
+    jeden wspólny DeadlineScheduler zamiast osobnego timera na każdy krok.
+    """
+
+    def __init__(self):
+        self._steps: dict[tuple[int, int], _PendingStep] = {}
+        self._timeouts = DeadlineScheduler(self._expire_steps)
+        self.events_routed = 0
+        self.events_ignored = 0
+        self.steps_timed_out = 0
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def stats(self) -> dict:
+        return {"active_steps": len(self._steps), "events_routed": self.events_routed,
+                "events_ignored": self.events_ignored, "steps_timed_out": self.steps_timed_out}
+
+    def stop(self):
+        self._timeouts.stop()
+        for step in self._steps.values():
+            if not step.future.done():
+                step.future.cancel()
+        self._steps.clear()
+
+    # --- Oczekiwanie na krok ---
+    async def _wait(self, key: tuple[int, int], step: _PendingStep, timeout: float):
+        previous = self._steps.get(key)
+        if previous is not None and not previous.future.done():
+            previous.future.set_exception(ConversationReplaced())
+        self._steps[key] = step
+        self._timeouts.start()
+        self._timeouts.schedule(key, time.time() + timeout)
+        try:
+            return await step.future
+        finally:
+            if self._steps.get(key) is step:
+                del self._steps[key]
+                self._timeouts.cancel(key)
+
+    async def wait_for_message(self, user_id: int, channel_id: int, timeout: float) -> disnake.Message:
+        """Czeka na następną wiadomość użytkownika w danym DM; po czasie rzuca asyncio.TimeoutError."""
+        future = asyncio.get_running_loop().create_future()
+        return await self._wait((user_id, channel_id), _PendingStep("message", future), timeout)
+
+    async def wait_for_reaction(self, user_id: int, channel_id: int, message_id: int, emojis: Collection[str],
+                                timeout: float) -> str:
+        """Czeka na reakcję użytkownika jednym z `emojis` pod wiadomością `message_id`; zwraca emoji."""
+        future = asyncio.get_running_loop().create_future()
+        return await self._wait((user_id, channel_id), _PendingStep("reaction", future, message_id, emojis), timeout)
+
+    # --- Zdarzenia z gatewaya ---
+    def _resolve(self, key: tuple[int, int], kind: str) -> _PendingStep | None:
+        step = self._steps.get(key)
+        if step is None or step.kind != kind or step.future.done():
+            self.events_ignored += 1
+            return None
+        return step
+
+    def dispatch_message(self, message: disnake.Message) -> bool:
+        step = self._resolve((message.author.id, message.channel.id), "message")
+        if step is None:
+            return False
+        step.future.set_result(message)
+        self.events_routed += 1
+        return True
+
+    def dispatch_reaction(self, payload: disnake.RawReactionActionEvent) -> bool:
+        step = self._resolve((payload.user_id, payload.channel_id), "reaction")
+        if step is None:
+            return False
+        emoji = str(payload.emoji)
+        if payload.message_id != step.message_id or emoji not in step.emojis:
+            self.events_ignored += 1
+            return False
+        step.future.set_result(emoji)
+        self.events_routed += 1
+        return True
+
+    async def _expire_steps(self, keys: list):
+        for key in keys:
+            step = self._steps.get(key)
+            if step is not None and not step.future.done():
+                step.future.set_exception(asyncio.TimeoutError())
+                self.steps_timed_out += 1
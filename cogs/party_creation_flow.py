@@ -6,9 +6,44 @@ import asyncio
 # lub jest przekazywany. Tutaj użyjemy względnego importu,
 # zakładając, że ten plik jest częścią pakietu 'cogs'.
 import config
+from cogs.party_conversations import ConversationReplaced, DmConversationDispatcher
+from cogs.party_router import encode_custom_id
 
+# Czas (w sekundach) na odpowiedź w każdym kroku rozmowy.
+DM_STEP_TIMEOUT_SECONDS = 180.0
 
-async def handle_game_selection_dm(bot: disnake.Client, user: disnake.User,
+
+# --- Tworzenie party formularzem (modal): jedna odpowiedź na kliknięcie, bez DM ---
+# disnake 2.10 pozwala w modalu tylko na pola tekstowe, więc grę wpisuje się numerem albo nazwą
+# (jak w kreatorze DM: 1️⃣ = pierwsza gra z config.GAMES_EMOJI_SELECT), a bot sprawdza ją po stronie serwera.
+def game_choices_hint() -> str:
+    return ", ".join(f"{number} - {game}" for number, game in enumerate(config.GAMES_EMOJI_SELECT, start=1))
+
+
+def parse_game_choice(text: str) -> str | None:
+    choice = text.strip()
+    games = list(config.GAMES_EMOJI_SELECT)
+    if choice.isdigit():
+        number = int(choice)
+        return games[number - 1] if 1 <= number <= len(games) else None
+    return next((game for game in games if game.casefold() == choice.casefold()), None)
+
+
+def build_party_creation_modal() -> disnake.ui.Modal:
+    return disnake.ui.Modal(
+        title="Stwórz Party",
+        custom_id=encode_custom_id("create_modal"),
+        components=[
+            disnake.ui.TextInput(label="Gra (numer lub nazwa)", custom_id="game", placeholder=game_choices_hint()[:100],
+                                 max_length=50),
+            disnake.ui.TextInput(label="Nazwa party", custom_id="party_name", min_length=1,
+                                 max_length=config.MAX_PARTY_NAME_LENGTH),
+        ])
+
+
+# --- Kreator w DM ---
+
+async def handle_game_selection_dm(conversations: DmConversationDispatcher, user: disnake.User,
                                    dm_channel: disnake.DMChannel) -> str | None:
     """Obsługuje wybór gry przez użytkownika w DM, z poprawnym usuwaniem wiadomości."""
     bot_game_prompt_msg = None
@@ -20,13 +55,10 @@ async def handle_game_selection_dm(bot: disnake.Client, user: disnake.User,
         for emoji_to_add in config.GAMES_EMOJI_SELECT.values():
             await bot_game_prompt_msg.add_reaction(emoji_to_add)
 
-        def game_check(reaction_arg: disnake.Reaction, user_arg: disnake.User):
-            return user_arg.id == user.id and \
-                reaction_arg.message.id == bot_game_prompt_msg.id and \
-                str(reaction_arg.emoji) in config.EMOJI_TO_GAME_SELECT
-
-        reaction, _ = await bot.wait_for('reaction_add', timeout=180.0, check=game_check)
-        selected_game = config.EMOJI_TO_GAME_SELECT[str(reaction.emoji)]
+        selected_emoji = await conversations.wait_for_reaction(
+            user.id, dm_channel.id, bot_game_prompt_msg.id, config.EMOJI_TO_GAME_SELECT,
+            timeout=DM_STEP_TIMEOUT_SECONDS)
+        selected_game = config.EMOJI_TO_GAME_SELECT[selected_emoji]
 
         # Usuń prompt bota po udanej reakcji
         try:
@@ -47,6 +79,9 @@ async def handle_game_selection_dm(bot: disnake.Client, user: disnake.User,
                 pass
         await dm_channel.send("Anulowano tworzenie party (brak wyboru gry w ciągu 3 minut).")
         return None
+    except ConversationReplaced:
+        # Użytkownik zaczął tworzenie od nowa - dalej prowadzi go nowszy przepływ, prompt usunie finally
+        return None
     except disnake.Forbidden:
         print(f"DM ERR: Nie można wysłać wiadomości lub dodać reakcji do {user.name} ({user.id}) podczas wyboru gry.")
         if bot_game_prompt_msg:
@@ -72,7 +107,8 @@ async def handle_game_selection_dm(bot: disnake.Client, user: disnake.User,
                 pass
 
 
-async def handle_party_name_dm(bot: disnake.Client, user: disnake.User, dm_channel: disnake.DMChannel) -> str | None:
+async def handle_party_name_dm(conversations: DmConversationDispatcher, user: disnake.User,
+                               dm_channel: disnake.DMChannel) -> str | None:
     """Obsługuje podanie nazwy party przez użytkownika w DM, z poprawnym usuwaniem wiadomości."""
     bot_prompt_msg_obj = None
     user_response_msg_obj = None
@@ -81,15 +117,10 @@ async def handle_party_name_dm(bot: disnake.Client, user: disnake.User, dm_chann
         try:
             bot_prompt_msg_obj = await dm_channel.send(f"Podaj nazwę Party (1-{config.MAX_PARTY_NAME_LENGTH} znaków):")
 
-            def name_check(message_arg: disnake.Message):
-                return message_arg.author.id == user.id and \
-                    message_arg.channel.id == dm_channel.id
-
-            user_response_msg_obj = await bot.wait_for('message', timeout=180.0, check=name_check)
+            user_response_msg_obj = await conversations.wait_for_message(user.id, dm_channel.id,
+                                                                         timeout=DM_STEP_TIMEOUT_SECONDS)
 
             # 1. Pobierz treść ZANIM usuniesz obiekt wiadomości lub ustawisz go na None
-            if user_response_msg_obj is None:  # Dodatkowe zabezpieczenie, choć wait_for powinno rzucić wyjątek
-                raise ValueError("bot.wait_for('message') zwróciło None bez wyjątku.")
 
             party_name_input = user_response_msg_obj.content.strip()
 
@@ -136,6 +167,13 @@ async def handle_party_name_dm(bot: disnake.Client, user: disnake.User, dm_chann
                     pass
             await dm_channel.send("Anulowano tworzenie party (brak podania nazwy w ciągu 3 minut).")
             return None
+        except ConversationReplaced:
+            if bot_prompt_msg_obj:
+                try:
+                    await bot_prompt_msg_obj.delete()
+                except disnake.HTTPException:
+                    pass
+            return None
         except disnake.Forbidden:
             print(f"DM ERR: Nie można wysłać wiadomości do {user.name} ({user.id}) podczas podawania nazwy party.")
             if bot_prompt_msg_obj:
@@ -144,7 +182,7 @@ async def handle_party_name_dm(bot: disnake.Client, user: disnake.User, dm_chann
                 except disnake.HTTPException:
                     pass
             return None
-        except Exception as e:  # Łapie też potencjalny ValueError z góry
+        except Exception as e:
             print(f"ERR: Nieoczekiwany błąd w handle_party_name_dm: {e} (Typ: {type(e)})")
             if bot_prompt_msg_obj:
                 try:
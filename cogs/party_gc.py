@@ -0,0 +1,175 @@
+# party_bot/cogs/party_gc.py
+
+import time
+from typing import Callable
+
+import disnake
+
+from cogs.party_outbound import RestPriority, rest_priority
+from cogs.party_provisioning import delete_category_with_channels
+from cogs.party_room_pool import POOL_ROOM_NAMES
+
+# Prefiksy nazw kategorii i kanałów zakładanych przez bota (party_channel_names, pula pokoi)
+PARTY_CATEGORY_PREFIXES = ("🎉 ", POOL_ROOM_NAMES["category"])
+PARTY_CHANNEL_PREFIXES = ("📌︱info-", "💬︱", "🔊︱Głos 1 (", "🔊︱Głos 2 (")
+# Tytuły emblematów w kanale ogłoszeń ("✨ Nowe Party: ..." i "✨ Party: ...")
+PARTY_EMBLEM_TITLE_PREFIX = "✨ "
+
+
+class PartyResourceCollector:
+    """Usuwanie osieroconych zasobów party: kategorii, kanałów i emblematów, których nie ma w żadnym party.
+
+    Zostają po przerwanym tworzeniu party (awaria między utworzeniem kanałów a zapisem party)
+    albo po nieudanym sprzątaniu. Każdy `tick()` obsługuje jedną gildię (po kolei): kanały z cache
+    gildii i jedną stronę historii kanału ogłoszeń (kolejne strony w kolejnych tickach). Zasób
+    pasuje do wzorca bota (nazwa i uprawnienie dla bota albo emblemat bota), a `known_resources()`
+    zwraca indeks ID zasobów party i puli pokoi. Osierocony zasób jest usuwany dopiero, gdy przy
+    późniejszym ticku nadal jest sierotą, a od pierwszego wykrycia minęło `grace_seconds` - to
+    chroni party w trakcie tworzenia i pokoje przekazywane między pulą a party.
+
+    Usunięcia idą z klasą COSMETIC, najwyżej `max_deletes_per_tick` na tick, a tick jest pomijany,
+    gdy `is_busy()` (w kolejkach REST czeka pilniejszy ruch użytkowników).
+    """
+
+    def __init__(self, bot: disnake.Client, known_resources: Callable[[], set[int]], announce_channel_name: str,
+                 grace_seconds: float, message_page_size: int, max_deletes_per_tick: int,
+                 is_busy: Callable[[], bool]):
+        self.bot = bot
+        self.known_resources = known_resources
+        self.announce_channel_name = announce_channel_name
+        self.grace_seconds = grace_seconds
+        self.message_page_size = message_page_size
+        self.max_deletes_per_tick = max_deletes_per_tick
+        self.is_busy = is_busy
+        # ID zasobu -> (ID gildii, czy to wiadomość, moment pierwszego wykrycia jako sieroty)
+        self._candidates: dict[int, tuple[int, bool, float]] = {}
+        # ID gildii -> ID najstarszej przejrzanej wiadomości w kanale ogłoszeń (None = od najnowszych)
+        self._history_cursor: dict[int, int | None] = {}
+        self._last_guild_id = 0
+        self.ticks = 0
+        self.ticks_skipped_busy = 0
+        self.categories_deleted = 0
+        self.channels_deleted = 0
+        self.emblems_deleted = 0
+        self.delete_failures = 0
+
+    def _next_guild(self) -> disnake.Guild | None:
+        guilds = sorted(self.bot.guilds, key=lambda guild: guild.id)
+        if not guilds:
+            return None
+        guild = next((guild for guild in guilds if guild.id > self._last_guild_id), guilds[0])
+        self._last_guild_id = guild.id
+        return guild
+
+    @staticmethod
+    def _created_by_bot(guild: disnake.Guild, channel: disnake.abc.GuildChannel) -> bool:
+        # Kanały party mają jawne uprawnienia dla bota (kategoria, pula, kanał ustawień i kanały z nich zsynchronizowane)
+        return guild.me in channel.overwrites
+
+    def _orphan_channels(self, guild: disnake.Guild, known: set[int]) -> list:
+        orphans = []
+        for category in guild.categories:
+            if category.id in known or not category.name.startswith(PARTY_CATEGORY_PREFIXES):
+                continue
+            if not self._created_by_bot(guild, category) or any(channel.id in known for channel in category.channels):
+                continue
+            orphans.append(category)
+        for channel in guild.channels:
+            if isinstance(channel, disnake.CategoryChannel) or channel.id in known:
+                continue
+            category = channel.category
+            if category is not None and (category.id in known or category.name.startswith(PARTY_CATEGORY_PREFIXES)):
+                # Kanał kategorii party: należy do party albo zniknie razem z osieroconą kategorią
+                continue
+            if channel.name.startswith(PARTY_CHANNEL_PREFIXES) and self._created_by_bot(guild, channel):
+                orphans.append(channel)
+        return orphans
+
+    async def _orphan_emblems(self, guild: disnake.Guild, known: set[int]) -> tuple[list, tuple[int, int]]:
+        """Sieroce emblematy z kolejnej strony historii i zakres ID wiadomości, który ta strona objęła."""
+        channel = disnake.utils.get(guild.text_channels, name=self.announce_channel_name)
+        if channel is None:
+            return [], (0, 0)
+        cursor = self._history_cursor.get(guild.id)
+        with rest_priority(RestPriority.COSMETIC):
+            page = await channel.history(limit=self.message_page_size,
+                                         before=disnake.Object(cursor) if cursor else None).flatten()
+        # Krótka strona = doszliśmy do początku kanału; następny przegląd zaczyna od najnowszych
+        full_page = len(page) == self.message_page_size
+        self._history_cursor[guild.id] = page[-1].id if full_page else None
+        covered = (page[-1].id if full_page else 0, cursor or float("inf"))
+        return [message for message in page
+                if message.author.id == self.bot.user.id and message.id not in known and message.embeds
+                and (message.embeds[0].title or "").startswith(PARTY_EMBLEM_TITLE_PREFIX)], covered
+
+    def _prune_candidates(self, guild_id: int, seen: set[int], covered: tuple[int, int]):
+        """Kandydaci, którzy przestali być sierotami albo zniknęli: kanały przy każdym ticku gildii,
+        wiadomości - gdy strona historii objęła ich ID."""
+        for resource_id, (candidate_guild_id, is_message, _) in list(self._candidates.items()):
+            if candidate_guild_id != guild_id or resource_id in seen:
+                continue
+            if not is_message or covered[0] <= resource_id < covered[1]:
+                del self._candidates[resource_id]
+
+    async def _delete(self, guild: disnake.Guild, resource) -> bool:
+        reason = "Osierocony zasób party (brak party w danych bota)."
+        try:
+            with rest_priority(RestPriority.COSMETIC):
+                if isinstance(resource, disnake.CategoryChannel):
+                    if not await delete_category_with_channels(resource, reason=reason):
+                        self.delete_failures += 1
+                        print(f"WARN: Nie udało się usunąć osieroconej kategorii party {resource.id} "
+                              f"(lub jej kanałów) w gildii {guild.id}. Spróbuję ponownie.")
+                        return False
+                    self.categories_deleted += 1
+                elif isinstance(resource, disnake.Message):
+                    await resource.delete()
+                    self.emblems_deleted += 1
+                else:
+                    await resource.delete(reason=reason)
+                    self.channels_deleted += 1
+        except disnake.NotFound:
+            pass
+        except disnake.HTTPException as e:
+            self.delete_failures += 1
+            print(f"WARN: Nie udało się usunąć osieroconego zasobu party {resource.id} w gildii {guild.id}: {e}")
+            return False
+        print(f"INFO: Usunięto osierocony zasób party: {type(resource).__name__} {resource.id} (gildia {guild.id}).")
+        return True
+
+    async def tick(self):
+        if self.is_busy():
+            self.ticks_skipped_busy += 1
+            return
+        guild = self._next_guild()
+        if guild is None or guild.unavailable or not guild.me.guild_permissions.manage_channels:
+            return
+        self.ticks += 1
+        known = self.known_resources()
+        orphans = self._orphan_channels(guild, known)
+        covered = (0, 0)
+        try:
+            emblems, covered = await self._orphan_emblems(guild, known)
+            orphans += emblems
+        except disnake.HTTPException as e:
+            print(f"WARN: Przegląd emblematów w gildii {guild.id} nie powiódł się: {e}")
+        self._prune_candidates(guild.id, {resource.id for resource in orphans}, covered)
+        now = time.monotonic()
+        deletes_left = self.max_deletes_per_tick
+        for resource in orphans:
+            first_seen = self._candidates.setdefault(
+                resource.id, (guild.id, isinstance(resource, disnake.Message), now))[2]
+            if now - first_seen < self.grace_seconds or deletes_left <= 0:
+                continue
+            # Indeks mógł się zmienić w trakcie ticka (np. zakończone tworzenie party)
+            if resource.id in self.known_resources() or self.is_busy():
+                continue
+            deletes_left -= 1
+            if await self._delete(guild, resource):
+                self._candidates.pop(resource.id, None)
+
+    def stats(self) -> dict:
+        return {"ticks": self.ticks, "ticks_skipped_busy": self.ticks_skipped_busy,
+                "orphan_candidates": len(self._candidates), "categories_deleted": self.categories_deleted,
+                "channels_deleted": self.channels_deleted, "emblems_deleted": self.emblems_deleted,
+                "delete_failures": self.delete_failures}
@@ -1,10 +1,23 @@
 # party_bot/cogs/party_leader_actions.py
 
 import disnake
+from disnake.ext import commands
+
+from cogs.party_router import encode_custom_id
 # Usunięto 'from .. import config' - komendy w PartyManagementCog będą miały dostęp do config.
 # Funkcje tutaj będą wywoływane przez metody PartyManagementCog.
 
 class LeaderControlPanelView(disnake.ui.View):
-    def __init__(self, party_id: int):
+    # Widok trwały: rejestrowany przez bot.add_view(..., message_id=leader_panel_dm_id) przy starcie,
+    # więc przycisk działa także po restarcie bota.
+    def __init__(self, party_id: int, party_management_cog: commands.Cog):
         super().__init__(timeout=None)
-        self.add_item(disnake.ui.Button(label="Rozwiąż Party", style=disnake.ButtonStyle.danger, custom_id=f"leader_disband_{party_id}"))
\ No newline at end of file
+        self.party_id = party_id
+        self.party_cog = party_management_cog
+        disband_button = disnake.ui.Button(label="Rozwiąż Party", style=disnake.ButtonStyle.danger,
+                                           custom_id=encode_custom_id("disband", party_id))
+        disband_button.callback = self.disband_party
+        self.add_item(disband_button)
+
+    async def disband_party(self, interaction: disnake.MessageInteraction):
+        await self.party_cog.router.dispatch(interaction, from_view=True)
@@ -0,0 +1,131 @@
+# party_bot/cogs/party_mailbox.py
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from cogs.party_metrics import MetricsRegistry
+
+T = TypeVar("T")
+
+# ID party, których skrzynki wykonują bieżące zadanie - operacja zlecona z wnętrza operacji tego samego party
+# (np. rozwiązanie party z obsługi przycisku) wykonuje się od razu zamiast czekać na samą siebie
+_running_parties: contextvars.ContextVar[frozenset] = contextvars.ContextVar("party_mailbox_running",
+                                                                              default=frozenset())
+
+
+class _Envelope:
+    __slots__ = ("operation", "future", "context", "name", "submitted_at")
+
+    def __init__(self, operation: Callable[[], Awaitable], future: asyncio.Future, context: contextvars.Context,
+                 name: str):
+        self.operation = operation
+        self.future = future
+        self.context = context
+        self.name = name
+        self.submitted_at = time.perf_counter()
+
+
+class PartyMailboxes:
+    """Skrzynki operacji party: zmiany jednego party po kolei, różnych party - równolegle.
+
+    Obsługa przycisków i komend zmienia dane party przez wiele `await` (uprawnienia, kanały,
+    zapis), więc dwie przeplecione zmiany tego samego party mogą się nadpisać albo przywrócić
+    członka party, które właśnie zostało rozwiązane. `submit()` wrzuca operację do skrzynki
+    party i zwraca wołającemu jej wynik (albo rzuca jej wyjątek). Skrzynka ma własne zadanie
+    tylko wtedy, gdy coś w niej czeka - bezczynne party nic nie kosztują.
+
+    Operacja wykonuje się w kontekście wołającego (np. `rest_priority()` interakcji). Anulowanie
+    wołającego wycofuje operację, która jeszcze czeka; rozpoczęta operacja kończy się normalnie.
+    """
+
+    def __init__(self, metrics: MetricsRegistry | None = None):
+        self._queues: dict[int, deque[_Envelope]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.withdrawn = 0
+        self.reentrant = 0
+        self.max_queue_depth = 0
+        self.max_wait = 0.0
+        self._wait_seconds = None
+        if metrics is not None:
+            self._wait_seconds = metrics.histogram(
+                "party_mailbox_wait_seconds", "Czas oczekiwania operacji party w skrzynce na swoją kolej.",
+                ("operation",))
+            metrics.gauge("party_mailboxes_active", "Party z operacjami w skrzynce.", lambda: len(self._queues))
+            metrics.gauge("party_mailbox_queued", "Operacje party czekające w skrzynkach.",
+                          lambda: sum(len(queue) for queue in self._queues.values()))
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    async def submit(self, party_id: int, operation: Callable[[], Awaitable[T]], name: str = "operation") -> T:
+        """Wykonuje `operation()` w kolejce party `party_id` i zwraca jej wynik."""
+        self.submitted += 1
+        if party_id in _running_parties.get():
+            self.reentrant += 1
+            return await operation()
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(party_id, deque())
+        queue.append(_Envelope(operation, future, contextvars.copy_context(), name))
+        self.max_queue_depth = max(self.max_queue_depth, len(queue))
+        if party_id not in self._workers:
+            self._workers[party_id] = asyncio.get_running_loop().create_task(self._drain(party_id))
+        return await future
+
+    async def _run(self, party_id: int, envelope: _Envelope):
+        _running_parties.set(_running_parties.get() | {party_id})
+        return await envelope.operation()
+
+    async def _drain(self, party_id: int):
+        queue = self._queues[party_id]
+        try:
+            while queue:
+                envelope = queue.popleft()
+                if envelope.future.done():
+                    # Wołający zrezygnował, zanim przyszła kolej operacji
+                    self.withdrawn += 1
+                    continue
+                waited = time.perf_counter() - envelope.submitted_at
+                self.max_wait = max(self.max_wait, waited)
+                if self._wait_seconds is not None:
+                    self._wait_seconds.observe(waited, envelope.name)
+                # Osobne zadanie w kontekście wołającego; anulowanie wołającego go nie przerywa
+                task = asyncio.get_running_loop().create_task(self._run(party_id, envelope),
+                                                              context=envelope.context)
+                try:
+                    result = await task
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling():
+                        # Zatrzymanie skrzynek (stop) - anulowanie przechodzi też na operację
+                        envelope.future.cancel()
+                        raise
+                    self.failed += 1
+                    envelope.future.cancel()
+                    continue
+                except Exception as e:
+                    self.failed += 1
+                    if not envelope.future.done():
+                        envelope.future.set_exception(e)
+                    continue
+                self.completed += 1
+                if not envelope.future.done():
+                    envelope.future.set_result(result)
+        finally:
+            del self._workers[party_id]
+            del self._queues[party_id]
+            for envelope in queue:
+                envelope.future.cancel()
+
+    def stop(self):
+        for worker in self._workers.values():
+            worker.cancel()
+
+    def stats(self) -> dict:
+        return {"active_mailboxes": len(self._queues), "submitted": self.submitted, "completed": self.completed,
+                "failed": self.failed, "withdrawn": self.withdrawn, "reentrant": self.reentrant,
+                "max_queue_depth": self.max_queue_depth, "max_wait_ms": round(self.max_wait * 1000, 1)}
@@ -2,16 +2,343 @@ import disnake
 from disnake.ext import commands, tasks
 import asyncio
 import datetime
-import json
 import os
+import time
+from collections.abc import Mapping
 
 import config
 from cogs import party_creation_flow
-from cogs.party_join_logic import JoinRequestApprovalView
+from cogs.party_join_logic import expire_join_request, handle_join_decision, join_request_approval_buttons
 from cogs.party_leader_actions import LeaderControlPanelView
+from cogs.party_persistence import PartyJournal, PARTY_SCALAR_FIELDS
+from cogs.party_storage_sqlite import SqlitePartyStore
+from cogs.party_scheduler import DeadlineScheduler
+from cogs.party_render import PartyRenderQueue
+from cogs.party_messages import PartyMessageHandles
+from cogs.party_members import MemberResolver
+from cogs.party_metrics import LatencyRecorder, MetricsRegistry, MetricsServer, RestMetrics
+from cogs.party_outbound import RestPriority, RestScheduler, rest_priority
+from cogs.party_gc import PartyResourceCollector
+from cogs.party_mailbox import PartyMailboxes
+from cogs.party_provisioning import PartyProvisioner, delete_category_with_channels
+from cogs.party_reconcile import PartyReconciler
+from cogs.party_room_pool import PartyRoomPool
+from cogs.party_teardown import PartyTeardown
+from cogs.party_conversations import DmConversationDispatcher
+from cogs.party_sharding import PartyLeaderDirectory, ShardedPartyStore, ShardLayout, shard_file_path
+from cogs.party_cluster import (ClusterGateway, ClusterIpc, ClusterLayout, shard_ids_from_env, worker_file_path,
+                                worker_from_env)
+from cogs.party_router import ComponentPayload, ComponentRouter, decode_custom_id, encode_custom_id
+
+# Magazyn danych party: "json" (snapshot + dziennik zmian) albo "sqlite".
+PARTY_STORAGE_BACKEND = getattr(config, "PARTY_STORAGE_BACKEND", "json")
+PARTY_SQLITE_FILE = getattr(config, "PARTY_SQLITE_FILE", os.path.join(config.DATA_DIR, "party_data.sqlite3"))
+# Po nieudanym wysłaniu przypomnienia (np. zablokowane DM) ponawiamy je po tym czasie.
+EXTENSION_REMINDER_RETRY_SECONDS = config.EXTENSION_CHECK_LOOP_MINUTES * 60
+# Okno (w sekundach), w którym zmiany party są łączone w jedną edycję emblematu i embedu ustawień.
+PARTY_RENDER_COALESCE_SECONDS = getattr(config, "PARTY_RENDER_COALESCE_SECONDS", 0.75)
+# Ile kanałów jednej gildii tworzymy jednocześnie przy zakładaniu party.
+PARTY_PROVISIONING_CONCURRENCY = getattr(config, "PARTY_PROVISIONING_CONCURRENCY", 4)
+# Ile party jednocześnie sprzątamy (np. przy masowym wygasaniu) i po ilu sekundach ponawiamy nieudane usunięcie.
+PARTY_TEARDOWN_PARALLEL_PARTIES = getattr(config, "PARTY_TEARDOWN_PARALLEL_PARTIES", 8)
+PARTY_TEARDOWN_RETRY_SECONDS = getattr(config, "PARTY_TEARDOWN_RETRY_SECONDS", 30)
+# Pula gotowych (ukrytych) pokoi party na gildię; 0 wyłącza pulę.
+PARTY_ROOM_POOL_SIZE = getattr(config, "PARTY_ROOM_POOL_SIZE", 2)
+PARTY_ROOM_POOL_FILE = getattr(config, "PARTY_ROOM_POOL_FILE", os.path.join(config.DATA_DIR, "party_room_pool.json"))
+# Co ile sekund sprawdzamy, czy pulę trzeba dobudować, i ile sekund bez zakładania party oznacza spokój.
+PARTY_ROOM_POOL_REFILL_SECONDS = getattr(config, "PARTY_ROOM_POOL_REFILL_SECONDS", 60)
+PARTY_ROOM_POOL_QUIET_SECONDS = getattr(config, "PARTY_ROOM_POOL_QUIET_SECONDS", 30)
+# Kanał z dłuższą historią (maks. 100) nie wraca do puli - usunięcie pokoju jest wtedy tańsze niż czyszczenie
+PARTY_ROOM_POOL_MAX_RECYCLE_MESSAGES = getattr(config, "PARTY_ROOM_POOL_MAX_RECYCLE_MESSAGES", 50)
+# Jak długo (w sekundach) pamiętamy członków pobranych spoza cache gildii (także tych, których nie znaleziono).
+PARTY_MEMBER_CACHE_TTL_SECONDS = getattr(config, "PARTY_MEMBER_CACHE_TTL_SECONDS", 300)
+# Tworzenie party z przycisku: "dm" (kreator w wiadomościach prywatnych, domyślnie) albo "modal" (formularz, bez DM).
+PARTY_CREATION_MODE = getattr(config, "PARTY_CREATION_MODE", "dm")
+# Sprzątanie osieroconych zasobów party: co ile sekund tick (jedna gildia na tick; None wyłącza), po ilu sekundach
+# od wykrycia sierota jest usuwana, ile wiadomości kanału ogłoszeń przeglądamy na tick i ile usunięć na tick.
+PARTY_GC_INTERVAL_SECONDS = getattr(config, "PARTY_GC_INTERVAL_SECONDS", 120)
+PARTY_GC_GRACE_SECONDS = getattr(config, "PARTY_GC_GRACE_SECONDS", 15 * 60)
+PARTY_GC_MESSAGE_PAGE_SIZE = getattr(config, "PARTY_GC_MESSAGE_PAGE_SIZE", 50)
+PARTY_GC_MAX_DELETES_PER_TICK = getattr(config, "PARTY_GC_MAX_DELETES_PER_TICK", 5)
+# Ile party jednocześnie uzgadniamy ze stanem gildii po starcie (naprawa lub rozwiązanie to wywołania REST).
+PARTY_RECONCILE_CONCURRENCY = getattr(config, "PARTY_RECONCILE_CONCURRENCY", 8)
+# Początek zimnego startu (wczytanie coga, przed połączeniem z gatewayem) - do pomiaru czasu do pełnej spójności.
+PROCESS_STARTED = time.monotonic()
+# Po tylu sekundach bez decyzji lidera prośba o dołączenie wygasa.
+JOIN_REQUEST_TIMEOUT_SECONDS = getattr(config, "JOIN_REQUEST_TIMEOUT_SECONDS", 12 * 60 * 60)
+
+# Sharding: SHARD_COUNT = None to jeden proces bez podziału danych. Przy SHARD_COUNT dane party,
+# terminy i zapis są dzielone per shard (osobne pliki danych), a proces obsługuje shardy SHARD_IDS (None = wszystkie).
+SHARD_COUNT = getattr(config, "SHARD_COUNT", None)
+SHARD_IDS = shard_ids_from_env() or getattr(config, "SHARD_IDS", None)
+# Zmiana SHARD_COUNT: plik sharda jest wczytywany tylko przez proces, który ten shard obsługuje,
+# a party z niewłaściwego pliku są przenoszone do pliku swojego sharda przy starcie.
+# Wspólny dla wszystkich shardów katalog liderów (zasada "jeden lider = jedno party" ponad gildiami).
+PARTY_LEADER_DIRECTORY_FILE = getattr(config, "PARTY_LEADER_DIRECTORY_FILE",
+                                      os.path.join(config.DATA_DIR, "party_leaders.sqlite3"))
+
+# Klaster procesów (cluster.py): numer procesu i liczba procesów przychodzą w zmiennych środowiskowych.
+CLUSTER_WORKER = worker_from_env()
+CLUSTER_IPC_DIR = getattr(config, "CLUSTER_IPC_DIR", os.path.join(config.DATA_DIR, "ipc"))
+CLUSTER_IPC_TIMEOUT_SECONDS = getattr(config, "CLUSTER_IPC_TIMEOUT_SECONDS", 5.0)
+if CLUSTER_WORKER is not None:
+    # Pula pokoi jest zapisywana w całości przez swój proces - każdy proces ma własny plik
+    PARTY_ROOM_POOL_FILE = worker_file_path(PARTY_ROOM_POOL_FILE, CLUSTER_WORKER[0])
+
+# Endpoint metryk Prometheusa (http://METRICS_HOST:METRICS_PORT/metrics), np. METRICS_PORT = 9108; domyślnie
+# (None) endpoint jest wyłączony.
+# W klastrze każdy proces nasłuchuje na METRICS_PORT + numer procesu.
+METRICS_HOST = getattr(config, "METRICS_HOST", "127.0.0.1")
+METRICS_PORT = getattr(config, "METRICS_PORT", None)
+if METRICS_PORT is not None and CLUSTER_WORKER is not None:
+    METRICS_PORT += CLUSTER_WORKER[0]
+
+# Globalny limit wywołań REST bota (Discord: 50/s na token); w klastrze dzielony równo między procesy.
+PARTY_REST_GLOBAL_PER_SECOND = getattr(config, "PARTY_REST_GLOBAL_PER_SECOND", 45)
+if CLUSTER_WORKER is not None:
+    PARTY_REST_GLOBAL_PER_SECOND /= CLUSTER_WORKER[1]
+
+# Dziennik zmian party (append-only) obok snapshotu w PARTY_DATA_FILE.
+PARTY_JOURNAL_FILE = getattr(config, "PARTY_JOURNAL_FILE", config.PARTY_DATA_FILE + ".journal")
+# Okno (w sekundach), w którym wpisy dziennika są łączone w jeden zapis z fsync.
+PARTY_JOURNAL_FSYNC_INTERVAL_SECONDS = getattr(config, "PARTY_JOURNAL_FSYNC_INTERVAL_SECONDS", 0.05)
+# Po tylu wpisach dziennik jest zwijany do snapshotu.
+PARTY_JOURNAL_COMPACT_EVERY_RECORDS = getattr(config, "PARTY_JOURNAL_COMPACT_EVERY_RECORDS", 5000)
+
+
+class PartyRegistry(Mapping):
+    """Rejestr aktywnych party z indeksami po liderze, członkach, gildii i nazwie.
+
+    Odczyt działa jak zwykły dict (party_id -> dane party). Wszystkie zmiany danych party
+    muszą przechodzić przez metody rejestru: utrzymują one indeksy i przekazują każdą zmianę
+    jako mały wpis (dict z kluczem "op") do słuchaczy, np. dziennika zapisu.
+    """
+
+    INDEXED_FIELDS = frozenset({"leader_id", "guild_id", "party_name", "member_ids", "extension_reply"})
+
+    def __init__(self):
+        self._parties = {}
+        self._by_leader = {}
+        self._by_member = {}
+        self._by_guild = {}
+        self._by_name = {}
+        self._extension_replies = {}
+        self._extension_reply_channels = {}
+        self._listeners = []
+
+    # --- Mapping ---
+    def __getitem__(self, party_id: int) -> dict:
+        return self._parties[party_id]
+
+    def __iter__(self):
+        return iter(self._parties)
+
+    def __len__(self) -> int:
+        return len(self._parties)
+
+    # --- Indeksy (pomocnicze) ---
+    @staticmethod
+    def _index_add(index: dict, key, party_id: int):
+        if key is None: return
+        index.setdefault(key, set()).add(party_id)
+
+    @staticmethod
+    def _index_discard(index: dict, key, party_id: int):
+        bucket = index.get(key)
+        if bucket is None: return
+        bucket.discard(party_id)
+        if not bucket:
+            del index[key]
+
+    @staticmethod
+    def _name_key(name) -> str | None:
+        return name.strip().lower() if isinstance(name, str) else None
+
+    def _index_party(self, party_id: int, party_data: dict):
+        self._index_add(self._by_leader, party_data.get("leader_id"), party_id)
+        self._index_add(self._by_guild, party_data.get("guild_id"), party_id)
+        self._index_add(self._by_name, self._name_key(party_data.get("party_name")), party_id)
+        for member_id in party_data.get("member_ids", []):
+            self._index_add(self._by_member, member_id, party_id)
+        if party_data.get("extension_reply"):
+            self._index_extension_reply(party_id, party_data["extension_reply"])
+
+    def _unindex_party(self, party_id: int, party_data: dict):
+        self._index_discard(self._by_leader, party_data.get("leader_id"), party_id)
+        self._index_discard(self._by_guild, party_data.get("guild_id"), party_id)
+        self._index_discard(self._by_name, self._name_key(party_data.get("party_name")), party_id)
+        for member_id in party_data.get("member_ids", []):
+            self._index_discard(self._by_member, member_id, party_id)
+        self._unindex_extension_reply(party_id)
+
+    def _index_extension_reply(self, party_id: int, reply_info: dict):
+        self._unindex_extension_reply(party_id)
+        self._extension_replies[party_id] = reply_info
+        if reply_info.get("leader_dm_channel_id") is not None:
+            self._extension_reply_channels[reply_info["leader_dm_channel_id"]] = party_id
+
+    def _unindex_extension_reply(self, party_id: int) -> dict | None:
+        reply_info = self._extension_replies.pop(party_id, None)
+        if reply_info is not None and self._extension_reply_channels.get(reply_info.get("leader_dm_channel_id")) == party_id:
+            del self._extension_reply_channels[reply_info["leader_dm_channel_id"]]
+        return reply_info
+
+    # --- Słuchacze zmian ---
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, record: dict):
+        for callback in self._listeners:
+            callback(record)
+
+    # --- Mutacje ---
+    def _insert(self, party_id: int, party_data: dict):
+        old_party_data = self._parties.get(party_id)
+        if old_party_data is not None:
+            self._unindex_party(party_id, old_party_data)
+        party_data.setdefault("member_ids", [])
+        party_data.setdefault("pending_join_requests", [])
+        party_data.setdefault("pending_join_deadlines", {})
+        self._parties[party_id] = party_data
+        self._index_party(party_id, party_data)
+
+    def add(self, party_id: int, party_data: dict):
+        self._insert(party_id, party_data)
+        self._emit({"op": "create", "party_id": party_id, "data": party_data})
+
+    def pop(self, party_id: int, default=None):
+        party_data = self._parties.pop(party_id, None)
+        if party_data is None:
+            return default
+        self._unindex_party(party_id, party_data)
+        self._emit({"op": "disband", "party_id": party_id})
+        return party_data
+
+    def clear(self):
+        self._parties.clear()
+        self._by_leader.clear()
+        self._by_member.clear()
+        self._by_guild.clear()
+        self._by_name.clear()
+        self._extension_replies.clear()
+        self._extension_reply_channels.clear()
+
+    def replace_all(self, parties: dict):
+        """Podmienia cały stan (ładowanie z dysku) - bez powiadamiania słuchaczy."""
+        self.clear()
+        for party_id, party_data in parties.items():
+            self._insert(party_id, party_data)
+
+    def add_member(self, party_id: int, user_id: int) -> bool:
+        party_data = self._parties.get(party_id)
+        if party_data is None or user_id in party_data["member_ids"]:
+            return False
+        party_data["member_ids"].append(user_id)
+        self._index_add(self._by_member, user_id, party_id)
+        self._emit({"op": "member_add", "party_id": party_id, "user_id": user_id})
+        return True
+
+    def remove_member(self, party_id: int, user_id: int) -> bool:
+        party_data = self._parties.get(party_id)
+        if party_data is None or user_id not in party_data["member_ids"]:
+            return False
+        party_data["member_ids"].remove(user_id)
+        self._index_discard(self._by_member, user_id, party_id)
+        self._emit({"op": "member_remove", "party_id": party_id, "user_id": user_id})
+        return True
+
+    def add_pending_request(self, party_id: int, user_id: int, expires_at: float) -> bool:
+        party_data = self._parties.get(party_id)
+        if party_data is None or user_id in party_data["pending_join_requests"]:
+            return False
+        party_data["pending_join_requests"].append(user_id)
+        party_data["pending_join_deadlines"][str(user_id)] = expires_at
+        self._emit({"op": "pending_add", "party_id": party_id, "user_id": user_id, "expires_at": expires_at})
+        return True
+
+    def remove_pending_request(self, party_id: int, user_id: int) -> bool:
+        party_data = self._parties.get(party_id)
+        if party_data is None or user_id not in party_data["pending_join_requests"]:
+            return False
+        party_data["pending_join_requests"].remove(user_id)
+        party_data["pending_join_deadlines"].pop(str(user_id), None)
+        self._emit({"op": "pending_remove", "party_id": party_id, "user_id": user_id})
+        return True
+
+    def rename(self, party_id: int, new_name: str):
+        party_data = self._parties[party_id]
+        self._index_discard(self._by_name, self._name_key(party_data.get("party_name")), party_id)
+        party_data["party_name"] = new_name
+        self._index_add(self._by_name, self._name_key(new_name), party_id)
+        self._emit({"op": "rename", "party_id": party_id, "party_name": new_name})
+
+    def extend(self, party_id: int, expiry_timestamp: float, next_reminder_timestamp: float):
+        fields = {"expiry_timestamp": expiry_timestamp, "next_reminder_timestamp": next_reminder_timestamp,
+                  "reminder_sent_for_current_cycle": False, "extension_reminder_dm_id": None}
+        self._parties[party_id].update(fields)
+        self._emit({"op": "extend", "party_id": party_id, "fields": fields})
+
+    def set_extension_reply(self, party_id: int, reply_due_ts: float, leader_dm_channel_id: int,
+                            reminder_message_id: int | None):
+        """Zapamiętuje, że czekamy na odpowiedź lidera ws. przedłużenia (stan jest zapisywany na dysk)."""
+        party_data = self._parties.get(party_id)
+        if party_data is None:
+            return
+        reply_info = {"reply_due_ts": reply_due_ts, "leader_dm_channel_id": leader_dm_channel_id,
+                      "reminder_message_id": reminder_message_id}
+        party_data["extension_reply"] = reply_info
+        self._index_extension_reply(party_id, reply_info)
+        self._emit({"op": "update", "party_id": party_id, "fields": {"extension_reply": dict(reply_info)}})
+
+    def clear_extension_reply(self, party_id: int) -> bool:
+        party_data = self._parties.get(party_id)
+        if party_data is None or self._unindex_extension_reply(party_id) is None:
+            return False
+        party_data["extension_reply"] = None
+        self._emit({"op": "update", "party_id": party_id, "fields": {"extension_reply": None}})
+        return True
+
+    def update_fields(self, party_id: int, **fields):
+        """Zmiana pól nieindeksowanych (id wiadomości, flagi przypomnień itp.)."""
+        if self.INDEXED_FIELDS.intersection(fields):
+            raise ValueError(f"Pola indeksowane zmieniaj dedykowanymi metodami: {sorted(fields)}")
+        party_data = self._parties.get(party_id)
+        if party_data is None:
+            return
+        party_data.update(fields)
+        self._emit({"op": "update", "party_id": party_id, "fields": fields})
+
+    # --- Wyszukiwanie O(1) ---
+    @property
+    def extension_replies(self) -> dict:
+        """party_id -> dane oczekiwania na odpowiedź ws. przedłużenia. Tylko do odczytu."""
+        return self._extension_replies
+
+    def party_id_awaiting_reply_in(self, dm_channel_id: int) -> int | None:
+        """Party, którego lider ma w tym kanale DM przypomnienie o przedłużeniu czekające na odpowiedź."""
+        return self._extension_reply_channels.get(dm_channel_id)
+
+    def party_id_led_by(self, leader_id: int) -> int | None:
+        party_ids = self._by_leader.get(leader_id)
+        return next(iter(party_ids)) if party_ids else None
+
+    def party_ids_of_member(self, user_id: int) -> frozenset:
+        return frozenset(self._by_member.get(user_id, ()))
 
-active_parties = {}
-parties_awaiting_extension_reply = {}
+    def party_ids_in_guild(self, guild_id: int) -> frozenset:
+        return frozenset(self._by_guild.get(guild_id, ()))
+
+    def party_ids_named(self, party_name: str) -> frozenset:
+        return frozenset(self._by_name.get(self._name_key(party_name), ()))
+
+
+active_parties = PartyRegistry()
+# Widok tylko do odczytu; zmiany przez active_parties.set_extension_reply / clear_extension_reply
+parties_awaiting_extension_reply = active_parties.extension_replies
 
 
 def _ensure_data_dir_exists():
@@ -23,99 +350,329 @@ def _ensure_data_dir_exists():
             print(f"BŁĄD KRYTYCZNY: Nie można utworzyć katalogu danych {config.DATA_DIR}: {e}")
 
 
+def _party_data_for_storage(party_data_instance: dict) -> dict:
+    data_to_save = {field: party_data_instance.get(field) for field in PARTY_SCALAR_FIELDS}
+    data_to_save["reminder_sent_for_current_cycle"] = party_data_instance.get("reminder_sent_for_current_cycle", False)
+    data_to_save["member_ids"] = list(party_data_instance.get("member_ids", []))
+    data_to_save["pending_join_requests"] = list(party_data_instance.get("pending_join_requests", []))
+    data_to_save["pending_join_deadlines"] = dict(party_data_instance.get("pending_join_deadlines") or {})
+    extension_reply = party_data_instance.get("extension_reply")
+    data_to_save["extension_reply"] = dict(extension_reply) if extension_reply else None
+    return data_to_save
+
+
+shard_layout = ShardLayout(SHARD_COUNT, SHARD_IDS) if SHARD_COUNT else None
+leader_directory = PartyLeaderDirectory(PARTY_LEADER_DIRECTORY_FILE) if shard_layout is not None else None
+
+
+def _build_party_data_snapshot(shard_id: int | None = None) -> dict:
+    return {party_id: _party_data_for_storage(party_data_instance)
+            for party_id, party_data_instance in active_parties.items()
+            if shard_id is None or shard_layout.shard_of(party_data_instance["guild_id"]) == shard_id}
+
+
+def _create_single_party_store(shard_id: int | None = None):
+    data_file, journal_file, sqlite_file = config.PARTY_DATA_FILE, PARTY_JOURNAL_FILE, PARTY_SQLITE_FILE
+    if shard_id is not None:
+        data_file, journal_file, sqlite_file = (shard_file_path(path, shard_id)
+                                                for path in (data_file, journal_file, sqlite_file))
+    if PARTY_STORAGE_BACKEND == "sqlite":
+        return SqlitePartyStore(sqlite_file, PARTY_JOURNAL_FSYNC_INTERVAL_SECONDS)
+    if PARTY_STORAGE_BACKEND != "json":
+        print(f"WARN: Nieznany PARTY_STORAGE_BACKEND '{PARTY_STORAGE_BACKEND}'. Używam 'json'.")
+    return PartyJournal(data_file, journal_file, lambda: _build_party_data_snapshot(shard_id),
+                        PARTY_JOURNAL_FSYNC_INTERVAL_SECONDS, PARTY_JOURNAL_COMPACT_EVERY_RECORDS)
+
+
+def _create_party_store():
+    if shard_layout is not None:
+        print(f"INFO: Dane party podzielone na shardy: {shard_layout}.")
+        return ShardedPartyStore(shard_layout, _create_single_party_store)
+    return _create_single_party_store()
+
+
+_party_store = _create_party_store()
+
+
+def _store_party_change(record: dict):
+    if record["op"] == "create":
+        record = dict(record, data=_party_data_for_storage(record["data"]))
+    _party_store.append(record)
+
+
+active_parties.add_listener(_store_party_change)
+
+
 def save_party_data():
+    """Zmiany trafiają do dziennika automatycznie przez PartyRegistry; tu tylko popędzamy zapis partii w tle."""
+    _party_store.schedule_flush()
+
+
+async def commit_party_data() -> bool:
+    """Czeka, aż wszystkie dotychczasowe zmiany party będą trwale zapisane (przed potwierdzeniem użytkownikowi).
+
+    False oznacza, że zapis się nie powiódł: zmiana działa w pamięci, a magazyn ponawia zapis w tle.
+    Wołający dopisuje wtedy do potwierdzenia PARTY_DATA_UNSAVED_NOTE zamiast zgłaszać pełny sukces.
+    """
+    return await _party_store.commit()
+
+
+PARTY_DATA_UNSAVED_NOTE = ("⚠️ Zmiana działa, ale nie udało się jej jeszcze zapisać na dysku - bot ponawia zapis. "
+                           "Jeśli bot zrestartuje się wcześniej, zmiana przepadnie.")
+
+
+def flush_party_data_sync():
+    """Natychmiastowy zapis oczekujących zmian i snapshot (odładowanie coga, zamykanie bota)."""
     _ensure_data_dir_exists()
-    try:
-        data_to_save = {}
-        for party_id, party_data_instance in active_parties.items():
-            data_to_save[party_id] = {
-                "emblem_message_id": party_data_instance.get("emblem_message_id"),
-                "guild_id": party_data_instance.get("guild_id"),
-                "leader_id": party_data_instance.get("leader_id"),
-                "party_name": party_data_instance.get("party_name"),
-                "game_name": party_data_instance.get("game_name"),
-                "category_id": party_data_instance.get("category_id"),
-                "settings_channel_id": party_data_instance.get("settings_channel_id"),
-                "settings_embed_message_id": party_data_instance.get("settings_embed_message_id"),
-                "text_channel_id": party_data_instance.get("text_channel_id"),
-                "voice_channel_id": party_data_instance.get("voice_channel_id"),
-                "voice_channel_id_2": party_data_instance.get("voice_channel_id_2"),
-                "member_ids": party_data_instance.get("member_ids", []),
-                "pending_join_requests": party_data_instance.get("pending_join_requests", []),
-                "expiry_timestamp": party_data_instance.get("expiry_timestamp"),
-                "next_reminder_timestamp": party_data_instance.get("next_reminder_timestamp"),
-                "reminder_sent_for_current_cycle": party_data_instance.get("reminder_sent_for_current_cycle", False),
-                "leader_panel_dm_id": party_data_instance.get("leader_panel_dm_id"),
-                "extension_reminder_dm_id": party_data_instance.get("extension_reminder_dm_id")
-            }
-        with open(config.PARTY_DATA_FILE, 'w') as f:
-            json.dump(data_to_save, f, indent=4)
-    except IOError as e:
-        print(f"BŁĄD: Nie udało się zapisać danych party do {config.PARTY_DATA_FILE}: {e}")
-    except TypeError as e:
-        print(f"BŁĄD: Problem z serializacją danych party (TypeError): {e}")
-    except Exception as e:
-        print(f"BŁĄD KRYTYCZNY: Nieoczekiwany błąd podczas zapisywania danych party: {e}")
+    _party_store.flush_sync()
+
+
+def _sync_leader_directory():
+    """Wpisy obsługiwanych shardów w katalogu liderów odtwarzamy z właśnie wczytanych danych."""
+    if leader_directory is None:
+        return
+    leader_directory.sync_shards(shard_layout.shard_ids, {
+        party_data_instance["leader_id"]: (party_id, shard_layout.shard_of(party_data_instance["guild_id"]))
+        for party_id, party_data_instance in active_parties.items()})
 
 
 def load_party_data():
-    global active_parties
     _ensure_data_dir_exists()
-    if os.path.exists(config.PARTY_DATA_FILE):
-        try:
-            with open(config.PARTY_DATA_FILE, 'r') as f:
-                loaded_data = json.load(f)
-                active_parties = {int(k): v for k, v in loaded_data.items()}
-                print(f"INFO: Dane party załadowane z {config.PARTY_DATA_FILE}. Liczba party: {len(active_parties)}")
-                for party_id, party_data_instance in list(active_parties.items()):
-                    party_data_instance["reminder_sent_for_current_cycle"] = False
-                    if party_id in parties_awaiting_extension_reply:
-                        del parties_awaiting_extension_reply[party_id]
-        except (IOError, json.JSONDecodeError) as e:
-            print(
-                f"BŁĄD: Nie udało się załadować danych party z {config.PARTY_DATA_FILE}: {e}. Rozpoczynam z pustym stanem.")
-            active_parties = {}
-        except Exception as e:
-            print(
-                f"BŁĄD KRYTYCZNY: Nieoczekiwany błąd podczas ładowania danych party: {e}. Rozpoczynam z pustym stanem.")
-            active_parties = {}
-    else:
-        print(f"INFO: Plik danych {config.PARTY_DATA_FILE} nie istnieje. Rozpoczynam z pustym stanem.")
-        active_parties = {}
+    if not _party_store.exists():
+        if PARTY_STORAGE_BACKEND == "sqlite" and os.path.exists(config.PARTY_DATA_FILE):
+            print(f"WARN: Baza {PARTY_SQLITE_FILE} jest pusta, a istnieje plik {config.PARTY_DATA_FILE}. "
+                  f"Aby przenieść dane, uruchom: python -m cogs.party_storage_sqlite")
+        else:
+            print(f"INFO: Plik danych {config.PARTY_DATA_FILE} nie istnieje. Rozpoczynam z pustym stanem.")
+        active_parties.clear()
+        _sync_leader_directory()
+        return
+    try:
+        loaded_parties = _party_store.load()
+    except Exception as e:
+        # Nie zapisujemy snapshotu - pliki na dysku zostają nietknięte do ręcznej analizy
+        print(
+            f"BŁĄD KRYTYCZNY: Nieoczekiwany błąd podczas ładowania danych party: {e}. Rozpoczynam z pustym stanem.")
+        active_parties.clear()
+        return
+    active_parties.replace_all(loaded_parties)
+    print(f"INFO: Dane party załadowane ({PARTY_STORAGE_BACKEND}). Liczba party: {len(active_parties)}")
+    _sync_leader_directory()
+    for party_data_instance in active_parties.values():
+        # Dane sprzed zapisywania oczekujących odpowiedzi: okno odpowiedzi przepadło, więc przypomnienie wyślemy ponownie
+        if "extension_reply" not in party_data_instance:
+            party_data_instance["reminder_sent_for_current_cycle"] = False
+            party_data_instance["extension_reply"] = None
+        # Prośby o dołączenie sprzed zapisywania terminów miały przyciski bez ID party - wygasają od razu
+        join_deadlines = party_data_instance["pending_join_deadlines"]
+        for user_id in party_data_instance["pending_join_requests"]:
+            join_deadlines.setdefault(str(user_id), time.time())
+    # Dla JSON zwijamy odtworzony dziennik do świeżego snapshotu (usuwa też ewentualny urwany ostatni wpis)
+    _party_store.flush_sync()
+
+
+# Kanały party zapisane w danych (uzgadniane z cache gildii po starcie)
+_PARTY_ROOM_KEYS = ("category_id", "settings_channel_id", "text_channel_id", "voice_channel_id", "voice_channel_id_2")
 
 
 class PartySettingsView(disnake.ui.View):
     def __init__(self, party_id: int):
         super().__init__(timeout=None)
         self.add_item(disnake.ui.Button(label="Poproś o Dołączenie", style=disnake.ButtonStyle.success,
-                                        custom_id=f"settings_request_join_{party_id}"))
+                                        custom_id=encode_custom_id("join", party_id)))
         self.add_item(disnake.ui.Button(label="Opuść Party", style=disnake.ButtonStyle.danger,
-                                        custom_id=f"settings_leave_party_{party_id}"))
+                                        custom_id=encode_custom_id("leave", party_id)))
 
 
 class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
+    # Zmiany tych pól przesuwają terminy w harmonogramie
+    _DEADLINE_FIELDS = frozenset({"extension_reply", "reminder_sent_for_current_cycle", "expiry_timestamp",
+                                  "next_reminder_timestamp"})
+
     def __init__(self, bot_instance: commands.Bot):
         self.bot = bot_instance
+        self.messages = PartyMessageHandles(bot_instance)
+        self.conversations = DmConversationDispatcher()
+        self.members = MemberResolver(PARTY_MEMBER_CACHE_TTL_SECONDS)
+        self.latency = LatencyRecorder()
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
+        self.mailboxes = PartyMailboxes(self.metrics)
+        self.router = ComponentRouter(self.latency, self.metrics)
+        self._register_component_routes()
+        self.provisioner = PartyProvisioner(self.latency, PARTY_PROVISIONING_CONCURRENCY)
+        self.teardown = PartyTeardown(self.provisioner.run_limited, PARTY_TEARDOWN_PARALLEL_PARTIES,
+                                      self._schedule_teardown_retry, PARTY_TEARDOWN_RETRY_SECONDS)
+        self.room_pool = PartyRoomPool(self.provisioner, PARTY_ROOM_POOL_FILE, PARTY_ROOM_POOL_SIZE,
+                                       PARTY_ROOM_POOL_QUIET_SECONDS, PARTY_ROOM_POOL_MAX_RECYCLE_MESSAGES)
         load_party_data()
-        self.extension_check_loop.start()
+        self.deadlines = DeadlineScheduler(self._process_due_deadlines, batch_observer=self._observe_deadline_batch)
+        self.renders = PartyRenderQueue({
+            "emblem": (self._render_party_emblem, self._push_party_emblem),
+            "settings": (self._render_settings_embed, self._push_settings_embed),
+            "leader_panel": (self._render_leader_panel, self._push_leader_panel),
+        }, PARTY_RENDER_COALESCE_SECONDS, prepare=self._resolve_party_members)
+        self._leader_panel_views: dict[int, LeaderControlPanelView] = {}
+        # Widoki paneli od razu - przyciski działają, zanim uzgadnianie dojdzie do danego party
+        self._register_leader_panel_views()
+        self.reconciler = PartyReconciler(
+            lambda party_id: self.mailboxes.submit(party_id, lambda: self._reconcile_party(party_id), "reconcile"),
+            PARTY_RECONCILE_CONCURRENCY, PROCESS_STARTED)
+        active_parties.add_listener(self._on_party_change)
+        self.bot.loop.create_task(self._start_deadline_scheduler())
+        self.cluster = self._create_cluster_gateway() if CLUSTER_WORKER is not None else None
+        if self.cluster is not None:
+            self.bot.loop.create_task(self.cluster.ipc.start())
+        # RestMetrics pod kolejkami priorytetów: liczy tylko faktycznie wysłane wywołania (bez zastąpionych
+        # w kolejce), a czas wywołania nie obejmuje oczekiwania w kolejce
+        self.rest_metrics.install(self.bot.http)
+        self.outbound.install(self.bot.http)
+        _party_store.batch_observer = self._observe_store_batch
+        self.metrics_server = MetricsServer(self.metrics, METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+        if self.metrics_server is not None:
+            self.bot.loop.create_task(self.metrics_server.start())
+        if PARTY_ROOM_POOL_SIZE > 0:
+            self.room_pool.load()
+            self.room_pool_refill_loop.start()
+        self.orphan_collector = PartyResourceCollector(
+            self.bot, self._known_party_resources, config.SZUKAM_PARTY_CHANNEL_NAME, PARTY_GC_GRACE_SECONDS,
+            PARTY_GC_MESSAGE_PAGE_SIZE, PARTY_GC_MAX_DELETES_PER_TICK,
+            lambda: self.outbound.pending_before(RestPriority.COSMETIC) > 0)
+        if PARTY_GC_INTERVAL_SECONDS:
+            self.orphan_gc_loop.start()
         print("Cog 'Zarządzanie Party' został załadowany.")
 
     def cog_unload(self):
-        self.extension_check_loop.cancel()
-        save_party_data()
+        self.deadlines.stop()
+        self.mailboxes.stop()
+        self.conversations.stop()
+        self.renders.stop()
+        self.room_pool_refill_loop.cancel()
+        self.orphan_gc_loop.cancel()
+        print(f"INFO: Statystyki odświeżania wiadomości party: {self.renders.stats()}")
+        print(f"INFO: Operacje na wiadomościach party: {self.messages.stats()}")
+        print(f"INFO: Pula pokoi party: {self.room_pool.stats()}")
+        print(f"INFO: Sprzątanie party: {self.teardown.stats()}")
+        print(f"INFO: Osierocone zasoby party: {self.orphan_collector.stats()}")
+        print(f"INFO: Skrzynki operacji party: {self.mailboxes.stats()}")
+        print(f"INFO: Rozmowy w DM: {self.conversations.stats()}")
+        print(f"INFO: Rozwiązywanie członków party: {self.members.stats()}")
+        print(f"INFO: Czasy obsługi interakcji: {self.latency.summary()}")
+        print(f"INFO: Kolejki wywołań REST: {self.outbound.stats()}")
+        self.outbound.uninstall()
+        self.rest_metrics.uninstall()
+        _party_store.batch_observer = None
+        if self.metrics_server is not None:
+            self.bot.loop.create_task(self.metrics_server.stop())
+        if self.cluster is not None:
+            self.cluster.uninstall()
+            self.bot.loop.create_task(self.cluster.ipc.stop())
+            print(f"INFO: Klaster: {self.cluster.stats()}")
+        active_parties.remove_listener(self._on_party_change)
+        flush_party_data_sync()
         print("Cog 'Zarządzanie Party' został odładowany, dane zapisane.")
 
-    async def _start_party_creation_from_interaction(self, interaction: disnake.MessageInteraction):
+    # --- Metryki ---
+    def _register_metrics(self):
+        metrics = self.metrics
+        count_buckets = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+        self._command_seconds = metrics.histogram("party_command_seconds",
+                                                  "Czas obsługi komend (prefiksowych i slash).", ("command",))
+        self._command_started: dict[int, float] = {}
+        self._store_batch_seconds = metrics.histogram("party_store_batch_seconds",
+                                                      "Czas zapisu partii zmian party (save_party_data) na dysk.")
+        self._store_batch_records = metrics.histogram("party_store_batch_records",
+                                                      "Liczba zmian party w jednej zapisanej partii.",
+                                                      buckets=count_buckets)
+        self._store_batch_bytes = metrics.histogram("party_store_batch_bytes",
+                                                    "Rozmiar zapisanej partii zmian party (dziennik JSON).",
+                                                    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576))
+        # Harmonogram terminów zastąpił extension_check_loop - jego przebieg to "tick" pętli
+        self._deadline_batch_seconds = metrics.histogram("party_deadline_batch_seconds",
+                                                         "Czas obsługi partii wymagalnych terminów party.")
+        self._deadline_batch_size = metrics.histogram("party_deadline_batch_size",
+                                                      "Liczba terminów obsłużonych w jednej partii.",
+                                                      buckets=count_buckets)
+        metrics.gauge("party_deadlines_scheduled", "Zaplanowane terminy party.", lambda: len(self.deadlines))
+        metrics.gauge("party_deadlines_overdue", "Terminy, które już minęły i czekają na obsługę.",
+                      lambda: self.deadlines.overdue()[0])
+        metrics.gauge("party_deadlines_lag_seconds", "Opóźnienie najstarszego nieobsłużonego terminu.",
+                      lambda: self.deadlines.overdue()[1])
+        metrics.gauge("party_deadline_batches_running", "Partie terminów w trakcie obsługi.",
+                      lambda: self.deadlines.running_batches)
+        metrics.gauge("party_active_parties", "Aktywne party.", lambda: len(active_parties))
+        metrics.gauge("party_pending_join_requests", "Prośby o dołączenie czekające na decyzję lidera.",
+                      lambda: sum(len(party_data.get("pending_join_requests", ()))
+                                  for party_data in active_parties.values()))
+        metrics.gauge("party_pending_extension_replies", "Przypomnienia o przedłużeniu czekające na odpowiedź.",
+                      lambda: len(parties_awaiting_extension_reply))
+        metrics.gauge("party_dm_conversations_active", "Otwarte kroki rozmów w DM.", lambda: len(self.conversations))
+        metrics.gauge("party_reconcile_cold_start_seconds",
+                      "Czas od startu do zakończenia uzgadniania party ze stanem gildii (0 w trakcie).",
+                      lambda: self.reconciler.cold_start_seconds or 0)
+        self.rest_metrics = RestMetrics(metrics)
+        self.outbound = RestScheduler(PARTY_REST_GLOBAL_PER_SECOND,
+                                      lambda channel_id: isinstance(self.bot.get_channel(channel_id), disnake.DMChannel),
+                                      metrics)
+
+    def _observe_store_batch(self, seconds: float, records: int, written_bytes: int | None):
+        self._store_batch_seconds.observe(seconds)
+        self._store_batch_records.observe(records)
+        if written_bytes is not None:
+            self._store_batch_bytes.observe(written_bytes)
+
+    def _observe_deadline_batch(self, size: int, seconds: float):
+        self._deadline_batch_seconds.observe(seconds)
+        self._deadline_batch_size.observe(size)
+
+    async def cog_before_invoke(self, ctx: commands.Context):
+        self._command_started[ctx.message.id] = time.perf_counter()
+
+    async def cog_after_invoke(self, ctx: commands.Context):
+        started = self._command_started.pop(ctx.message.id, None)
+        if started is not None:
+            self._command_seconds.observe(time.perf_counter() - started, ctx.command.qualified_name)
+
+    async def cog_before_slash_command_invoke(self, inter: disnake.ApplicationCommandInteraction):
+        self._command_started[inter.id] = time.perf_counter()
+
+    async def cog_after_slash_command_invoke(self, inter: disnake.ApplicationCommandInteraction):
+        started = self._command_started.pop(inter.id, None)
+        if started is not None:
+            self._command_seconds.observe(time.perf_counter() - started,
+                                          f"/{inter.application_command.qualified_name}")
+
+    def _register_component_routes(self):
+        if PARTY_CREATION_MODE == "modal":
+            self.router.route("create", self._open_party_creation_modal, defer=False, requires_party_id=False)
+        else:
+            self.router.route("create", self._start_party_creation_from_interaction, requires_party_id=False)
+        self.router.route("create_modal", self._handle_party_creation_modal, requires_party_id=False)
+        self.router.route("extend", self._handle_extension_button_interaction)
+        self.router.route("extend_decline", self._handle_extension_button_interaction)
+        self.router.route("join", self._handle_join_request_interaction)
+        self.router.route("leave", self._handle_leave_party_interaction)
+        # Przycisk "Rozwiąż" obsługuje trwały LeaderControlPanelView
+        self.router.route("disband", self._handle_disband_button_interaction, view_only=True)
+        # ID party i proszącego są w custom_id; stare przyciski bez nich obsługuje handle_join_decision
+        self.router.route("join_accept", self._handle_join_decision_interaction, requires_party_id=False)
+        self.router.route("join_reject", self._handle_join_decision_interaction, requires_party_id=False)
+
+    async def _start_party_creation_from_interaction(self, interaction: disnake.MessageInteraction,
+                                                     payload: ComponentPayload = None):
         author = interaction.user
         guild = interaction.guild
 
-        is_already_leader = any(p_data.get("leader_id") == author.id for p_data in active_parties.values())
-        if is_already_leader:
-            leader_of_party_name = next((p_data.get("party_name", "...") for p_data in active_parties.values() if
-                                         p_data.get("leader_id") == author.id), "nieznanego party")
+        led_party_id = active_parties.party_id_led_by(author.id)
+        if led_party_id is not None:
+            leader_of_party_name = active_parties[led_party_id].get("party_name", "nieznanego party")
             msg = f"{author.mention}, jesteś już liderem party '{leader_of_party_name}'. Możesz prowadzić tylko jedno party."
             await interaction.followup.send(msg, ephemeral=True)
             return
+        if await self._leads_party_on_other_shard(author.id):
+            await interaction.followup.send(f"{author.mention}, prowadzisz już party na innym serwerze. "
+                                            f"Możesz prowadzić tylko jedno party.", ephemeral=True)
+            return
 
         try:
             dm_ch = await author.create_dm()
@@ -127,107 +684,125 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
         await interaction.followup.send(
             "Rozpoczynam proces tworzenia party w Twoich wiadomościach prywatnych (DM)... Sprawdź DM!", ephemeral=True)
 
-        selected_game = await party_creation_flow.handle_game_selection_dm(self.bot, author, dm_ch)
+        selected_game = await party_creation_flow.handle_game_selection_dm(self.conversations, author, dm_ch)
         if not selected_game: return
 
-        party_name_input = await party_creation_flow.handle_party_name_dm(self.bot, author, dm_ch)
+        party_name_input = await party_creation_flow.handle_party_name_dm(self.conversations, author, dm_ch)
         if not party_name_input: return
 
-        leader = author
+        party_id = await self._create_party(guild, author, selected_game, party_name_input, dm_ch.send)
+        if party_id is None: return
+        try:
+            await dm_ch.send(f"Party '{party_name_input}' stworzone! Panel zarządzania został wysłany.",
+                             delete_after=config.DM_MESSAGE_DELETE_DELAY)
+        except disnake.HTTPException:
+            pass
 
-        szukam_ch = disnake.utils.get(guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME)
-        if not szukam_ch:
-            await dm_ch.send(
-                f"Krytyczny błąd: Kanał `#{config.SZUKAM_PARTY_CHANNEL_NAME}` (do ogłoszeń party) nie został znaleziony na serwerze '{guild.name}'.")
+    async def _open_party_creation_modal(self, interaction: disnake.MessageInteraction,
+                                         payload: ComponentPayload = None):
+        # Bez defer: odpowiedzią na kliknięcie jest sam formularz
+        led_party_id = active_parties.party_id_led_by(interaction.user.id)
+        if led_party_id is not None:
+            leader_of_party_name = active_parties[led_party_id].get("party_name", "nieznanego party")
+            await interaction.response.send_message(
+                f"{interaction.user.mention}, jesteś już liderem party '{leader_of_party_name}'. "
+                f"Możesz prowadzić tylko jedno party.", ephemeral=True)
+            return
+        if await self._leads_party_on_other_shard(interaction.user.id):
+            await interaction.response.send_message(
+                f"{interaction.user.mention}, prowadzisz już party na innym serwerze. "
+                f"Możesz prowadzić tylko jedno party.", ephemeral=True)
             return
+        await interaction.response.send_modal(party_creation_flow.build_party_creation_modal())
 
-        cat_name = f"🎉 {party_name_input} ({leader.display_name})"
-        category_overwrites = {
-            guild.default_role: disnake.PermissionOverwrite(
-                view_channel=True, read_messages=True, send_messages=False, connect=False, speak=False,
-                create_public_threads=False, create_private_threads=False, send_messages_in_threads=False
-            ),
-            guild.me: disnake.PermissionOverwrite(
-                view_channel=True, manage_channels=True, manage_permissions=True, read_messages=True,
-                send_messages=True,
-                connect=True, speak=True, create_public_threads=True, create_private_threads=True,
-                send_messages_in_threads=True, manage_threads=True
-            ),
-            leader: disnake.PermissionOverwrite(
-                view_channel=True, read_messages=True, send_messages=True, connect=True, speak=True,
-                manage_messages=True,
-                mute_members=True, deafen_members=True, move_members=True, create_public_threads=True,
-                create_private_threads=True, send_messages_in_threads=True
-            )
-        }
-        category, settings_ch, text_ch, voice_ch1, voice_ch2 = None, None, None, None, None
-        try:
-            category = await guild.create_category(name=cat_name, overwrites=category_overwrites)
-            settings_ch_name = f"📌︱info-{party_name_input[:20]}"
-            settings_ch_overwrites = {
-                guild.default_role: disnake.PermissionOverwrite(send_messages=False, add_reactions=False,
-                                                                create_public_threads=False,
-                                                                create_private_threads=False,
-                                                                send_messages_in_threads=False),
-                guild.me: disnake.PermissionOverwrite(send_messages=True, embed_links=True, manage_messages=True)
-            }
-            settings_ch = await category.create_text_channel(name=settings_ch_name, overwrites=settings_ch_overwrites)
-            text_ch_name = f"💬︱{party_name_input[:20]}"
-            text_ch = await category.create_text_channel(name=text_ch_name)
-            await text_ch.send(
-                f"Witaj w party **{party_name_input}**! Lider: {leader.mention}. Gra: **{selected_game}**.")
-            voice_ch1_name = f"🔊︱Głos 1 ({party_name_input[:15]})"
-            voice_ch1 = await category.create_voice_channel(name=voice_ch1_name)
-            voice_ch2_name = f"🔊︱Głos 2 ({party_name_input[:15]})"
-            voice_ch2 = await category.create_voice_channel(name=voice_ch2_name)
-        except disnake.HTTPException as e:
-            await dm_ch.send(f"Nie udało się stworzyć kanałów: {e}.")
-            if category:
-                for c_del in list(category.channels):
-                    try:
-                        await c_del.delete()
-                    except disnake.HTTPException:
-                        pass
-                try:
-                    await category.delete()
-                except disnake.HTTPException:
-                    pass
+    @staticmethod
+    async def _leads_party_on_other_shard(user_id: int) -> bool:
+        """Party w gildiach innych shardów zna tylko wspólny katalog liderów (rejestr procesu - tylko swoje)."""
+        return leader_directory is not None and await leader_directory.leads_party(user_id)
+
+    async def _handle_party_creation_modal(self, interaction: disnake.ModalInteraction, payload: ComponentPayload):
+        author = interaction.user
+        selected_game = party_creation_flow.parse_game_choice(interaction.text_values.get("game", ""))
+        party_name_input = interaction.text_values.get("party_name", "").strip()
+        if selected_game is None:
+            await interaction.followup.send(
+                f"Nieznana gra. Wpisz numer lub nazwę: {party_creation_flow.game_choices_hint()}.", ephemeral=True)
+            return
+        if not 0 < len(party_name_input) <= config.MAX_PARTY_NAME_LENGTH:
+            await interaction.followup.send(
+                f"Nieprawidłowa nazwa. Nazwa musi mieć od 1 do {config.MAX_PARTY_NAME_LENGTH} znaków.", ephemeral=True)
+            return
+        # Sprawdzamy ponownie - formularz mógł być otwarty, zanim użytkownik założył inne party
+        led_party_id = active_parties.party_id_led_by(author.id)
+        if led_party_id is not None:
+            await interaction.followup.send("Prowadzisz już inne party. Możesz prowadzić tylko jedno party.",
+                                            ephemeral=True)
             return
 
-        emb = disnake.Embed(title=f"✨ Nowe Party: {party_name_input}", description="Poproś o dołączenie!",
-                            color=disnake.Color.green())
-        emb.add_field(name="🎮 Gra", value=selected_game, inline=True)
-        emb.add_field(name="👑 Lider", value=leader.mention, inline=True)
-        emb.add_field(name="👥 Członkowie", value=leader.mention, inline=False)
-        emb.set_footer(text="ID Party zostanie przypisane po wysłaniu.")
-        pub_join_view = disnake.ui.View(timeout=None)
-        pub_join_btn = disnake.ui.Button(label="Poproś o Dołączenie", style=disnake.ButtonStyle.primary,
-                                         custom_id=f"request_join_party_TEMP_ID")
-        pub_join_view.add_item(pub_join_btn)
-        emblem_message = None
+        async def notify(content: str):
+            await interaction.followup.send(content, ephemeral=True)
+
+        party_id = await self._create_party(interaction.guild, author, selected_game, party_name_input, notify)
+        if party_id is None: return
+        await interaction.followup.send(
+            f"Party '{party_name_input}' stworzone! Panel zarządzania został wysłany w DM.", ephemeral=True)
+
+    async def _create_party(self, guild: disnake.Guild, leader: disnake.Member, selected_game: str,
+                            party_name_input: str, notify) -> int | None:
+        """Tworzy kanały, ogłoszenie i wpis party; błędy zgłasza przez notify(treść). Zwraca ID party albo None."""
+        if leader_directory is None:
+            return await self._build_new_party(guild, leader, selected_game, party_name_input, notify)
+        # Przy shardingu lider jest rezerwowany we wspólnym katalogu, zanim powstaną kanały
+        if not await leader_directory.claim(leader.id, shard_layout.shard_of(guild.id)):
+            await notify("Prowadzisz już party (być może na innym serwerze). Możesz prowadzić tylko jedno party.")
+            return None
+        party_id = None
         try:
-            emblem_message = await szukam_ch.send(embed=emb, view=pub_join_view)
-        except disnake.HTTPException as e:
-            await dm_ch.send(f"Nie udało się opublikować ogłoszenia: {e}")
-            if category:
-                for c_del in list(category.channels):
-                    try:
-                        await c_del.delete()
-                    except disnake.HTTPException:
-                        pass
+            party_id = await self._build_new_party(guild, leader, selected_game, party_name_input, notify)
+        finally:
+            if party_id is None:
+                await leader_directory.release(leader.id, None)
+            else:
+                await leader_directory.assign(leader.id, party_id)
+        return party_id
+
+    async def _build_new_party(self, guild: disnake.Guild, leader: disnake.Member, selected_game: str,
+                               party_name_input: str, notify) -> int | None:
+        szukam_ch = disnake.utils.get(guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME)
+        if not szukam_ch:
+            await notify(
+                f"Krytyczny błąd: Kanał `#{config.SZUKAM_PARTY_CHANNEL_NAME}` (do ogłoszeń party) nie został znaleziony na serwerze '{guild.name}'.")
+            return None
+
+        provisioning_started = time.perf_counter()
+        rooms, emblem_message = await asyncio.gather(
+            self._provision_party_rooms(guild, leader, party_name_input, selected_game),
+            self._post_new_party_emblem(szukam_ch, leader, party_name_input, selected_game),
+            return_exceptions=True)
+        rooms_failed, emblem_failed = isinstance(rooms, BaseException), isinstance(emblem_message, BaseException)
+        if rooms_failed or emblem_failed:
+            # Sprzątamy tę część, która się udała (provisioner sam usuwa niedokończone kanały)
+            if not rooms_failed:
+                await delete_category_with_channels(rooms.category)
+            if not emblem_failed:
                 try:
-                    await category.delete()
+                    await emblem_message.delete()
                 except disnake.HTTPException:
                     pass
-            return
-
+            for failure in (rooms, emblem_message):
+                if isinstance(failure, BaseException) and not isinstance(failure, disnake.HTTPException):
+                    raise failure
+            if rooms_failed:
+                await notify(f"Nie udało się stworzyć kanałów: {rooms}.")
+            if emblem_failed:
+                await notify(f"Nie udało się opublikować ogłoszenia: {emblem_message}")
+            return None
+        category, settings_ch, text_ch = rooms.category, rooms.settings_channel, rooms.text_channel
+        voice_ch1, voice_ch2 = rooms.voice_channel, rooms.voice_channel_2
         party_id = emblem_message.id
-        pub_join_btn.custom_id = f"request_join_party_{party_id}"
-        emb.set_footer(text=f"ID Party: {party_id}")
-        try:
-            await emblem_message.edit(embed=emb, view=pub_join_view)
-        except disnake.HTTPException as e:
-            print(f"WARN: Aktualizacja custom_id przycisku dla '{party_name_input}': {e}")
+        self.latency.record("party_create_provisioning", time.perf_counter() - provisioning_started)
+        print(f"INFO: Kanały i ogłoszenie party '{party_name_input}' gotowe. "
+              f"{self.latency.format('party_create_provisioning')}")
 
         init_exp_ts = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
             hours=config.PARTY_LIFESPAN_HOURS)).timestamp()
@@ -236,7 +811,7 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
         if config.PARTY_LIFESPAN_HOURS <= config.EXTENSION_REMINDER_HOURS_BEFORE_EXPIRY:
             next_rem_ts = init_exp_ts
 
-        active_parties[party_id] = {
+        active_parties.add(party_id, {
             "emblem_message_id": party_id, "guild_id": guild.id, "leader_id": leader.id,
             "party_name": party_name_input, "game_name": selected_game,
             "category_id": category.id if category else None,
@@ -247,15 +822,44 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
             "member_ids": [leader.id], "pending_join_requests": [],
             "expiry_timestamp": init_exp_ts, "next_reminder_timestamp": next_rem_ts,
             "reminder_sent_for_current_cycle": False, "leader_panel_dm_id": None, "extension_reminder_dm_id": None
-        }
-        if settings_ch: await self._update_settings_embed(party_id)
-        save_party_data()
-        try:
-            await dm_ch.send(f"Party '{party_name_input}' stworzone! Panel zarządzania został wysłany.",
-                             delete_after=config.DM_MESSAGE_DELETE_DELAY)
-        except disnake.HTTPException:
-            pass
+        })
+        if settings_ch: self.request_party_render(party_id, "settings")
+        if not await commit_party_data():
+            await notify(PARTY_DATA_UNSAVED_NOTE)
         await self.send_leader_control_panel(leader, party_id)
+        return party_id
+
+    async def _provision_party_rooms(self, guild: disnake.Guild, leader: disnake.Member, party_name: str,
+                                     game_name: str):
+        with self.latency.measure("provision_rooms"):
+            rooms = await self.room_pool.claim(guild, leader, party_name, game_name) if PARTY_ROOM_POOL_SIZE > 0 else None
+            if rooms is None:
+                rooms = await self.provisioner.create_party_rooms(guild, leader, party_name, game_name)
+        return rooms
+
+    async def _post_new_party_emblem(self, szukam_ch: disnake.TextChannel, leader: disnake.Member,
+                                     party_name: str, game_name: str) -> disnake.Message:
+        """Publikuje ogłoszenie party i ustawia w przycisku jego ID (ID wiadomości = ID party)."""
+        emb = disnake.Embed(title=f"✨ Nowe Party: {party_name}", description="Poproś o dołączenie!",
+                            color=disnake.Color.green())
+        emb.add_field(name="🎮 Gra", value=game_name, inline=True)
+        emb.add_field(name="👑 Lider", value=leader.mention, inline=True)
+        emb.add_field(name="👥 Członkowie", value=leader.mention, inline=False)
+        emb.set_footer(text="ID Party zostanie przypisane po wysłaniu.")
+        pub_join_view = disnake.ui.View(timeout=None)
+        pub_join_btn = disnake.ui.Button(label="Poproś o Dołączenie", style=disnake.ButtonStyle.primary,
+                                         custom_id=encode_custom_id("join"))
+        pub_join_view.add_item(pub_join_btn)
+        with self.latency.measure("provision_emblem"):
+            emblem_message = await szukam_ch.send(embed=emb, view=pub_join_view)
+        pub_join_btn.custom_id = encode_custom_id("join", emblem_message.id)
+        emb.set_footer(text=f"ID Party: {emblem_message.id}")
+        try:
+            with self.latency.measure("provision_emblem"):
+                await emblem_message.edit(embed=emb, view=pub_join_view)
+        except disnake.HTTPException as e:
+            print(f"WARN: Aktualizacja custom_id przycisku dla '{party_name}': {e}")
+        return emblem_message
 
     # --- NOWA KOMENDA SLASH ---
     @commands.slash_command(
@@ -299,7 +903,8 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
             title="🎉 Stwórz Nowe Party!",
             description=(
                 "Kliknij poniższy przycisk, aby rozpocząć proces tworzenia party.\n"
-                "Zostaniesz poprowadzony przez kolejne kroki w wiadomościach prywatnych (DM)."
+                + ("Wybierz grę i podaj nazwę party w formularzu." if PARTY_CREATION_MODE == "modal" else
+                   "Zostaniesz poprowadzony przez kolejne kroki w wiadomościach prywatnych (DM).")
             ),
             color=disnake.Color.green()
         )
@@ -307,7 +912,7 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
         view.add_item(disnake.ui.Button(
             label="Stwórz Party",
             style=disnake.ButtonStyle.success,
-            custom_id="create_new_party_button_from_setup",
+            custom_id=encode_custom_id("create"),
             emoji="🎉"
         ))
 
@@ -356,17 +961,27 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
 
     # --- KONIEC NOWEJ KOMENDY SLASH ---
 
-    async def _update_settings_embed(self, party_id: int):
+    # --- Odświeżanie wiadomości party (przez PartyRenderQueue) ---
+    def request_party_render(self, party_id: int, *targets: str):
+        """Oznacza wiadomości party do odświeżenia: "emblem", "settings", "leader_panel" (domyślnie wszystkie)."""
+        self.renders.mark_dirty(party_id, *targets)
+
+    async def _resolve_party_members(self, party_id: int):
+        """Jedno rozwiązanie lidera i członków na partię odświeżeń - wspólne dla wszystkich wiadomości party."""
         party_data = active_parties.get(party_id)
-        if not party_data or not party_data.get("settings_channel_id"):
-            return
+        if not party_data: return
         guild = self.bot.get_guild(party_data["guild_id"])
         if not guild: return
-        settings_channel = guild.get_channel(party_data["settings_channel_id"])
-        if not settings_channel or not isinstance(settings_channel, disnake.TextChannel): return
-        leader = guild.get_member(party_data["leader_id"])
-        members_mentions = [guild.get_member(mid).mention if guild.get_member(mid) else f"ID:{mid}" for mid in
-                            party_data.get("member_ids", [])]
+        await self.members.resolve(guild, [party_data["leader_id"], *party_data.get("member_ids", [])])
+
+    def _render_settings_embed(self, party_id: int):
+        party_data = active_parties.get(party_id)
+        if not party_data or not party_data.get("settings_channel_id"):
+            return None
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if not guild: return None
+        leader = self.members.get(guild, party_data["leader_id"])
+        members_mentions = [self.members.mention(guild, mid) for mid in party_data.get("member_ids", [])]
         embed_title = f"⚙️ Informacje o Party: {party_data['party_name']}"
         embed_color = disnake.Color.dark_grey()
         embed = disnake.Embed(title=embed_title, color=embed_color)
@@ -376,155 +991,187 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
                         value="\n".join(members_mentions) if members_mentions else "Brak członków.", inline=False)
         embed.add_field(name="🆔 ID Party (Emblematu Głównego)", value=f"`{party_id}`",
                         inline=False)
-        view = PartySettingsView(party_id)
+        return embed, PartySettingsView(party_id)
+
+    async def _push_settings_embed(self, party_id: int, embed: disnake.Embed, view: disnake.ui.View) -> bool:
+        party_data = active_parties.get(party_id)
+        if not party_data: return False
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if not guild: return False
+        settings_channel = guild.get_channel(party_data["settings_channel_id"])
+        if not settings_channel or not isinstance(settings_channel, disnake.TextChannel): return False
         if party_data.get("settings_embed_message_id"):
             try:
-                settings_embed_msg = await settings_channel.fetch_message(party_data["settings_embed_message_id"])
-                await settings_embed_msg.edit(embed=embed, view=view)
-                return
+                await self.messages.edit(
+                    "settings_edit", settings_channel.get_partial_message(party_data["settings_embed_message_id"]),
+                    embed=embed, view=view)
+                return True
             except disnake.NotFound:
                 print(f"INFO: Poprzednia wiadomość embedu ustawień dla party {party_id} nie znaleziona. Tworzę nową.")
-                party_data["settings_embed_message_id"] = None
+                active_parties.update_fields(party_id, settings_embed_message_id=None)
             except disnake.HTTPException as e:
                 print(f"BŁĄD: Aktualizacja embedu ustawień dla party {party_id} nie powiodła się (HTTPException): {e}")
-                party_data["settings_embed_message_id"] = None
+                active_parties.update_fields(party_id, settings_embed_message_id=None)
             except Exception as e:
                 print(f"BŁĄD: Nieoczekiwany błąd podczas aktualizacji embedu ustawień dla party {party_id}: {e}")
-                party_data["settings_embed_message_id"] = None
+                active_parties.update_fields(party_id, settings_embed_message_id=None)
         try:
             new_settings_embed_msg = await settings_channel.send(embed=embed, view=view)
-            party_data["settings_embed_message_id"] = new_settings_embed_msg.id
+            active_parties.update_fields(party_id, settings_embed_message_id=new_settings_embed_msg.id)
             save_party_data()
+            return True
         except disnake.Forbidden:
             print(f"BŁĄD: Bot nie ma uprawnień do wysyłania wiadomości na kanale ustawień party {party_id}.")
         except Exception as e:
             print(f"BŁĄD: Wysyłanie nowego embedu ustawień dla party {party_id}: {e}")
+        return False
 
-    async def _update_party_emblem(self, party_id: int):
+    def _render_party_emblem(self, party_id: int):
         party_data = active_parties.get(party_id)
-        if not party_data: return
+        if not party_data: return None
         guild = self.bot.get_guild(party_data["guild_id"])
-        if not guild: return
+        if not guild: return None
+        leader = self.members.get(guild, party_data["leader_id"])
+        members_mentions = [self.members.mention(guild, mid) for mid in party_data.get("member_ids", [])]
+        embed = disnake.Embed(title=f"✨ Party: {party_data['party_name']}",
+                              description="Poproś o dołączenie!",
+                              color=disnake.Color.blurple())
+        embed.add_field(name="🎮 Gra", value=party_data["game_name"], inline=True)
+        embed.add_field(name="👑 Lider", value=leader.mention if leader else f"ID:{party_data['leader_id']}",
+                        inline=True)
+        embed.add_field(name="👥 Członkowie", value="\n".join(members_mentions) if members_mentions else "Brak",
+                        inline=False)
+        embed.set_footer(text=f"ID Party: {party_id}")
+        view = disnake.ui.View(timeout=None)
+        view.add_item(disnake.ui.Button(label="Poproś o Dołączenie", style=disnake.ButtonStyle.primary,
+                                        custom_id=encode_custom_id("join", party_id)))
+        return embed, view
+
+    async def _push_party_emblem(self, party_id: int, embed: disnake.Embed, view: disnake.ui.View) -> bool:
+        party_data = active_parties.get(party_id)
+        if not party_data: return False
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if not guild: return False
         szukam_party_channel = disnake.utils.get(guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME)
-        if not szukam_party_channel: return
+        if not szukam_party_channel: return False
         try:
-            emblem_message = await szukam_party_channel.fetch_message(party_data["emblem_message_id"])
-            leader = guild.get_member(party_data["leader_id"])
-            members_mentions = [guild.get_member(mid).mention if guild.get_member(mid) else f"ID:{mid}" for mid in
-                                party_data.get("member_ids", [])]
-            embed = disnake.Embed(title=f"✨ Party: {party_data['party_name']}",
-                                  description="Poproś o dołączenie!",
-                                  color=disnake.Color.blurple())
-            embed.add_field(name="🎮 Gra", value=party_data["game_name"], inline=True)
-            embed.add_field(name="👑 Lider", value=leader.mention if leader else f"ID:{party_data['leader_id']}",
-                            inline=True)
-            embed.add_field(name="👥 Członkowie", value="\n".join(members_mentions) if members_mentions else "Brak",
-                            inline=False)
-            embed.set_footer(text=f"ID Party: {party_id}")
-            view = disnake.ui.View(timeout=None)
-            view.add_item(disnake.ui.Button(label="Poproś o Dołączenie", style=disnake.ButtonStyle.primary,
-                                            custom_id=f"request_join_party_{party_id}"))
-            await emblem_message.edit(embed=embed, view=view)
+            await self.messages.edit("emblem_edit",
+                                     szukam_party_channel.get_partial_message(party_data["emblem_message_id"]),
+                                     embed=embed, view=view)
+            return True
         except disnake.NotFound:
             print(
                 f"INFO: Nie znaleziono emblematu {party_data.get('emblem_message_id')} dla '{party_data.get('party_name')}'. Mógł zostać usunięty.")
         except Exception as e:
             print(f"BŁĄD: Aktualizacja emblematu '{party_data.get('party_name')}': {e}")
+        return False
 
     async def send_leader_control_panel(self, leader: disnake.User, party_id: int):
+        """Odświeża panel lidera (jedna wiadomość DM edytowana w miejscu, zmiany łączone w oknie)."""
+        self.request_party_render(party_id, "leader_panel")
+
+    def _leader_panel_view(self, party_id: int) -> LeaderControlPanelView:
+        view = self._leader_panel_views.get(party_id)
+        if view is None:
+            view = self._leader_panel_views[party_id] = LeaderControlPanelView(party_id, self)
+        return view
+
+    def _register_leader_panel_views(self):
+        for party_id, party_data in active_parties.items():
+            if party_data.get("leader_panel_dm_id"):
+                self.bot.add_view(self._leader_panel_view(party_id), message_id=party_data["leader_panel_dm_id"])
+
+    def _render_leader_panel(self, party_id: int):
         party_data = active_parties.get(party_id)
-        if not party_data: return
+        if not party_data: return None
+        guild = self.bot.get_guild(party_data["guild_id"])
+        members_list_str = [f"- {self.members.mention(guild, m_id)} (`{m_id}`)"
+                            for m_id in party_data.get("member_ids", [])]
+        embed = disnake.Embed(
+            title=f"🛠️ Panel Party: {party_data['party_name']}",
+            description=f"**Gra:** {party_data['game_name']}\n**Wygasa:** <t:{int(party_data['expiry_timestamp'])}:F> (<t:{int(party_data['expiry_timestamp'])}:R>)",
+            color=disnake.Color.gold()
+        )
+        embed.add_field(name="👥 Aktualni Członkowie:",
+                        value="\n".join(members_list_str) if members_list_str else "Brak", inline=False)
+        embed.add_field(
+            name="Akcje (komendy w tej konwersacji DM):",
+            value=(f"- `{config.DEFAULT_COMMAND_PREFIX}usun_czlonka ID_lub_@wzmianka`\n"
+                   f"- `{config.DEFAULT_COMMAND_PREFIX}zmien_nazwe_party nowa nazwa`\n"
+                   f"- `{config.DEFAULT_COMMAND_PREFIX}lista_czlonkow` (odświeża ten panel)\n"
+                   f"- `{config.DEFAULT_COMMAND_PREFIX}opusc ID_party_lub_nazwa_party`\n"
+                   f"*(Przycisk 'Rozwiąż Party' jest poniżej)*"),
+            inline=False
+        )
+        embed.set_footer(text=f"ID Twojego Party (dla bota): {party_id}")
+        return embed, self._leader_panel_view(party_id)
+
+    async def _push_leader_panel(self, party_id: int, embed: disnake.Embed, view: disnake.ui.View) -> bool:
+        party_data = active_parties.get(party_id)
+        if not party_data: return False
+        leader = self.bot.get_user(party_data["leader_id"])
         try:
-            dm_channel = await leader.create_dm()
-            guild = self.bot.get_guild(party_data["guild_id"])
-            members_list_str = [
-                f"- {guild.get_member(m_id).mention if guild and guild.get_member(m_id) else f'ID:{m_id}'} (`{m_id}`)"
-                for m_id in party_data.get("member_ids", [])
-            ]
-            embed = disnake.Embed(
-                title=f"🛠️ Panel Party: {party_data['party_name']}",
-                description=f"**Gra:** {party_data['game_name']}\n**Wygasa:** <t:{int(party_data['expiry_timestamp'])}:F> (<t:{int(party_data['expiry_timestamp'])}:R>)",
-                color=disnake.Color.gold()
-            )
-            embed.add_field(name="👥 Aktualni Członkowie:",
-                            value="\n".join(members_list_str) if members_list_str else "Brak", inline=False)
-            embed.add_field(
-                name="Akcje (komendy w tej konwersacji DM):",
-                value=(f"- `{config.DEFAULT_COMMAND_PREFIX}usun_czlonka ID_lub_@wzmianka`\n"
-                       f"- `{config.DEFAULT_COMMAND_PREFIX}zmien_nazwe_party nowa nazwa`\n"
-                       f"- `{config.DEFAULT_COMMAND_PREFIX}lista_czlonkow` (odświeża ten panel)\n"
-                       f"- `{config.DEFAULT_COMMAND_PREFIX}opusc ID_party_lub_nazwa_party`\n"
-                       f"*(Przycisk 'Rozwiąż Party' jest poniżej)*"),
-                inline=False
-            )
-            embed.set_footer(text=f"ID Twojego Party (dla bota): {party_id}")
-            view = LeaderControlPanelView(party_id)
+            if not leader:
+                leader = await self.bot.fetch_user(party_data["leader_id"])
             if party_data.get("leader_panel_dm_id"):
                 try:
-                    old_panel_msg = await dm_channel.fetch_message(party_data["leader_panel_dm_id"])
-                    await old_panel_msg.delete()
-                except (disnake.NotFound, disnake.Forbidden, disnake.HTTPException):
-                    pass
-                party_data["leader_panel_dm_id"] = None
-            new_panel_msg = await dm_channel.send(embed=embed, view=view)
-            party_data["leader_panel_dm_id"] = new_panel_msg.id
+                    await self.messages.edit("panel_edit", await self.messages.dm_partial(
+                        leader, party_data["leader_panel_dm_id"]), embed=embed, view=view)
+                    return True
+                except disnake.NotFound:
+                    # Lider usunął panel - wysyłamy nowy
+                    active_parties.update_fields(party_id, leader_panel_dm_id=None)
+            new_panel_msg = await leader.send(embed=embed, view=view)
+            active_parties.update_fields(party_id, leader_panel_dm_id=new_panel_msg.id)
             save_party_data()
+            return True
         except disnake.Forbidden:
             print(f"DM ERR: Nie można wysłać panelu lidera do {leader.name} ({leader.id}).")
         except Exception as e:
             print(f"ERR: Nieoczekiwany błąd przy wysyłaniu panelu lidera: {e} (Typ: {type(e)})")
+        return False
+
+    async def _delete_leader_panel(self, party_data: dict):
+        leader_for_panel_dm = self.bot.get_user(party_data["leader_id"])
+        if leader_for_panel_dm and party_data.get("leader_panel_dm_id"):
+            try:
+                panel_message = await self.messages.dm_partial(leader_for_panel_dm, party_data["leader_panel_dm_id"])
+            except disnake.HTTPException:
+                return
+            # Limit per kanał DM lidera, a nie wspólny dla wszystkich DM
+            await self.teardown.delete(panel_message.channel.id, panel_message)
+
+    async def _delete_party_emblem(self, guild: disnake.Guild, party_data: dict):
+        if not party_data.get("emblem_message_id"): return
+        szukam_ch = disnake.utils.get(guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME)
+        if szukam_ch:
+            await self.teardown.delete(guild.id, szukam_ch.get_partial_message(party_data["emblem_message_id"]))
+
+    async def _teardown_party_rooms(self, guild: disnake.Guild, party_id: int, party_data: dict, reason: str):
+        if PARTY_ROOM_POOL_SIZE > 0 and await self.room_pool.recycle(guild, party_data):
+            print(f"INFO: Kanały party {party_id} wróciły do puli (w puli: {self.room_pool.size(guild.id)}).")
+            return
+        category = guild.get_channel(party_data["category_id"]) if party_data.get("category_id") else None
+        if category and isinstance(category, disnake.CategoryChannel):
+            children = {ch.id: ch for ch in category.channels}
+            for ch_key in ("settings_channel_id", "text_channel_id", "voice_channel_id", "voice_channel_id_2"):
+                channel = guild.get_channel(party_data.get(ch_key) or 0)
+                if channel and channel.category_id == category.id: children[channel.id] = channel
+            # Najpierw kanały (równolegle), potem kategoria - żeby nie zostawić kanałów bez kategorii
+            await self.teardown.delete_tree(guild.id, list(children.values()), category, reason=reason)
+        else:
+            channels_to_delete = [guild.get_channel(party_data[ch_key]) for ch_key in
+                                  ("settings_channel_id", "text_channel_id", "voice_channel_id", "voice_channel_id_2")
+                                  if party_data.get(ch_key)]
+            await self.teardown.delete_all(guild.id, [ch for ch in channels_to_delete if ch],
+                                           reason=f"{reason} (kanał poza kategorią lub kategoria nie znaleziona)")
 
     async def disband_party(self, party_id: int, reason: str = "Party rozwiązane."):
-        party_data = active_parties.pop(party_id, None)
+        party_data = await self.mailboxes.submit(party_id, lambda: self._disband_party(party_id, reason), "disband")
         if not party_data: return
-        if party_id in parties_awaiting_extension_reply: del parties_awaiting_extension_reply[party_id]
-        guild = self.bot.get_guild(party_data["guild_id"])
-        if guild:
-            leader_for_panel_dm = self.bot.get_user(party_data["leader_id"])
-            if leader_for_panel_dm and party_data.get("leader_panel_dm_id"):
-                try:
-                    dm_ch = await leader_for_panel_dm.create_dm()
-                    msg_to_delete = await dm_ch.fetch_message(party_data["leader_panel_dm_id"])
-                    await msg_to_delete.delete()
-                except (disnake.NotFound, disnake.Forbidden, disnake.HTTPException):
-                    pass
-            if party_data.get("category_id"):
-                category = guild.get_channel(party_data["category_id"])
-                if category and isinstance(category, disnake.CategoryChannel):
-                    for ch_in_cat in list(category.channels):
-                        try:
-                            await ch_in_cat.delete(reason=reason)
-                        except disnake.HTTPException:
-                            pass
-                    try:
-                        await category.delete(reason=reason)
-                    except disnake.HTTPException:
-                        pass
-            else:
-                channel_keys_to_delete_individually = ["settings_channel_id", "text_channel_id", "voice_channel_id",
-                                                       "voice_channel_id_2"]
-                for ch_key in channel_keys_to_delete_individually:
-                    ch_id_to_del = party_data.get(ch_key)
-                    if ch_id_to_del:
-                        channel_to_delete = guild.get_channel(ch_id_to_del)
-                        if channel_to_delete:
-                            try:
-                                await channel_to_delete.delete(
-                                    reason=f"{reason} (kanał poza kategorią lub kategoria nie znaleziona)")
-                            except disnake.HTTPException:
-                                pass
-            if party_data.get("emblem_message_id"):
-                szukam_ch = disnake.utils.get(guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME)
-                if szukam_ch:
-                    try:
-                        msg = await szukam_ch.fetch_message(party_data["emblem_message_id"])
-                        await msg.delete()
-                    except (disnake.NotFound, disnake.Forbidden, disnake.HTTPException):
-                        pass
-        else:
-            print(
-                f"WARN: Gildia {party_data['guild_id']} niedostępna przy rozwiązywaniu party {party_id}. Usuwam tylko dane.")
-        save_party_data()
+        # Sprzątanie zasobów idzie już poza skrzynką: party nie ma w danych, więc kolejne operacje tego party
+        # kończą się od razu zamiast czekać na usuwanie kanałów i wiadomości
+        await self._teardown_party(party_id, party_data, reason)
         leader = self.bot.get_user(party_data["leader_id"])
         if leader:
             try:
@@ -534,18 +1181,81 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
                 pass
         print(f"INFO: Party '{party_data.get('party_name', 'N/A')}' (ID: {party_id}) rozwiązane.")
 
-    async def _handle_join_request_interaction(self, interaction: disnake.MessageInteraction, custom_id: str):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            if custom_id.startswith("settings_request_join_"):
-                party_id_str = custom_id.replace("settings_request_join_", "")
-            else:
-                party_id_str = custom_id.replace("request_join_party_", "")
-            party_id = int(party_id_str)
-        except (IndexError, ValueError):
-            await interaction.followup.send("Błąd wewnętrzny przycisku (ID party).", ephemeral=True)
+    async def _disband_party(self, party_id: int, reason: str) -> dict | None:
+        """Operacja skrzynki party: usuwa party z danych i zwraca dane usuniętego party (zasoby sprząta wołający)."""
+        party_data = active_parties.pop(party_id, None)
+        if not party_data: return None
+        if leader_directory is not None:
+            await leader_directory.release(party_data["leader_id"], party_id)
+        if not await commit_party_data():
+            print(f"BŁĄD: Rozwiązanie party {party_id} nie jest jeszcze zapisane na dysku - zapis jest ponawiany.")
+        return party_data
+
+    async def _teardown_party(self, party_id: int, party_data: dict, reason: str):
+        """Usuwa panel lidera, kanały (albo oddaje je do puli) i emblemat rozwiązanego party."""
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if not guild:
+            print(
+                f"WARN: Gildia {party_data['guild_id']} niedostępna przy rozwiązywaniu party {party_id}. Usuwam tylko dane.")
             return
+        async with self.teardown.party_slots:
+            await asyncio.gather(self._delete_leader_panel(party_data),
+                                 self._teardown_party_rooms(guild, party_id, party_data, reason),
+                                 self._delete_party_emblem(guild, party_data))
+
+    async def _clear_member_overwrites(self, guild: disnake.Guild, party_id: int, party_data: dict,
+                                       member: disnake.Member, reason: str):
+        category_id = party_data.get("category_id")
+        category_obj = guild.get_channel(category_id) if category_id else None
+        if category_obj and isinstance(category_obj, disnake.CategoryChannel):
+            channels = [category_obj]
+        else:
+            channels = [guild.get_channel(party_data[ch_key]) for ch_key in _PARTY_ROOM_KEYS
+                        if ch_key != "category_id" and party_data.get(ch_key)]
+        for channel in channels:
+            if channel is None: continue
+            try:
+                await channel.set_permissions(member, overwrite=None, reason=reason)
+            except disnake.HTTPException as e:
+                print(f"BŁĄD przy usuwaniu uprawnień dla {member.id} z kanału {channel.id} (party {party_id}): {e}")
+
+    async def _remove_party_member(self, party_id: int, user_id: int,
+                                   reason: str) -> tuple[str, dict | None, bool]:
+        """Operacja skrzynki party: zabiera członkowi dostęp do kanałów party i usuwa go z danych.
+
+        Zwraca (wynik, dane party, zapisano): "removed", "gone", "leader", "not_member" albo "no_guild".
+        """
+        party_data = active_parties.get(party_id)
+        if not party_data: return "gone", None, True
+        if user_id == party_data["leader_id"]: return "leader", party_data, True
+        if user_id not in party_data["member_ids"]: return "not_member", party_data, True
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if not guild: return "no_guild", party_data, True
+        member_obj = guild.get_member(user_id)
+        if member_obj:
+            await self._clear_member_overwrites(guild, party_id, party_data, member_obj, reason)
+        active_parties.remove_member(party_id, user_id)
+        saved = await commit_party_data()
+        self.request_party_render(party_id)
+        return "removed", party_data, saved
+
+    async def _notify_leader_member_left(self, party_id: int, party_data: dict, leaver: disnake.abc.User):
+        leader_obj = self.bot.get_user(party_data["leader_id"])
+        if not leader_obj:
+            try:
+                leader_obj = await self.bot.fetch_user(party_data["leader_id"])
+            except disnake.HTTPException:
+                return
+        try:
+            await leader_obj.send(
+                f"Użytkownik {leaver.mention} (`{leaver.id}`) opuścił Twoje party '{party_data['party_name']}'.")
+        except disnake.Forbidden:
+            pass
+        if party_id in active_parties: await self.send_leader_control_panel(leader_obj, party_id)
 
+    async def _handle_join_request_interaction(self, interaction: disnake.MessageInteraction,
+                                               payload: ComponentPayload):
+        party_id = payload.party_id
         user_requesting_join = interaction.user
         party_data = active_parties.get(party_id)
         if not party_data:
@@ -576,112 +1286,54 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
                 return
 
         try:
-            if user_requesting_join.id not in party_data.get("pending_join_requests", []):
-                party_data.setdefault("pending_join_requests", []).append(user_requesting_join.id)
+            expires_at = time.time() + JOIN_REQUEST_TIMEOUT_SECONDS
+            if active_parties.add_pending_request(party_id, user_requesting_join.id, expires_at):
                 save_party_data()
             leader_dm_channel = await leader.create_dm()
-            approval_view = JoinRequestApprovalView(party_id, user_requesting_join.id, self.bot, self)
             await leader_dm_channel.send(
-                f"Użytkownik {user_requesting_join.mention} (`{user_requesting_join.id}`) chce dołączyć do Twojego party: **{party_data['party_name']}**.",
-                view=approval_view
+                f"Użytkownik {user_requesting_join.mention} (`{user_requesting_join.id}`) chce dołączyć do Twojego party: **{party_data['party_name']}**. "
+                f"Prośba wygasa <t:{int(expires_at)}:R>.",
+                components=join_request_approval_buttons(party_id, user_requesting_join.id)
             )
             await interaction.followup.send("Twoja prośba o dołączenie została wysłana do lidera party.",
                                             ephemeral=True)
         except disnake.Forbidden:
-            if user_requesting_join.id in party_data.get("pending_join_requests", []):
-                party_data["pending_join_requests"].remove(user_requesting_join.id)
+            if active_parties.remove_pending_request(party_id, user_requesting_join.id):
                 save_party_data()
             await interaction.followup.send(
                 "Nie udało się wysłać prośby do lidera (prawdopodobnie ma zablokowane DM).", ephemeral=True)
         except Exception as e:
-            if user_requesting_join.id in party_data.get("pending_join_requests", []):
-                party_data["pending_join_requests"].remove(user_requesting_join.id)
+            if active_parties.remove_pending_request(party_id, user_requesting_join.id):
                 save_party_data()
             await interaction.followup.send(f"Wystąpił błąd przy wysyłaniu prośby: {e}", ephemeral=True)
             print(f"BŁĄD przycisku dołączania (party {party_id}, user {user_requesting_join.id}): {e}")
 
-    async def _handle_leave_party_interaction(self, interaction: disnake.MessageInteraction, custom_id: str):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            party_id = int(custom_id.split("_")[3])
-        except (IndexError, ValueError):
-            await interaction.followup.send("Błąd wewnętrzny przycisku.", ephemeral=True)
-            return
+    async def _handle_join_decision_interaction(self, interaction: disnake.MessageInteraction,
+                                                payload: ComponentPayload):
+        await handle_join_decision(self, interaction, payload, accepted=payload.action == "join_accept")
 
+    async def _handle_leave_party_interaction(self, interaction: disnake.MessageInteraction,
+                                              payload: ComponentPayload):
+        party_id = payload.party_id
         leaver = interaction.user
-        party_data = active_parties.get(party_id)
-        if not party_data:
-            await interaction.followup.send("To party już nie istnieje.", ephemeral=True)
-            return
-        if leaver.id == party_data["leader_id"]:
-            await interaction.followup.send("Lider nie może opuścić party w ten sposób.", ephemeral=True)
-            return
-        if leaver.id not in party_data["member_ids"]:
-            await interaction.followup.send("Nie jesteś członkiem tego party.", ephemeral=True)
-            return
-
-        guild = self.bot.get_guild(party_data["guild_id"])
-        if not guild:
-            await interaction.followup.send("Błąd serwera.", ephemeral=True)
-            return
-
-        member_obj = guild.get_member(leaver.id)
-        channels_to_clear_perms_keys = ["settings_channel_id", "text_channel_id", "voice_channel_id",
-                                        "voice_channel_id_2"]
-        category_id = party_data.get("category_id")
-        category_obj = guild.get_channel(category_id) if category_id else None
-
-        if member_obj:
-            if category_obj and isinstance(category_obj, disnake.CategoryChannel):
-                try:
-                    await category_obj.set_permissions(member_obj, overwrite=None,
-                                                       reason="Opuścił party (przycisk z kanału ustawień)")
-                except disnake.HTTPException as e:
-                    print(
-                        f"BŁĄD przy usuwaniu uprawnień dla {leaver.id} z kategorii {category_id} (party {party_id}): {e}")
-            else:
-                for ch_key in channels_to_clear_perms_keys:
-                    ch_id = party_data.get(ch_key)
-                    if not ch_id: continue
-                    channel = guild.get_channel(ch_id)
-                    if channel:
-                        try:
-                            await channel.set_permissions(member_obj, overwrite=None,
-                                                          reason="Opuścił party (przycisk z kanału ustawień)")
-                        except disnake.HTTPException as e:
-                            print(
-                                f"BŁĄD przy usuwaniu uprawnień dla {leaver.id} z kanału {ch_id} (party {party_id}): {e}")
-
-        if leaver.id in party_data["member_ids"]: party_data["member_ids"].remove(leaver.id)
-        save_party_data()
-        await self._update_party_emblem(party_id)
-        await self._update_settings_embed(party_id)
-        await interaction.followup.send(f"Pomyślnie opuściłeś/aś party '{party_data['party_name']}'.",
-                                        ephemeral=True)
-
-        leader_obj = self.bot.get_user(party_data["leader_id"])
-        if not leader_obj:
-            try:
-                leader_obj = await self.bot.fetch_user(party_data["leader_id"])
-            except:
-                pass
-
-        if leader_obj:
-            try:
-                await leader_obj.send(
-                    f"Użytkownik {leaver.mention} (`{leaver.id}`) opuścił Twoje party '{party_data['party_name']}'.")
-            except disnake.Forbidden:
-                pass
-            if party_id in active_parties: await self.send_leader_control_panel(leader_obj, party_id)
-
-    async def _handle_disband_button_interaction(self, interaction: disnake.MessageInteraction, custom_id: str):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            party_id = int(custom_id.split("_")[2])
-        except (IndexError, ValueError):
-            await interaction.followup.send("Błąd wewnętrzny przycisku 'Rozwiąż'.", ephemeral=True)
+        outcome, party_data, saved = await self.mailboxes.submit(
+            party_id, lambda: self._remove_party_member(party_id, leaver.id,
+                                                        "Opuścił party (przycisk z kanału ustawień)"), "leave")
+        if outcome != "removed":
+            await interaction.followup.send({
+                "gone": "To party już nie istnieje.",
+                "leader": "Lider nie może opuścić party w ten sposób.",
+                "not_member": "Nie jesteś członkiem tego party.",
+                "no_guild": "Błąd serwera.",
+            }[outcome], ephemeral=True)
             return
+        await interaction.followup.send(f"Pomyślnie opuściłeś/aś party '{party_data['party_name']}'."
+                                        + ("" if saved else f"\n{PARTY_DATA_UNSAVED_NOTE}"), ephemeral=True)
+        await self._notify_leader_member_left(party_id, party_data, leaver)
 
+    async def _handle_disband_button_interaction(self, interaction: disnake.MessageInteraction,
+                                                 payload: ComponentPayload):
+        party_id = payload.party_id
         party_data_check = active_parties.get(party_id)
         if not party_data_check:
             await interaction.followup.send("To party już nie istnieje.", ephemeral=True)
@@ -695,20 +1347,13 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
         await self.disband_party(party_id,
                                  reason=f"Rozwiązane przez lidera ({interaction.user.name}) za pomocą przycisku.")
 
-    @commands.Cog.listener("on_interaction")
+    @commands.Cog.listener("on_button_click")
     async def on_button_interaction(self, interaction: disnake.MessageInteraction):
-        custom_id = interaction.data.get("custom_id")
-        if not custom_id: return
-
-        if custom_id == "create_new_party_button_from_setup":
-            await interaction.response.defer(ephemeral=True)
-            await self._start_party_creation_from_interaction(interaction)
-        elif custom_id.startswith("request_join_party_") or custom_id.startswith("settings_request_join_"):
-            await self._handle_join_request_interaction(interaction, custom_id)
-        elif custom_id.startswith("settings_leave_party_"):
-            await self._handle_leave_party_interaction(interaction, custom_id)
-        elif custom_id.startswith("leader_disband_"):
-            await self._handle_disband_button_interaction(interaction, custom_id)
+        await self.router.dispatch(interaction)
+
+    @commands.Cog.listener("on_modal_submit")
+    async def on_modal_interaction(self, interaction: disnake.ModalInteraction):
+        await self.router.dispatch(interaction)
 
     async def _cleanup_dm_messages(self, ctx_or_interaction, bot_message: disnake.Message = None,
                                    user_message: disnake.Message = None, delay: int = None):
@@ -735,11 +1380,10 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
     async def leave_party_dm_command(self, ctx: commands.Context, *, party_identifier: str):
         leaver = ctx.author
         bot_response_msg = None
-        parties_member_of_and_not_leader = [{'id': pid, 'name': pdata.get("party_name", "N/A"), 'data': pdata} for
-                                            pid, pdata in
-                                            active_parties.items() if
-                                            leaver.id in pdata.get("member_ids", []) and leaver.id != pdata.get(
-                                                "leader_id")]
+        parties_member_of_and_not_leader = [
+            {'id': pid, 'name': active_parties[pid].get("party_name", "N/A"), 'data': active_parties[pid]}
+            for pid in active_parties.party_ids_of_member(leaver.id)
+            if leaver.id != active_parties[pid].get("leader_id")]
         if not parties_member_of_and_not_leader:
             bot_response_msg = await ctx.send("Nie jesteś członkiem żadnego party, które mógłbyś opuścić tą komendą.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
@@ -774,55 +1418,17 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
 
-        guild = self.bot.get_guild(target_party_data_to_leave["guild_id"])
-        if not guild:
-            bot_response_msg = await ctx.send("Błąd: Serwer party nieosiągalny.")
+        outcome, party_data, saved = await self.mailboxes.submit(
+            target_party_id_to_leave, lambda: self._remove_party_member(
+                target_party_id_to_leave, leaver.id, "Opuścił party (komenda DM)"), "leave")
+        if outcome != "removed":
+            bot_response_msg = await ctx.send("Błąd: Serwer party nieosiągalny." if outcome == "no_guild"
+                                              else f"Nie jesteś już członkiem party '{party_identifier}'.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
-
-        member_obj = guild.get_member(leaver.id)
-        if member_obj:
-            category_id = target_party_data_to_leave.get("category_id")
-            category_obj = guild.get_channel(category_id) if category_id else None
-            if category_obj and isinstance(category_obj, disnake.CategoryChannel):
-                try:
-                    await category_obj.set_permissions(member_obj, overwrite=None, reason="Opuścił party (komenda DM)")
-                except disnake.HTTPException:
-                    pass
-            else:
-                channels_to_clear_keys = ["settings_channel_id", "text_channel_id", "voice_channel_id",
-                                          "voice_channel_id_2"]
-                for ch_key in channels_to_clear_keys:
-                    ch_id = target_party_data_to_leave.get(ch_key)
-                    if ch_id:
-                        channel = guild.get_channel(ch_id)
-                        if channel:
-                            try:
-                                await channel.set_permissions(member_obj, overwrite=None,
-                                                              reason="Opuścił party (komenda DM)")
-                            except disnake.HTTPException:
-                                pass
-        if leaver.id in target_party_data_to_leave["member_ids"]:
-            target_party_data_to_leave["member_ids"].remove(leaver.id)
-        save_party_data()
-        await self._update_party_emblem(target_party_id_to_leave)
-        if target_party_data_to_leave.get("settings_channel_id"):
-            await self._update_settings_embed(target_party_id_to_leave)
-        bot_response_msg = await ctx.send(f"Pomyślnie opuściłeś/aś party '{target_party_data_to_leave['party_name']}'.")
-        leader_of_left_party = self.bot.get_user(target_party_data_to_leave["leader_id"])
-        if not leader_of_left_party:
-            try:
-                leader_of_left_party = await self.bot.fetch_user(target_party_data_to_leave["leader_id"])
-            except:
-                pass
-        if leader_of_left_party:
-            try:
-                await leader_of_left_party.send(
-                    f"Użytkownik {leaver.mention} (`{leaver.id}`) opuścił Twoje party '{target_party_data_to_leave['party_name']}'.")
-            except disnake.Forbidden:
-                pass
-            if target_party_id_to_leave in active_parties:
-                await self.send_leader_control_panel(leader_of_left_party, target_party_id_to_leave)
+        bot_response_msg = await ctx.send(f"Pomyślnie opuściłeś/aś party '{party_data['party_name']}'."
+                                          + ("" if saved else f"\n{PARTY_DATA_UNSAVED_NOTE}"))
+        await self._notify_leader_member_left(target_party_id_to_leave, party_data, leaver)
         await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
 
     @leave_party_dm_command.error
@@ -843,15 +1449,13 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
     @commands.dm_only()
     async def remove_member_dm_command(self, ctx: commands.Context, *, member_identifier: str):
         leader = ctx.author
-        party_id_led_by_author = next(
-            (pid for pid, pdata in active_parties.items() if pdata.get("leader_id") == leader.id), None)
+        party_id_led_by_author = active_parties.party_id_led_by(leader.id)
         bot_response_msg = None
         if not party_id_led_by_author:
             bot_response_msg = await ctx.send("Nie jesteś liderem żadnego aktywnego party.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
         party_id = party_id_led_by_author
-        party_data = active_parties.get(party_id)
         target_user_id = None
         if member_identifier.startswith('<@') and member_identifier.endswith('>'):
             try:
@@ -871,47 +1475,25 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
             bot_response_msg = await ctx.send("Nie możesz usunąć siebie. Użyj przycisku w panelu.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
-        if target_user_id not in party_data.get("member_ids", []):
-            bot_response_msg = await ctx.send("Tego użytkownika nie ma w Twoim party.")
+        outcome, party_data, saved = await self.mailboxes.submit(
+            party_id, lambda: self._remove_party_member(party_id, target_user_id, "Usunięty z party przez lidera"),
+            "remove_member")
+        if outcome != "removed":
+            bot_response_msg = await ctx.send({
+                "gone": "Nie jesteś liderem żadnego aktywnego party.",
+                "not_member": "Tego użytkownika nie ma w Twoim party.",
+                "no_guild": "Błąd: Serwer party nieosiągalny.",
+            }[outcome])
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
         guild = self.bot.get_guild(party_data["guild_id"])
-        if not guild:
-            bot_response_msg = await ctx.send("Błąd: Serwer party nieosiągalny.")
-            await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
-            return
-        member_to_remove_obj = guild.get_member(target_user_id)
+        member_to_remove_obj = guild.get_member(target_user_id) if guild else None
         removed_user_mention_or_id = f"ID `{target_user_id}`"
         if member_to_remove_obj: removed_user_mention_or_id = f"{member_to_remove_obj.mention} (`{target_user_id}`)"
-        if member_to_remove_obj:
-            category_id = party_data.get("category_id")
-            category_obj = guild.get_channel(category_id) if category_id else None
-            if category_obj and isinstance(category_obj, disnake.CategoryChannel):
-                try:
-                    await category_obj.set_permissions(member_to_remove_obj, overwrite=None,
-                                                       reason="Usunięty z party przez lidera")
-                except disnake.HTTPException:
-                    pass
-            else:
-                channels_to_clear_keys = ["settings_channel_id", "text_channel_id", "voice_channel_id",
-                                          "voice_channel_id_2"]
-                for ch_key in channels_to_clear_keys:
-                    ch_id = party_data.get(ch_key)
-                    if ch_id:
-                        channel = guild.get_channel(ch_id)
-                        if channel:
-                            try:
-                                await channel.set_permissions(member_to_remove_obj, overwrite=None,
-                                                              reason="Usunięty z party przez lidera")
-                            except disnake.HTTPException:
-                                pass
-        if target_user_id in party_data.get("member_ids", []): party_data["member_ids"].remove(target_user_id)
-        save_party_data()
-        await self._update_party_emblem(party_id)
-        if party_data.get("settings_channel_id"): await self._update_settings_embed(party_id)
         await self.send_leader_control_panel(leader, party_id)
         bot_response_msg = await ctx.send(
-            f"{removed_user_mention_or_id} został usunięty z party '{party_data['party_name']}'.")
+            f"{removed_user_mention_or_id} został usunięty z party '{party_data['party_name']}'."
+            + ("" if saved else f"\n{PARTY_DATA_UNSAVED_NOTE}"))
         if member_to_remove_obj:
             try:
                 await member_to_remove_obj.send(
@@ -938,15 +1520,13 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
     @commands.dm_only()
     async def rename_party_dm_command(self, ctx: commands.Context, *, new_name: str):
         leader = ctx.author
-        party_id_led_by_author = next(
-            (pid for pid, pdata in active_parties.items() if pdata.get("leader_id") == leader.id), None)
+        party_id_led_by_author = active_parties.party_id_led_by(leader.id)
         bot_response_msg = None
         if not party_id_led_by_author:
             bot_response_msg = await ctx.send("Nie jesteś liderem żadnego aktywnego party.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
         party_id = party_id_led_by_author
-        party_data = active_parties.get(party_id)
         new_name_stripped = new_name.strip()
         if not new_name_stripped:
             bot_response_msg = await ctx.send("Nowa nazwa party nie może być pusta.")
@@ -957,47 +1537,60 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg,
                                             delay=config.DM_MESSAGE_DELETE_DELAY * 1.5)
             return
-        if new_name_stripped == party_data["party_name"]:
-            bot_response_msg = await ctx.send(f"Nowa nazwa jest taka sama. Nie dokonano zmian.")
+        outcome, old_name, party_data, saved = await self.mailboxes.submit(
+            party_id, lambda: self._rename_party(party_id, leader.id, new_name_stripped), "rename")
+        if outcome != "renamed":
+            bot_response_msg = await ctx.send("Nowa nazwa jest taka sama. Nie dokonano zmian." if outcome == "unchanged"
+                                              else "Nie jesteś liderem żadnego aktywnego party.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
-        old_name = party_data["party_name"]
-        party_data["party_name"] = new_name_stripped
-        guild = self.bot.get_guild(party_data["guild_id"])
-        leader_display_name_for_cat = leader.display_name
-        if guild:
-            leader_member_obj = guild.get_member(leader.id)
-            if leader_member_obj: leader_display_name_for_cat = leader_member_obj.display_name
-            category = guild.get_channel(party_data["category_id"]) if party_data.get("category_id") else None
-            if category and isinstance(category, disnake.CategoryChannel):
-                try:
-                    await category.edit(name=f"🎉 {new_name_stripped} ({leader_display_name_for_cat})",
-                                        reason=f"Zmiana nazwy party przez lidera {leader.id}")
-                except disnake.HTTPException as e:
-                    print(f"WARN: Zmiana nazwy kategorii dla party {party_id} nie powiodła się: {e}")
-            channel_configs = [
-                ("settings_channel_id", f"📌︱info-{new_name_stripped[:20]}"),
-                ("text_channel_id", f"💬︱{new_name_stripped[:20]}"),
-                ("voice_channel_id", f"🔊︱Głos 1 ({new_name_stripped[:15]})"),
-                ("voice_channel_id_2", f"🔊︱Głos 2 ({new_name_stripped[:15]})")
-            ]
-            for ch_key, ch_new_name_format in channel_configs:
-                ch_id = party_data.get(ch_key)
-                if ch_id:
-                    channel_obj = guild.get_channel(ch_id)
-                    if channel_obj:
-                        try:
-                            await channel_obj.edit(name=ch_new_name_format,
-                                                   reason=f"Zmiana nazwy party przez lidera {leader.id}")
-                        except disnake.HTTPException as e:
-                            print(f"WARN: Nie udało się zmienić nazwy kanału {ch_key} ({ch_id}): {e}")
-        save_party_data()
-        await self._update_party_emblem(party_id)
-        if party_data.get("settings_channel_id"): await self._update_settings_embed(party_id)
+        await self._rename_party_rooms(party_id, party_data, leader, new_name_stripped)
         await self.send_leader_control_panel(leader, party_id)
-        bot_response_msg = await ctx.send(f"Nazwa party zmieniona z '{old_name}' na '{new_name_stripped}'.")
+        bot_response_msg = await ctx.send(f"Nazwa party zmieniona z '{old_name}' na '{new_name_stripped}'."
+                                          + ("" if saved else f"\n{PARTY_DATA_UNSAVED_NOTE}"))
         await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
 
+    async def _rename_party(self, party_id: int, leader_id: int,
+                            new_name: str) -> tuple[str, str | None, dict | None, bool]:
+        """Operacja skrzynki party: zmienia nazwę w danych party. Zwraca (wynik, stara nazwa, dane party, zapisano)."""
+        party_data = active_parties.get(party_id)
+        if not party_data or party_data["leader_id"] != leader_id: return "gone", None, None, True
+        old_name = party_data["party_name"]
+        if new_name == old_name: return "unchanged", old_name, party_data, True
+        active_parties.rename(party_id, new_name)
+        saved = await commit_party_data()
+        self.request_party_render(party_id)
+        return "renamed", old_name, party_data, saved
+
+    async def _rename_party_rooms(self, party_id: int, party_data: dict, leader: disnake.abc.User, new_name: str):
+        # Nazwy kanałów to tylko odbicie danych party (jak embedy), więc idą poza skrzynką - limit zmian nazw
+        # kanałów (2 na 10 min) nie wstrzymuje innych operacji party. Czekającą starszą zmianę nazwy kanału
+        # zastępuje nowsza, a wysłane już zmiany tego kanału idą po kolei - wygrywa ostatnia nazwa.
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if not guild: return
+        leader_member_obj = guild.get_member(leader.id)
+        leader_display_name_for_cat = leader_member_obj.display_name if leader_member_obj else leader.display_name
+        channel_configs = [
+            ("category_id", f"🎉 {new_name} ({leader_display_name_for_cat})"),
+            ("settings_channel_id", f"📌︱info-{new_name[:20]}"),
+            ("text_channel_id", f"💬︱{new_name[:20]}"),
+            ("voice_channel_id", f"🔊︱Głos 1 ({new_name[:15]})"),
+            ("voice_channel_id_2", f"🔊︱Głos 2 ({new_name[:15]})")
+        ]
+        for ch_key, ch_new_name_format in channel_configs:
+            channel_obj = guild.get_channel(party_data.get(ch_key) or 0)
+            # Party rozwiązane w międzyczasie - jego kanały są usuwane albo wróciły do puli
+            if not channel_obj or party_id not in active_parties: continue
+            try:
+                with rest_priority(RestPriority.COSMETIC, supersede_key=("channel_rename", channel_obj.id)):
+                    await channel_obj.edit(name=ch_new_name_format,
+                                           reason=f"Zmiana nazwy party przez lidera {leader.id}")
+                self.room_pool.note_renamed(channel_obj.id)
+            except disnake.NotFound:
+                pass
+            except disnake.HTTPException as e:
+                print(f"WARN: Nie udało się zmienić nazwy kanału {ch_key} ({channel_obj.id}) party {party_id}: {e}")
+
     @rename_party_dm_command.error
     async def rename_party_dm_command_error_handler(self, ctx, error):
         bot_response_msg = None
@@ -1014,190 +1607,442 @@ class PartyManagementCog(commands.Cog, name="Zarządzanie Party"):
     @commands.dm_only()
     async def list_members_dm_command(self, ctx: commands.Context):
         leader = ctx.author
-        party_id_led_by_author = next(
-            (pid for pid, pdata in active_parties.items() if pdata.get("leader_id") == leader.id), None)
+        party_id_led_by_author = active_parties.party_id_led_by(leader.id)
         bot_response_msg = None
         if not party_id_led_by_author:
             bot_response_msg = await ctx.send("Nie jesteś liderem żadnego aktywnego party.")
             await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
             return
         party_id = party_id_led_by_author
+        # Jawne odświeżenie zawsze wysyła edycję - odtworzy panel, jeśli lider go usunął
+        self.renders.invalidate(party_id, "leader_panel")
         await self.send_leader_control_panel(leader, party_id)
         bot_response_msg = await ctx.send("Panel zarządzania odświeżony.")
         await self._cleanup_dm_messages(ctx, bot_message=bot_response_msg)
 
-    @tasks.loop(minutes=config.EXTENSION_CHECK_LOOP_MINUTES)
-    async def extension_check_loop(self):
+    # --- Pula pokoi party ---
+    @tasks.loop(seconds=PARTY_ROOM_POOL_REFILL_SECONDS)
+    async def room_pool_refill_loop(self):
+        for guild in self.bot.guilds:
+            if not guild.me.guild_permissions.manage_channels: continue
+            if not disnake.utils.get(guild.text_channels, name=config.SZUKAM_PARTY_CHANNEL_NAME): continue
+            await self.room_pool.refill(guild)
+
+    @room_pool_refill_loop.before_loop
+    async def before_room_pool_refill_loop(self):
+        await self.bot.wait_until_ready()
+
+    # --- Osierocone zasoby party ---
+    def _known_party_resources(self) -> set[int]:
+        """Indeks ID zasobów, które do kogoś należą: kanały i emblematy party oraz pokoje w puli."""
+        known = self.room_pool.resource_ids()
+        for party_id, party_data in active_parties.items():
+            known.add(party_data.get("emblem_message_id") or party_id)
+            known.update(party_data[key] for key in _PARTY_ROOM_KEYS if party_data.get(key))
+        return known
+
+    @tasks.loop(seconds=PARTY_GC_INTERVAL_SECONDS or 120)
+    async def orphan_gc_loop(self):
+        # Indeks jest wiarygodny dopiero po uzgodnieniu danych party ze stanem gildii
+        if not self.reconciler.done: return
+        try:
+            await self.orphan_collector.tick()
+        except Exception as e:
+            print(f"BŁĄD: Sprzątanie osieroconych zasobów party nie powiodło się: {e}")
+
+    @orphan_gc_loop.before_loop
+    async def before_orphan_gc_loop(self):
+        await self.bot.wait_until_ready()
+
+    # --- Terminy party: wygaśnięcie, przypomnienie o przedłużeniu, czas na odpowiedź lidera ---
+    def _schedule_party_deadlines(self, party_id: int):
+        for kind in ("expiry", "reminder", "reply_due"):
+            self.deadlines.cancel((kind, party_id))
+        p_data = active_parties.get(party_id)
+        if not p_data: return
+        self.deadlines.schedule(("expiry", party_id), p_data["expiry_timestamp"])
+        reply_info = parties_awaiting_extension_reply.get(party_id)
+        if reply_info:
+            self.deadlines.schedule(("reply_due", party_id), reply_info["reply_due_ts"])
+        elif not p_data.get("reminder_sent_for_current_cycle", False) and p_data.get("next_reminder_timestamp"):
+            self.deadlines.schedule(("reminder", party_id), p_data["next_reminder_timestamp"])
+
+    def _schedule_join_request_deadlines(self, party_id: int):
+        p_data = active_parties.get(party_id)
+        if not p_data: return
+        for user_id, expires_at in p_data["pending_join_deadlines"].items():
+            self.deadlines.schedule(("join_request", (party_id, int(user_id))), expires_at)
+
+    def _on_party_change(self, record: dict):
+        if record["op"] in ("create", "extend", "disband") or (
+                record["op"] == "update" and not self._DEADLINE_FIELDS.isdisjoint(record["fields"])):
+            self._schedule_party_deadlines(record["party_id"])
+        if record["op"] == "pending_add":
+            self.deadlines.schedule(("join_request", (record["party_id"], record["user_id"])), record["expires_at"])
+        elif record["op"] == "pending_remove":
+            self.deadlines.cancel(("join_request", (record["party_id"], record["user_id"])))
+        if record["op"] == "disband":
+            self.renders.forget(record["party_id"])
+            panel_view = self._leader_panel_views.pop(record["party_id"], None)
+            if panel_view is not None:
+                panel_view.stop()
+
+    async def _start_deadline_scheduler(self):
+        await self.bot.wait_until_ready()
+        self.deadlines.start()
+        print("Harmonogram terminów party jest gotowy. Uzgadniam zapisane party ze stanem gildii...")
+        # Terminy party są planowane przy uzgadnianiu, więc party z usuniętymi kanałami nie wygasa osobno
+        await self.reconciler.run(list(active_parties))
+
+    async def _reconcile_party(self, party_id: int) -> str:
+        """Sprawdza zapisane kanały party w cache gildii; rozwiązuje party bez kanałów, resztę naprawia."""
+        party_data = active_parties.get(party_id)
+        if not party_data:
+            return "gone"
+        guild = self.bot.get_guild(party_data["guild_id"])
+        if guild is not None and not guild.unavailable:
+            stale = {key: None for key in _PARTY_ROOM_KEYS
+                     if party_data.get(key) and guild.get_channel(party_data[key]) is None}
+            if stale and all(key in stale for key in _PARTY_ROOM_KEYS if party_data.get(key)):
+                await self.disband_party(party_id, reason="Kanały party zostały usunięte, gdy bot był offline.")
+                return "disbanded"
+            if stale:
+                print(f"INFO: Party {party_id}: usunięte kanały {sorted(stale)} - usuwam je z danych party.")
+                active_parties.update_fields(party_id, **stale)
+                save_party_data()
+        self._schedule_party_deadlines(party_id)
+        self._schedule_join_request_deadlines(party_id)
+        if guild is None or guild.unavailable:
+            # Gildia chwilowo niedostępna (awaria po stronie Discorda) - party zostaje, kanałów nie da się sprawdzić
+            return "guild_unavailable"
+        missing_messages = []
+        if party_data.get("settings_channel_id") and not party_data.get("settings_embed_message_id"):
+            missing_messages.append("settings")
+        if not party_data.get("leader_panel_dm_id"):
+            missing_messages.append("leader_panel")
+        if missing_messages:
+            self.request_party_render(party_id, *missing_messages)
+        return "repaired" if stale or missing_messages else "ok"
+
+    def _schedule_teardown_retry(self, failure_key: tuple, when: float):
+        self.deadlines.schedule(("teardown_retry", failure_key), when)
+
+    async def _disband_expired_parties(self, expired: list):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.disband_party(p_id, reason=reason) for p_id, reason in expired),
+                                       return_exceptions=True)
+        for (p_id, _), result in zip(expired, results):
+            if isinstance(result, Exception):
+                print(f"BŁĄD: Rozwiązywanie wygasłego party {p_id} nie powiodło się: {result}")
+        elapsed = time.perf_counter() - started
+        self.latency.record("bulk_expiry", elapsed)
+        print(f"INFO: Wygaszono {len(expired)} party w {elapsed:.2f} s. {self.latency.format('bulk_expiry')}")
+
+    async def _process_due_deadlines(self, due_keys: list):
         now_ts = datetime.datetime.now(datetime.timezone.utc).timestamp()
-        p_ids_iter = list(active_parties.keys())
-        for p_id in p_ids_iter:
+        expired = []
+        teardown_retries = []
+        join_timeouts = []
+        mailbox_operations = []
+        for kind, p_id in due_keys:
+            if kind == "teardown_retry":
+                teardown_retries.append(p_id)
+                continue
+            if kind == "join_request":
+                join_timeouts.append(p_id)
+                continue
             p_data = active_parties.get(p_id)
             if not p_data: continue
-            if now_ts >= p_data["expiry_timestamp"]:
-                await self.disband_party(p_id,
-                                         reason=f"Party automatycznie wygasło <t:{int(p_data['expiry_timestamp'])}:F>.")
-                continue
-            should_send_reminder = (
-                    not p_data.get("reminder_sent_for_current_cycle", False) and
-                    p_id not in parties_awaiting_extension_reply and
-                    now_ts >= p_data.get("next_reminder_timestamp", float('inf')) and
-                    p_data["expiry_timestamp"] > now_ts
+            if kind == "expiry":
+                if now_ts >= p_data["expiry_timestamp"]:
+                    expired.append((p_id, f"Party automatycznie wygasło <t:{int(p_data['expiry_timestamp'])}:F>."))
+                else:
+                    self._schedule_party_deadlines(p_id)
+            elif kind == "reminder":
+                mailbox_operations.append(self.mailboxes.submit(
+                    p_id, lambda p_id=p_id: self._send_extension_reminder(p_id, now_ts), "extension_reminder"))
+            elif kind == "reply_due":
+                mailbox_operations.append(self.mailboxes.submit(
+                    p_id, lambda p_id=p_id: self._handle_extension_reply_timeout(p_id), "extension_reply_timeout"))
+        if mailbox_operations:
+            # Każde party ma własną skrzynkę - przypomnienia różnych party idą równolegle
+            for result in await asyncio.gather(*mailbox_operations, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"BŁĄD: Obsługa terminu przedłużenia party nie powiodła się: {result}")
+        if expired:
+            await self._disband_expired_parties(expired)
+        if teardown_retries:
+            await asyncio.gather(*(self.teardown.retry(key) for key in teardown_retries))
+        if join_timeouts:
+            results = await asyncio.gather(*(expire_join_request(self.bot, p_id, user_id)
+                                             for p_id, user_id in join_timeouts), return_exceptions=True)
+            for (p_id, user_id), result in zip(join_timeouts, results):
+                if isinstance(result, Exception):
+                    print(f"BŁĄD: Obsługa wygaśnięcia prośby {user_id} do party {p_id} nie powiodła się: {result}")
+
+    async def _send_extension_reminder(self, p_id: int, now_ts: float):
+        p_data = active_parties.get(p_id)
+        if not p_data: return
+        if p_data.get("reminder_sent_for_current_cycle", False) or p_id in parties_awaiting_extension_reply or \
+                p_data["expiry_timestamp"] <= now_ts:
+            return
+        retry_ts = now_ts + EXTENSION_REMINDER_RETRY_SECONDS
+        ldr = self.bot.get_user(p_data["leader_id"])
+        if not ldr:
+            try:
+                ldr = await self.bot.fetch_user(p_data["leader_id"])
+            except (disnake.NotFound, disnake.HTTPException):
+                print(f"WARN LOOP: Lider party {p_id} nieosiągalny. Party wygaśnie normalnie.")
+                self.deadlines.schedule(("reminder", p_id), retry_ts)
+                return
+        try:
+            reply_due_dt = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+                hours=config.EXTENSION_WINDOW_HOURS)
+            reply_due_ts = reply_due_dt.timestamp()
+            dm_ch = await ldr.create_dm()
+            reminder_msg_content = (
+                f"🔔 Przypomnienie!\nTwoje party **'{p_data['party_name']}'** wygasa <t:{int(p_data['expiry_timestamp'])}:R>.\n"
+                f"Przedłużyć o **{config.PARTY_EXTEND_BY_HOURS}**h? Kliknij przycisk albo odpisz `Tak`/`Nie` do <t:{int(reply_due_ts)}:R>."
             )
-            if should_send_reminder:
-                ldr = self.bot.get_user(p_data["leader_id"])
-                if not ldr:
-                    try:
-                        ldr = await self.bot.fetch_user(p_data["leader_id"])
-                    except (disnake.NotFound, disnake.HTTPException):
-                        print(f"WARN LOOP: Lider party {p_id} nieosiągalny. Party wygaśnie normalnie.")
-                        continue
-                try:
-                    reply_due_dt = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
-                        hours=config.EXTENSION_WINDOW_HOURS)
-                    reply_due_ts = reply_due_dt.timestamp()
-                    dm_ch = await ldr.create_dm()
-                    reminder_msg_content = (
-                        f"🔔 Przypomnienie!\nTwoje party **'{p_data['party_name']}'** wygasa <t:{int(p_data['expiry_timestamp'])}:R>.\n"
-                        f"Przedłużyć o **{config.PARTY_EXTEND_BY_HOURS}**h? Odpisz `Tak`/`Nie` do <t:{int(reply_due_ts)}:R>."
-                    )
-                    reminder_dm_msg = await dm_ch.send(reminder_msg_content)
-                    parties_awaiting_extension_reply[p_id] = {
-                        'reply_due_ts': reply_due_ts, 'leader_dm_channel_id': dm_ch.id,
-                        'reminder_message_id': reminder_dm_msg.id
-                    }
-                    p_data["reminder_sent_for_current_cycle"] = True
-                    p_data["extension_reminder_dm_id"] = reminder_dm_msg.id
-                    save_party_data()
-                    print(f"INFO LOOP: Wysłano przypomnienie o przedłużeniu do lidera party {p_id}.")
-                except disnake.Forbidden:
-                    print(f"WARN LOOP: Nie udało się wysłać DM z przypomnieniem do lidera {ldr.id} dla party {p_id}.")
-                except Exception as e:
-                    print(f"BŁĄD LOOP podczas wysyłania przypomnienia dla party {p_id}: {e}")
-            if p_id in parties_awaiting_extension_reply and now_ts >= parties_awaiting_extension_reply[p_id][
-                'reply_due_ts']:
-                ldr = self.bot.get_user(p_data["leader_id"])
-                if not ldr:
-                    try:
-                        ldr = await self.bot.fetch_user(p_data["leader_id"])
-                    except:
-                        pass
-                reminder_info = parties_awaiting_extension_reply[p_id]
-                if reminder_info.get('leader_dm_channel_id') and reminder_info.get('reminder_message_id'):
-                    try:
-                        dm_ch_for_cleanup = self.bot.get_channel(reminder_info['leader_dm_channel_id'])
-                        if not dm_ch_for_cleanup: dm_ch_for_cleanup = await self.bot.fetch_channel(
-                            reminder_info['leader_dm_channel_id'])
-                        if isinstance(dm_ch_for_cleanup, disnake.DMChannel):
-                            msg_to_delete = await dm_ch_for_cleanup.fetch_message(reminder_info['reminder_message_id'])
-                            await msg_to_delete.delete()
-                    except (disnake.NotFound, disnake.Forbidden, disnake.HTTPException):
-                        pass
-                del parties_awaiting_extension_reply[p_id]
-                if ldr:
-                    try:
-                        await ldr.send(
-                            f"Nie otrzymano odpowiedzi ws. przedłużenia party '{p_data['party_name']}'. Wygasnie <t:{int(p_data['expiry_timestamp'])}:R>.",
-                            delete_after=config.DM_MESSAGE_DELETE_DELAY * 2)
-                    except disnake.Forbidden:
-                        pass
-                print(f"INFO LOOP: Lider party {p_id} nie odpowiedział na czas. Party wygaśnie normalnie.")
-
-    @extension_check_loop.before_loop
-    async def before_extension_check_loop_func(self):
-        await self.bot.wait_until_ready()
-        print("Pętla sprawdzania przedłużeń party jest gotowa.")
+            reminder_dm_msg = await dm_ch.send(reminder_msg_content, components=self._extension_reminder_buttons(p_id))
+            active_parties.update_fields(p_id, reminder_sent_for_current_cycle=True,
+                                         extension_reminder_dm_id=reminder_dm_msg.id)
+            active_parties.set_extension_reply(p_id, reply_due_ts, dm_ch.id, reminder_dm_msg.id)
+            save_party_data()
+            print(f"INFO LOOP: Wysłano przypomnienie o przedłużeniu do lidera party {p_id}.")
+        except disnake.Forbidden:
+            print(f"WARN LOOP: Nie udało się wysłać DM z przypomnieniem do lidera {ldr.id} dla party {p_id}.")
+            self.deadlines.schedule(("reminder", p_id), retry_ts)
+        except Exception as e:
+            print(f"BŁĄD LOOP podczas wysyłania przypomnienia dla party {p_id}: {e}")
+            self.deadlines.schedule(("reminder", p_id), retry_ts)
+
+    async def _handle_extension_reply_timeout(self, p_id: int):
+        p_data = active_parties.get(p_id)
+        reminder_info = parties_awaiting_extension_reply.get(p_id)
+        if not p_data or not reminder_info: return
+        ldr = self.bot.get_user(p_data["leader_id"])
+        if not ldr:
+            try:
+                ldr = await self.bot.fetch_user(p_data["leader_id"])
+            except:
+                pass
+        if reminder_info.get('leader_dm_channel_id') and reminder_info.get('reminder_message_id'):
+            try:
+                await self.messages.delete("reminder_delete", self.messages.partial(
+                    reminder_info['leader_dm_channel_id'], reminder_info['reminder_message_id'],
+                    disnake.ChannelType.private))
+            except (disnake.NotFound, disnake.Forbidden, disnake.HTTPException):
+                pass
+        active_parties.clear_extension_reply(p_id)
+        save_party_data()
+        if ldr:
+            try:
+                await ldr.send(
+                    f"Nie otrzymano odpowiedzi ws. przedłużenia party '{p_data['party_name']}'. Wygasnie <t:{int(p_data['expiry_timestamp'])}:R>.",
+                    delete_after=config.DM_MESSAGE_DELETE_DELAY * 2)
+            except disnake.Forbidden:
+                pass
+        print(f"INFO LOOP: Lider party {p_id} nie odpowiedział na czas. Party wygaśnie normalnie.")
+
+    # --- Klaster procesów (cluster.py) ---
+    def _create_cluster_gateway(self) -> ClusterGateway | None:
+        if shard_layout is None:
+            print("BŁĄD: Tryb klastra wymaga SHARD_COUNT w config.py. Proces działa bez IPC.")
+            return None
+        worker_id, worker_count = CLUSTER_WORKER
+        ipc = ClusterIpc(worker_id, worker_count, CLUSTER_IPC_DIR, CLUSTER_IPC_TIMEOUT_SECONDS)
+        ipc.handle("member_parties", self._ipc_member_parties)
+        return ClusterGateway(self.bot, ClusterLayout(worker_count, shard_layout.shard_count), ipc,
+                              config.DEFAULT_COMMAND_PREFIX, self._dm_command_shard, self._dm_interaction_shard)
+
+    async def _dm_interaction_shard(self, data: dict) -> int | None:
+        """Shard party, którego dotyczy kliknięcie w DM (ID party z custom_id); None = obsłuż lokalnie."""
+        payload = decode_custom_id((data.get("data") or {}).get("custom_id") or "")
+        if payload is None or payload.party_id is None: return None
+        party_data = active_parties.get(payload.party_id)
+        if party_data is not None: return shard_layout.shard_of(party_data["guild_id"])
+        return await leader_directory.shard_of_party(payload.party_id)
+
+    async def _dm_command_shard(self, data: dict) -> int | None:
+        """Shard party, na którym działa komenda z DM: party lidera albo (dla !opusc) party członka."""
+        command_parts = data["content"][len(config.DEFAULT_COMMAND_PREFIX):].split(maxsplit=1)
+        command = self.bot.get_command(command_parts[0]) if command_parts else None
+        if command is None: return None
+        author_id = int(data["author"]["id"])
+        if command.name == self.leave_party_dm_command.name:
+            return await self._member_command_shard(author_id, command_parts[1] if len(command_parts) > 1 else "")
+        return await leader_directory.shard_of_leader(author_id)
+
+    async def _member_command_shard(self, user_id: int, party_identifier: str) -> int | None:
+        # Członkostwa zna tylko proces party - pytamy wszystkie procesy
+        ipc = self.cluster.ipc
+        replies = await asyncio.gather(*(ipc.call(worker_id, "member_parties", user_id)
+                                         for worker_id in range(ipc.worker_count) if worker_id != ipc.worker_id),
+                                       return_exceptions=True)
+        candidates = await self._ipc_member_parties(user_id)
+        for reply in replies:
+            if isinstance(reply, Exception):
+                print(f"WARN: Proces klastra nie podał party członka {user_id}: {reply}")
+                continue
+            candidates.extend(reply)
+        identifier = party_identifier.strip().lower()
+        matching = [shard_id for party_id, party_name, shard_id in candidates
+                    if identifier == str(party_id) or identifier == party_name.lower()]
+        shards = set(matching) or {shard_id for _, _, shard_id in candidates}
+        return shards.pop() if len(shards) == 1 else None
+
+    async def _ipc_member_parties(self, user_id: int) -> list:
+        return [[party_id, active_parties[party_id].get("party_name", "N/A"),
+                 shard_layout.shard_of(active_parties[party_id]["guild_id"])]
+                for party_id in active_parties.party_ids_of_member(user_id)
+                if active_parties[party_id].get("leader_id") != user_id]
+
+    # --- Rozmowy w DM (kroki tworzenia party) ---
+    @commands.Cog.listener("on_message")
+    async def on_dm_conversation_message(self, message: disnake.Message):
+        if message.guild is None and not message.author.bot:
+            self.conversations.dispatch_message(message)
+
+    @commands.Cog.listener("on_raw_reaction_add")
+    async def on_dm_conversation_reaction(self, payload: disnake.RawReactionActionEvent):
+        if payload.guild_id is None:
+            self.conversations.dispatch_reaction(payload)
 
     @commands.Cog.listener("on_message")
     async def on_extension_reply(self, message: disnake.Message):
         if message.author.bot or message.guild is not None: return
-        author_id = message.author.id
-        party_id_being_processed = None
-        extension_data_for_party = None
-        for pid, ext_data in list(parties_awaiting_extension_reply.items()):
-            p_data_check = active_parties.get(pid)
-            if p_data_check and p_data_check.get("leader_id") == author_id and ext_data.get(
-                    'leader_dm_channel_id') == message.channel.id:
-                if datetime.datetime.now(datetime.timezone.utc).timestamp() < ext_data['reply_due_ts']:
-                    party_id_being_processed = pid
-                    extension_data_for_party = ext_data
-                    break
-                else:
-                    if ext_data.get('reminder_message_id'):
-                        try:
-                            msg_to_del = await message.channel.fetch_message(ext_data['reminder_message_id'])
-                            await msg_to_del.delete()
-                        except:
-                            pass
-                    try:
-                        await message.delete()
-                    except:
-                        pass
-                    try:
-                        await message.channel.send(
-                            f"Odpowiedź ('{message.content}') dla party '{p_data_check.get('party_name', 'N/A')}' przyszła po czasie.",
-                            delete_after=config.DM_MESSAGE_DELETE_DELAY * 2)
-                    except:
-                        pass
-                    del parties_awaiting_extension_reply[pid]
-                    return
-        if not party_id_being_processed or not extension_data_for_party: return
+        # Indeks kanał DM -> party: DM spoza oczekujących przypomnień odrzucamy jednym odczytem
+        party_id_being_processed = active_parties.party_id_awaiting_reply_in(message.channel.id)
+        if party_id_being_processed is None: return
+        handled, bot_response_after_reply_msg = await self.mailboxes.submit(
+            party_id_being_processed, lambda: self._take_extension_reply(party_id_being_processed, message),
+            "extension_reply")
+        if handled:
+            await self._cleanup_dm_messages(None, bot_message=bot_response_after_reply_msg, user_message=message)
+
+    async def _take_extension_reply(self, party_id_being_processed: int,
+                                    message: disnake.Message) -> tuple[bool, disnake.Message | None]:
+        """Operacja skrzynki party: odpowiedź lidera w DM na przypomnienie o przedłużeniu.
+
+        Zwraca (czy sprzątać DM, odpowiedź bota do usunięcia).
+        """
         p_data = active_parties.get(party_id_being_processed)
-        if not p_data:
-            if party_id_being_processed in parties_awaiting_extension_reply: del parties_awaiting_extension_reply[
-                party_id_being_processed]
-            return
+        extension_data_for_party = parties_awaiting_extension_reply.get(party_id_being_processed)
+        if not p_data or not extension_data_for_party or p_data.get("leader_id") != message.author.id:
+            return False, None
+        if datetime.datetime.now(datetime.timezone.utc).timestamp() >= extension_data_for_party['reply_due_ts']:
+            if extension_data_for_party.get('reminder_message_id'):
+                try:
+                    await self.messages.delete("reminder_delete", message.channel.get_partial_message(
+                        extension_data_for_party['reminder_message_id']))
+                except:
+                    pass
+            try:
+                await message.delete()
+            except:
+                pass
+            try:
+                await message.channel.send(
+                    f"Odpowiedź ('{message.content}') dla party '{p_data.get('party_name', 'N/A')}' przyszła po czasie.",
+                    delete_after=config.DM_MESSAGE_DELETE_DELAY * 2)
+            except:
+                pass
+            active_parties.clear_extension_reply(party_id_being_processed)
+            save_party_data()
+            return False, None
         reply_content = message.content.strip().lower()
         bot_response_after_reply_msg = None
-        user_reply_msg = message
         if extension_data_for_party.get('reminder_message_id'):
             try:
-                original_reminder_msg = await message.channel.fetch_message(
-                    extension_data_for_party['reminder_message_id'])
-                await original_reminder_msg.delete()
+                await self.messages.delete("reminder_delete", message.channel.get_partial_message(
+                    extension_data_for_party['reminder_message_id']))
             except:
                 pass
-        if reply_content == "tak":
-            new_expiry_ts = p_data["expiry_timestamp"] + datetime.timedelta(
-                hours=config.PARTY_EXTEND_BY_HOURS).total_seconds()
-            p_data["expiry_timestamp"] = new_expiry_ts
-            next_rem_ts_after_extend = new_expiry_ts - datetime.timedelta(
-                hours=config.EXTENSION_REMINDER_HOURS_BEFORE_EXPIRY).total_seconds()
-            if config.PARTY_LIFESPAN_HOURS <= config.EXTENSION_REMINDER_HOURS_BEFORE_EXPIRY: next_rem_ts_after_extend = new_expiry_ts
-            p_data["next_reminder_timestamp"] = next_rem_ts_after_extend
-            p_data["reminder_sent_for_current_cycle"] = False
-            p_data["extension_reminder_dm_id"] = None
-            del parties_awaiting_extension_reply[party_id_being_processed]
-            save_party_data()
-            bot_response_after_reply_msg = await message.channel.send(
-                f"Party **'{p_data['party_name']}'** przedłużone! Nowy czas wygaśnięcia: <t:{int(new_expiry_ts)}:F>.")
-            await self.send_leader_control_panel(message.author, party_id_being_processed)
-            print(f"INFO REPLY: Party {party_id_being_processed} przedłużone przez lidera.")
-        elif reply_content == "nie":
-            p_data["extension_reminder_dm_id"] = None
-            del parties_awaiting_extension_reply[party_id_being_processed]
-            save_party_data()
-            bot_response_after_reply_msg = await message.channel.send(
-                f"Nie przedłużono party **'{p_data['party_name']}'**. Wygasnie <t:{int(p_data['expiry_timestamp'])}:R>.")
-            print(f"INFO REPLY: Lider nie przedłużył party {party_id_being_processed}.")
+        if reply_content in ("tak", "nie"):
+            response_content = self._apply_extension_decision(party_id_being_processed, p_data,
+                                                              extend=reply_content == "tak")
+            if not await commit_party_data():
+                response_content += f"\n{PARTY_DATA_UNSAVED_NOTE}"
+            bot_response_after_reply_msg = await message.channel.send(response_content)
         else:
             current_reply_due_ts = extension_data_for_party['reply_due_ts']
             new_reminder_content = (
                 f"⚠️ Nieprawidłowa odpowiedź: '{message.content}'.\n"
                 f"Party **'{p_data['party_name']}'** wygasa <t:{int(p_data['expiry_timestamp'])}:R>.\n"
-                f"Przedłużyć o **{config.PARTY_EXTEND_BY_HOURS}**h? Odpisz `Tak`/`Nie` do <t:{int(current_reply_due_ts)}:R>."
+                f"Przedłużyć o **{config.PARTY_EXTEND_BY_HOURS}**h? Kliknij przycisk albo odpisz `Tak`/`Nie` do <t:{int(current_reply_due_ts)}:R>."
             )
             try:
-                new_reminder_msg = await message.channel.send(new_reminder_content)
-                parties_awaiting_extension_reply[party_id_being_processed]['reminder_message_id'] = new_reminder_msg.id
-                p_data["extension_reminder_dm_id"] = new_reminder_msg.id
+                new_reminder_msg = await message.channel.send(
+                    new_reminder_content, components=self._extension_reminder_buttons(party_id_being_processed))
+                active_parties.set_extension_reply(party_id_being_processed, current_reply_due_ts,
+                                                   message.channel.id, new_reminder_msg.id)
+                active_parties.update_fields(party_id_being_processed, extension_reminder_dm_id=new_reminder_msg.id)
                 save_party_data()
-                bot_response_after_reply_msg = None
             except disnake.HTTPException as e:
                 print(
                     f"BŁĄD REPLY: Nie udało się wysłać ponownego przypomnienia dla party {party_id_being_processed}: {e}")
-            user_reply_msg = message
-        await self._cleanup_dm_messages(None, bot_message=bot_response_after_reply_msg, user_message=user_reply_msg)
-
+        return True, bot_response_after_reply_msg
+
+    @staticmethod
+    def _extension_reminder_buttons(party_id: int) -> list[disnake.ui.Button]:
+        return [
+            disnake.ui.Button(label=f"Przedłuż o {config.PARTY_EXTEND_BY_HOURS}h", style=disnake.ButtonStyle.success,
+                              custom_id=encode_custom_id("extend", party_id)),
+            disnake.ui.Button(label="Nie przedłużaj", style=disnake.ButtonStyle.secondary,
+                              custom_id=encode_custom_id("extend_decline", party_id)),
+        ]
+
+    def _apply_extension_decision(self, party_id: int, p_data: dict, extend: bool) -> str:
+        """Przedłuża party albo kończy oczekiwanie na odpowiedź; zwraca potwierdzenie dla lidera."""
+        if extend:
+            new_expiry_ts = p_data["expiry_timestamp"] + datetime.timedelta(
+                hours=config.PARTY_EXTEND_BY_HOURS).total_seconds()
+            next_rem_ts_after_extend = new_expiry_ts - datetime.timedelta(
+                hours=config.EXTENSION_REMINDER_HOURS_BEFORE_EXPIRY).total_seconds()
+            if config.PARTY_LIFESPAN_HOURS <= config.EXTENSION_REMINDER_HOURS_BEFORE_EXPIRY: next_rem_ts_after_extend = new_expiry_ts
+            active_parties.extend(party_id, new_expiry_ts, next_rem_ts_after_extend)
+            active_parties.clear_extension_reply(party_id)
+            save_party_data()
+            self.request_party_render(party_id, "leader_panel")
+            print(f"INFO REPLY: Party {party_id} przedłużone przez lidera.")
+            return f"Party **'{p_data['party_name']}'** przedłużone! Nowy czas wygaśnięcia: <t:{int(new_expiry_ts)}:F>."
+        active_parties.update_fields(party_id, extension_reminder_dm_id=None)
+        active_parties.clear_extension_reply(party_id)
+        save_party_data()
+        print(f"INFO REPLY: Lider nie przedłużył party {party_id}.")
+        return f"Nie przedłużono party **'{p_data['party_name']}'**. Wygasnie <t:{int(p_data['expiry_timestamp'])}:R>."
+
+    async def _handle_extension_button_interaction(self, interaction: disnake.MessageInteraction,
+                                                   payload: ComponentPayload):
+        # Router potwierdził już przycisk (defer - aktualizacja wiadomości), więc kolejka skrzynki i zapis danych
+        # nie grożą przekroczeniem 3 s; odpowiedzią jest edycja przypomnienia (przyciski znikają)
+        party_id = payload.party_id
+        outcome, response_content = await self.mailboxes.submit(party_id, lambda: self._take_extension_decision(
+            party_id, interaction.user.id, interaction.message.id, extend=payload.action == "extend"),
+                                                                "extension_reply")
+        if outcome == "not_leader":
+            await interaction.followup.send(response_content, ephemeral=True)
+            return
+        await interaction.edit_original_response(content=response_content, components=[])
+
+    async def _take_extension_decision(self, party_id: int, user_id: int, reminder_message_id: int,
+                                       extend: bool) -> tuple[str, str]:
+        """Operacja skrzynki party: decyzja z przycisku przypomnienia. Zwraca (wynik, treść odpowiedzi)."""
+        p_data = active_parties.get(party_id)
+        reply_info = parties_awaiting_extension_reply.get(party_id)
+        if p_data and user_id != p_data["leader_id"]:
+            return "not_leader", "Tylko lider może przedłużyć party."
+        if not p_data or not reply_info or reply_info.get("reminder_message_id") != reminder_message_id:
+            return "stale", "To przypomnienie jest już nieaktualne."
+        if datetime.datetime.now(datetime.timezone.utc).timestamp() >= reply_info["reply_due_ts"]:
+            active_parties.clear_extension_reply(party_id)
+            save_party_data()
+            return "late", f"Odpowiedź dla party '{p_data.get('party_name', 'N/A')}' przyszła po czasie."
+        response_content = self._apply_extension_decision(party_id, p_data, extend=extend)
+        if not await commit_party_data():
+            response_content += f"\n{PARTY_DATA_UNSAVED_NOTE}"
+        return "decided", response_content
 
 def setup(bot: commands.Bot):
     cog_instance = PartyManagementCog(bot)
@@ -0,0 +1,103 @@
+# party_bot/cogs/party_members.py
+
+import asyncio
+import time
+from typing import Iterable
+
+import disnake
+
+# Discord przyjmuje najwyżej 100 ID w jednym żądaniu członków gildii (REQUEST_GUILD_MEMBERS).
+QUERY_MEMBERS_MAX_IDS = 100
+
+
+class MemberResolver:
+    """Rozwiązywanie ID członków party na obiekty Member, wspólne dla emblematu, embedu ustawień i panelu lidera.
+
+    `get()` jest synchroniczne (dla builderów renderowania): najpierw cache gildii z gatewaya,
+    potem własna pamięć z TTL. `resolve()` przed renderowaniem dociąga brakujących członków:
+    wszystkie ID zgłoszone w tej samej chwili dla jednej gildii trafiają do jednej partii,
+    pobieranej przez `guild.query_members(user_ids=...)` w kawałkach po 100. ID, których
+    gildia nie zwróciła (np. ktoś wyszedł z serwera), też są zapamiętywane - do wygaśnięcia
+    TTL nie pytamy o nie ponownie.
+    """
+
+    def __init__(self, ttl_seconds: float, query_timeout_seconds: float = 10.0):
+        self.ttl_seconds = ttl_seconds
+        self.query_timeout_seconds = query_timeout_seconds
+        self._memo: dict[tuple[int, int], tuple[disnake.Member | None, float]] = {}
+        self._queued: dict[int, set[int]] = {}
+        self._batches: dict[int, asyncio.Task] = {}
+        self._next_prune = 0.0
+        self.hits_gateway_cache = 0
+        self.hits_memo = 0
+        self.batches_fetched = 0
+        self.ids_fetched = 0
+        self.ids_not_found = 0
+
+    def stats(self) -> dict:
+        return {"memo_size": len(self._memo), "hits_gateway_cache": self.hits_gateway_cache,
+                "hits_memo": self.hits_memo, "batches_fetched": self.batches_fetched,
+                "ids_fetched": self.ids_fetched, "ids_not_found": self.ids_not_found}
+
+    def _memo_lookup(self, guild_id: int, user_id: int, now: float):
+        """(True, member|None) gdy wpis jest aktualny, (False, None) gdy go brak lub wygasł."""
+        entry = self._memo.get((guild_id, user_id))
+        if entry is None or entry[1] <= now:
+            return False, None
+        return True, entry[0]
+
+    def get(self, guild: disnake.Guild, user_id: int) -> disnake.Member | None:
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.hits_gateway_cache += 1
+            return member
+        found, member = self._memo_lookup(guild.id, user_id, time.monotonic())
+        if found:
+            self.hits_memo += 1
+        return member
+
+    def mention(self, guild: disnake.Guild | None, user_id: int, fallback: str = "ID:{id}") -> str:
+        member = self.get(guild, user_id) if guild is not None else None
+        return member.mention if member is not None else fallback.format(id=user_id)
+
+    def _prune(self, now: float):
+        if now < self._next_prune:
+            return
+        self._memo = {key: entry for key, entry in self._memo.items() if entry[1] > now}
+        self._next_prune = now + self.ttl_seconds
+
+    async def resolve(self, guild: disnake.Guild, user_ids: Iterable[int]):
+        """Dociąga do pamięci członków, których nie ma w cache gildii ani w pamięci."""
+        now = time.monotonic()
+        self._prune(now)
+        missing = {user_id for user_id in user_ids
+                   if guild.get_member(user_id) is None and not self._memo_lookup(guild.id, user_id, now)[0]}
+        if not missing:
+            return
+        self._queued.setdefault(guild.id, set()).update(missing)
+        batch = self._batches.get(guild.id)
+        if batch is None:
+            batch = self._batches[guild.id] = asyncio.get_running_loop().create_task(self._fetch_batch(guild))
+        await asyncio.shield(batch)
+
+    async def _fetch_batch(self, guild: disnake.Guild):
+        # Jeden obrót pętli na dołączenie pozostałych zgłoszeń z tej chwili do tej samej partii
+        await asyncio.sleep(0)
+        if self._batches.get(guild.id) is asyncio.current_task():
+            del self._batches[guild.id]
+        user_ids = list(self._queued.pop(guild.id, ()))
+        self.batches_fetched += 1
+        for start in range(0, len(user_ids), QUERY_MEMBERS_MAX_IDS):
+            chunk = user_ids[start:start + QUERY_MEMBERS_MAX_IDS]
+            try:
+                members = await asyncio.wait_for(guild.query_members(user_ids=chunk, limit=len(chunk), cache=True),
+                                                 timeout=self.query_timeout_seconds)
+            except (asyncio.TimeoutError, disnake.HTTPException, disnake.ClientException) as e:
+                print(f"WARN: Nie udało się pobrać {len(chunk)} członków gildii {guild.id}: {e!r}")
+                continue
+            expires_at = time.monotonic() + self.ttl_seconds
+            found = {member.id: member for member in members}
+            for user_id in chunk:
+                self._memo[(guild.id, user_id)] = (found.get(user_id), expires_at)
+            self.ids_fetched += len(found)
+            self.ids_not_found += len(chunk) - len(found)
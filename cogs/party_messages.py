@@ -0,0 +1,52 @@
+# party_bot/cogs/party_messages.py
+
+from collections import Counter
+
+import disnake
+
+from cogs.party_outbound import RestPriority, rest_priority
+
+
+class PartyMessageHandles:
+    """Edycja i usuwanie zapisanych wiadomości party bez wcześniejszego fetch_message().
+
+    Z zapisanych identyfikatorów kanału i wiadomości (emblem_message_id, settings_embed_message_id,
+    leader_panel_dm_id, extension_reminder_dm_id) budujemy PartialMessage, więc każda operacja
+    to jedno wywołanie REST zamiast dwóch. Wyjątki (w tym NotFound) trafiają do wołającego,
+    który decyduje, czy wiadomość utworzyć od nowa.
+
+    Licznik `operations` liczy zlecone operacje (edycja zastąpiona w kolejce nowszą nie trafia
+    do Discorda); faktycznie wysłane wywołania REST per trasa liczy RestMetrics (party_rest_calls).
+    Porównanie z dawną ścieżką fetch_message() + operacja (wywołania na operację) raportuje
+    benchmarks/bench_party_load.py.
+    """
+
+    def __init__(self, bot: disnake.Client):
+        self.bot = bot
+        self.operations: Counter = Counter()
+
+    def partial(self, channel: disnake.abc.Messageable | int, message_id: int,
+                channel_type: disnake.ChannelType = disnake.ChannelType.text) -> disnake.PartialMessage:
+        if isinstance(channel, int):
+            channel = self.bot.get_channel(channel) or self.bot.get_partial_messageable(channel, type=channel_type)
+        return channel.get_partial_message(message_id)
+
+    async def dm_partial(self, user: disnake.abc.User, message_id: int) -> disnake.PartialMessage:
+        """Wiadomość w DM użytkownika; create_dm() zwraca kanał z cache, jeśli już istnieje."""
+        if user.dm_channel is None:
+            self.operations["create_dm"] += 1
+        dm_channel = await user.create_dm()
+        return dm_channel.get_partial_message(message_id)
+
+    async def edit(self, operation: str, message: disnake.PartialMessage, **fields) -> disnake.Message:
+        self.operations[operation] += 1
+        # Edycja zawsze wysyła całą treść, więc czekającą w kolejce starszą edycję tej wiadomości można pominąć
+        with rest_priority(RestPriority.COSMETIC, supersede_key=(operation, message.id)):
+            return await message.edit(**fields)
+
+    async def delete(self, operation: str, message: disnake.PartialMessage):
+        self.operations[operation] += 1
+        await message.delete()
+
+    def stats(self) -> dict:
+        return dict(self.operations)
@@ -0,0 +1,322 @@
+# party_bot/cogs/party_metrics.py
+
+import bisect
+import contextlib
+import contextvars
+import logging
+import math
+import time
+from collections import deque
+from typing import Callable
+
+from aiohttp import web
+
+
+class LatencyRecorder:
+    """Próbki czasu trwania operacji (w sekundach) w przesuwnym oknie, z percentylami per nazwa."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        self.counts: dict[str, int] = {}
+
+    def record(self, name: str, seconds: float):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def percentile(self, name: str, q: float) -> float | None:
+        samples = self._samples.get(name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+    def summary(self) -> dict:
+        return {name: {"count": self.counts[name], "p50_ms": round(self.percentile(name, 50) * 1000, 1),
+                       "p99_ms": round(self.percentile(name, 99) * 1000, 1)}
+                for name in self._samples}
+
+    def format(self, name: str) -> str:
+        p50, p99 = self.percentile(name, 50), self.percentile(name, 99)
+        if p50 is None:
+            return f"{name}: brak próbek"
+        return f"{name}: p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms (n={self.counts[name]})"
+
+
+# Przedziały histogramów czasu (w sekundach) - od szybkich odczytów po wolne wywołania REST.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+_LE_INF = 'le="+Inf"'
+
+
+class Counter:
+    """Licznik z etykietami; `inc()` to jeden odczyt i zapis w słowniku."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        for labelvalues, value in self._values.items():
+            yield f"{self.name}_total{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histogram o stałych przedziałach; `observe()` kosztuje jedno bisect i dwa dodawania."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [liczniki przedziałów (+ ostatni dla +Inf), suma, liczba próbek]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def count(self, *labelvalues) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def samples(self):
+        for labelvalues, (bucket_counts, total, count) in self._series.items():
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(upper_bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, _LE_INF)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labelvalues)} {count}"
+
+
+class Gauge:
+    """Wartość liczona dopiero przy odczycie metryk: `collect()` zwraca liczbę albo {labelvalues: liczba}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], float | dict], labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._collect = collect
+
+    def samples(self):
+        collected = self._collect()
+        if not isinstance(collected, dict):
+            collected = {(): collected}
+        for labelvalues, value in collected.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Metryki w formacie tekstowym Prometheusa.
+
+    Liczniki i histogramy są aktualizowane w miejscu zdarzenia (bez blokad - wszystko dzieje
+    się w pętli zdarzeń), a wskaźniki (gauge) są liczone dopiero przy odczycie `/metrics`,
+    więc nie kosztują nic między odczytami.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metryka '{metric.name}' jest już zarejestrowana.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, collect: Callable[[], float | dict],
+              labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, collect, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            exposed_name = f"{metric.name}_total" if metric.kind == "counter" else metric.name
+            lines.append(f"# HELP {exposed_name} {metric.documentation}")
+            lines.append(f"# TYPE {exposed_name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                print(f"BŁĄD: Nie udało się odczytać metryki {metric.name}: {e!r}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Lokalny endpoint HTTP (aiohttp) z metrykami pod `/metrics`."""
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Prometheus-Format": "0.0.4"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            await runner.cleanup()
+            print(f"BŁĄD: Nie udało się uruchomić endpointu metryk na {self.host}:{self.port}: {e}")
+            return
+        self._runner = runner
+        print(f"INFO: Metryki dostępne pod http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+_current_rest_operation: contextvars.ContextVar[str] = contextvars.ContextVar("party_rest_operation", default="?")
+
+
+class RateLimitLogHandler(logging.Handler):
+    """disnake obsługuje 429 sam (czeka i ponawia), zostawiając tylko ostrzeżenie w logu.
+
+    Jeden handler na loggerze `disnake.http` rozpoznaje to ostrzeżenie i przekazuje słuchaczom operację
+    REST bieżącego żądania (z kontekstu RestMetrics). Słuchacze (RestMetrics, RestScheduler) dokładają
+    własne etykiety - np. klasę pilności - z tego samego kontekstu żądania.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self._listeners: list[Callable[[str], None]] = []
+
+    def subscribe(self, listener: Callable[[str], None]):
+        if not self._listeners:
+            logging.getLogger("disnake.http").addHandler(self)
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+        if not self._listeners:
+            logging.getLogger("disnake.http").removeHandler(self)
+
+    def emit(self, record: logging.LogRecord):
+        if isinstance(record.msg, str) and record.msg.startswith("We are being rate limited"):
+            operation = _current_rest_operation.get()
+            for listener in list(self._listeners):
+                listener(operation)
+
+
+rate_limit_log = RateLimitLogHandler()
+
+
+class RestMetrics:
+    """Liczniki i czasy wywołań REST per operacja (metoda + szablon ścieżki, np. `PATCH /channels/{channel_id}`).
+
+    Owija `HTTPClient.request` bota pod kolejkami RestScheduler: liczy tylko wywołania faktycznie wysłane
+    (zastąpione w kolejce nie), a czas nie obejmuje oczekiwania w kolejce. Odpowiedzi 429 są liczone
+    z ostrzeżeń loggera `disnake.http` (`rate_limit_log`).
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.calls = registry.counter("party_rest_calls", "Wywołania REST Discorda per operacja i wynik.",
+                                      ("operation", "status"))
+        self.duration = registry.histogram("party_rest_duration_seconds",
+                                           "Czas wywołań REST Discorda (z oczekiwaniem na limity).", ("operation",))
+        self.rate_limited = registry.counter("party_rest_rate_limited", "Odpowiedzi 429 per operacja REST.",
+                                             ("operation",))
+        self._http = None
+        self._original_request = None
+
+    def install(self, http):
+        if self._http is not None:
+            return
+        self._http, self._original_request = http, http.request
+        original_request = http.request
+
+        async def request(route, *args, **kwargs):
+            operation = f"{route.method} {route.path}"
+            token = _current_rest_operation.set(operation)
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                return await original_request(route, *args, **kwargs)
+            except Exception as e:
+                status = str(getattr(e, "status", type(e).__name__))
+                raise
+            finally:
+                self.duration.observe(time.perf_counter() - started, operation)
+                self.calls.inc(operation, status)
+                _current_rest_operation.reset(token)
+
+        http.request = request
+        rate_limit_log.subscribe(self.rate_limited.inc)
+
+    def uninstall(self):
+        if self._http is None:
+            return
+        self._http.request = self._original_request
+        self._http = self._original_request = None
+        rate_limit_log.unsubscribe(self.rate_limited.inc)
@@ -0,0 +1,427 @@
+# party_bot/cogs/party_outbound.py
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Callable, Hashable
+
+from cogs.party_metrics import LatencyRecorder, MetricsRegistry, rate_limit_log
+
+
+class RestPriority(IntEnum):
+    """Klasy pilności wywołań REST (mniejsza wartość = pilniejsze)."""
+
+    INTERACTION = 0  # wywołania, na które czeka użytkownik interakcji (zanim dostanie followup)
+    PERMISSIONS = 1  # zmiany uprawnień (dołączenie / opuszczenie party)
+    DM = 2  # wiadomości prywatne
+    DEFAULT = 3  # pozostałe: tworzenie i zmiana kanałów, ogłoszenia w kanałach party
+    COSMETIC = 4  # edycje embedów i paneli, usuwanie wiadomości i kanałów przy sprzątaniu
+
+
+_current_priority: contextvars.ContextVar[RestPriority | None] = contextvars.ContextVar("party_rest_priority",
+                                                                                        default=None)
+_current_supersede_key: contextvars.ContextVar[Hashable | None] = contextvars.ContextVar("party_rest_supersede_key",
+                                                                                         default=None)
+# Klasa wywołania, które właśnie wykonuje disnake (do przypisania ostrzeżeń o 429)
+_executing_priority: contextvars.ContextVar[RestPriority | None] = contextvars.ContextVar(
+    "party_rest_executing_priority", default=None)
+
+_PERMISSION_PATHS = frozenset({"/channels/{channel_id}/permissions/{target}",
+                               "/guilds/{guild_id}/members/{user_id}/roles/{role_id}"})
+_COSMETIC_ROUTES = frozenset({("PATCH", "/channels/{channel_id}/messages/{message_id}"),
+                              ("DELETE", "/channels/{channel_id}/messages/{message_id}"),
+                              ("POST", "/channels/{channel_id}/messages/bulk-delete"),
+                              ("DELETE", "/channels/{channel_id}")})
+
+
+@contextlib.contextmanager
+def rest_priority(priority: RestPriority, supersede_key: Hashable | None = None):
+    """Nadaje klasę (i opcjonalnie klucz zastępowania) wywołaniom REST wykonanym w tym bloku.
+
+    Wywołanie z `supersede_key`, które jeszcze czeka w kolejce, jest zastępowane przez nowsze
+    wywołanie z tym samym kluczem - wolno go używać tylko dla pełnych edycji (np. cały embed i widok).
+    """
+    priority_token = _current_priority.set(priority)
+    key_token = _current_supersede_key.set(supersede_key)
+    try:
+        yield
+    finally:
+        _current_supersede_key.reset(key_token)
+        _current_priority.reset(priority_token)
+
+
+class _Pending:
+    __slots__ = ("priority", "seq", "supersede_key", "enqueued_at", "busy_at_enqueue", "turn", "superseded_by",
+                 "outcome")
+
+    def __init__(self, priority: RestPriority, seq: int, supersede_key: Hashable | None, busy_at_enqueue: float):
+        self.priority = priority
+        self.seq = seq
+        self.supersede_key = supersede_key
+        self.enqueued_at = time.perf_counter()
+        # Licznik zajętości bucketu przy wejściu do kolejki (odróżnia opóźnienie kolejek od blokady bucketu)
+        self.busy_at_enqueue = busy_at_enqueue
+        # True - kolej na wysłanie, False - zastąpione przez superseded_by
+        self.turn = asyncio.get_running_loop().create_future()
+        self.superseded_by: _Pending | None = None
+        # Wynik dla zastąpionych wywołań; tworzony dopiero, gdy ktoś na niego czeka
+        self.outcome: asyncio.Future | None = None
+
+    def __lt__(self, other: "_Pending") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _BucketQueue:
+    """Kolejka jednego bucketu limitów disnake: najwyżej jedno wywołanie w locie, reszta wg priorytetu.
+
+    Wolny bucket prosi globalny limit o jeden token - w imieniu najpilniejszego czekającego
+    wywołania; gdy dojdzie pilniejsze, prośba jest ponawiana z jego klasą. Kolej dostaje
+    najpilniejsze wywołanie w chwili przydziału tokenu, więc zajęty bucket zawsze oznacza żądanie
+    faktycznie w drodze, a niewysłana praca COSMETIC nie blokuje pilniejszych wywołań.
+    """
+
+    __slots__ = ("waiting", "by_key", "busy", "token", "token_for", "busy_since", "busy_total")
+
+    def __init__(self):
+        self.waiting: list[_Pending] = []
+        self.by_key: dict[Hashable, _Pending] = {}
+        self.busy = False
+        # Prośba o token globalnego limitu i (klasa, seq) wywołania, dla którego została złożona
+        self.token: asyncio.Future | None = None
+        self.token_for: tuple[RestPriority, int] | None = None
+        self.busy_since = 0.0
+        self.busy_total = 0.0
+
+    def set_busy(self, busy: bool):
+        now = time.perf_counter()
+        if busy:
+            self.busy_since = now
+        else:
+            self.busy_total += now - self.busy_since
+        self.busy = busy
+
+    def busy_seconds(self) -> float:
+        """Łączny czas, przez który bucket miał wywołanie w locie."""
+        return self.busy_total + (time.perf_counter() - self.busy_since if self.busy else 0.0)
+
+
+class _GlobalGate:
+    """Globalny limit bota (żądań na sekundę) jako wiadro tokenów; przy braku tokenów pierwsza jest pilniejsza klasa.
+
+    Dopóki są tokeny, `reserve()` zwraca od razu rozstrzygniętą przyszłość - bramka nie dodaje opóźnienia.
+    """
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._tokens = per_second
+        self._updated = time.monotonic()
+        # (klasa, seq, numer prośby, przyszłość) - ta sama para (klasa, seq) wraca po wycofaniu prośby
+        self._waiters: list[tuple[int, int, int, asyncio.Future]] = []
+        self._requests = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.per_second, self._tokens + (now - self._updated) * self.per_second)
+        self._updated = now
+
+    def reserve(self, priority: RestPriority, seq: int) -> asyncio.Future:
+        """Przyszłość rozstrzygana, gdy wywołanie dostanie token (od razu, jeśli są wolne)."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            waiter.set_result(None)
+            return waiter
+        heapq.heappush(self._waiters, (priority, seq, next(self._requests), waiter))
+        self._release_waiters()
+        return waiter
+
+    def withdraw(self, waiter: asyncio.Future):
+        """Rezygnacja z tokenu (wywołanie zastąpione albo anulowane przed wysłaniem); wydany token wraca."""
+        if not waiter.done():
+            waiter.cancel()
+        elif not waiter.cancelled():
+            self._refill()
+            self._tokens = min(self.per_second, self._tokens + 1)
+            self._release_waiters()
+
+    def _on_timer(self):
+        self._timer = None
+        self._release_waiters()
+
+    def _release_waiters(self):
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            *_, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue
+            self._tokens -= 1
+            waiter.set_result(None)
+        if self._waiters and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later((1 - self._tokens) / self.per_second,
+                                                                self._on_timer)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class RestScheduler:
+    """Kolejkowanie wywołań REST bota wg klas pilności (RestPriority).
+
+    Owija `HTTPClient.request` (jak RestMetrics). Każdy bucket limitów disnake (`route.bucket`)
+    ma własną kolejkę i najwyżej jedno wywołanie w locie - disnake i tak trzyma blokadę bucketu
+    do końca żądania, a po wyczerpaniu limitu (nagłówki X-RateLimit-*) do jego odnowienia, więc
+    zamiast kolejności FIFO na tej blokadzie następne idzie najpilniejsze czekające wywołanie.
+    Ponad bucketami działa globalny limit `global_per_second`: wolny bucket czeka na token z klasą
+    swojego najpilniejszego wywołania (przy braku tokenów pierwsza jest pilniejsza klasa), a gdy
+    tokeny są, nie czeka wcale. Na token czeka najwyżej jedno wywołanie na bucket, więc długa
+    kolejka jednego bucketu (np. tworzenie kanałów) nie zabiera tokenów pozostałym.
+
+    Klasa wywołania: z `rest_priority()`, a bez niego z trasy (uprawnienia, DM, edycje/usuwanie
+    wiadomości i kanałów). Edycje i sprzątanie zostają COSMETIC także w bloku INTERACTION.
+    Czekające wywołanie zastąpione nowszym z tym samym `supersede_key` (albo identyczne DELETE)
+    nie jest wysyłane - jego wołający dostaje wynik nowszego. Odpowiedzi na interakcje idą przez
+    webhooki interakcji (osobne limity, poza globalnym) i w ogóle nie trafiają do tych kolejek.
+    """
+
+    def __init__(self, global_per_second: float, is_dm_channel: Callable[[int], bool],
+                 metrics: MetricsRegistry | None = None):
+        self.global_per_second = global_per_second
+        self.is_dm_channel = is_dm_channel
+        self._global = _GlobalGate(global_per_second)
+        self._buckets: dict[str, _BucketQueue] = {}
+        self._seq = itertools.count()
+        self.queued = {priority: 0 for priority in RestPriority}
+        self.sent = {priority: 0 for priority in RestPriority}
+        self.superseded = {priority: 0 for priority in RestPriority}
+        self.rate_limited = {priority: 0 for priority in RestPriority}
+        self.max_wait = {priority: 0.0 for priority in RestPriority}
+        # Próbki per klasa: "<klasa>" - całe oczekiwanie, "<klasa>:delay" - bez czasu, gdy bucket miał wywołanie
+        # w locie (tyle i tak czekałoby się na blokadzie bucketu disnake) - czyli opóźnienie dodane przez kolejki
+        self.waits = LatencyRecorder()
+        self._http = None
+        self._original_request = None
+        self._wait_seconds = self._superseded_counter = None
+        if metrics is not None:
+            self._wait_seconds = metrics.histogram(
+                "party_rest_queue_wait_seconds", "Czas oczekiwania wywołań REST w kolejkach per klasa pilności.",
+                ("priority",))
+            self._superseded_counter = metrics.counter(
+                "party_rest_superseded", "Wywołania REST zastąpione nowszymi przed wysłaniem.", ("priority",))
+            metrics.gauge("party_rest_queue_depth", "Wywołania REST czekające w kolejkach per klasa pilności.",
+                          lambda: {(priority.name.lower(),): count for priority, count in self.queued.items()},
+                          ("priority",))
+
+    def classify(self, route) -> RestPriority:
+        if (route.method, route.path) in _COSMETIC_ROUTES:
+            return RestPriority.COSMETIC
+        if route.path in _PERMISSION_PATHS:
+            route_priority = RestPriority.PERMISSIONS
+        elif route.path == "/users/@me/channels" or (
+                route.method == "POST" and route.path == "/channels/{channel_id}/messages"
+                and route.channel_id is not None and self.is_dm_channel(int(route.channel_id))):
+            route_priority = RestPriority.DM
+        else:
+            route_priority = RestPriority.DEFAULT
+        explicit = _current_priority.get()
+        if explicit is None:
+            return route_priority
+        # Blok rest_priority() może wywołanie tylko przyspieszyć - chyba że sam oznacza je jako COSMETIC
+        return explicit if explicit == RestPriority.COSMETIC else min(explicit, route_priority)
+
+    def install(self, http):
+        if self._http is not None:
+            return
+        self._http, self._original_request = http, http.request
+        original_request = http.request
+
+        async def request(route, *args, **kwargs):
+            return await self._request(original_request, route, args, kwargs)
+
+        http.request = request
+        rate_limit_log.subscribe(self._on_rate_limited)
+
+    def uninstall(self):
+        if self._http is None:
+            return
+        self._http.request = self._original_request
+        self._http = self._original_request = None
+        rate_limit_log.unsubscribe(self._on_rate_limited)
+        self._global.close()
+
+    def _on_rate_limited(self, operation: str):
+        # disnake ponawia 429 sam - ostrzeżenie przypisujemy do klasy wykonywanego wywołania
+        priority = _executing_priority.get()
+        if priority is not None:
+            self.rate_limited[priority] += 1
+
+    def _enqueue(self, bucket: _BucketQueue, route) -> _Pending:
+        priority = self.classify(route)
+        supersede_key = _current_supersede_key.get()
+        if supersede_key is None and route.method == "DELETE":
+            supersede_key = ("DELETE", route.url)
+        pending = _Pending(priority, next(self._seq), supersede_key, bucket.busy_seconds())
+        if supersede_key is not None:
+            previous = bucket.by_key.get(supersede_key)
+            if previous is not None and not previous.turn.done():
+                # Starsze wywołanie jeszcze nie wyszło - nowsze je zastępuje (zostaje na liście, pominięte przy wyborze)
+                previous.superseded_by = pending
+                previous.turn.set_result(False)
+                self.queued[previous.priority] -= 1
+                self.superseded[previous.priority] += 1
+                if self._superseded_counter is not None:
+                    self._superseded_counter.inc(previous.priority.name.lower())
+            bucket.by_key[supersede_key] = pending
+        bucket.waiting.append(pending)
+        self.queued[priority] += 1
+        return pending
+
+    def _grant_next(self, bucket_key: str, bucket: _BucketQueue):
+        """Przydziela kolej najpilniejszemu wywołaniu wolnego bucketu albo prosi dla niego o token."""
+        if bucket.busy:
+            return
+        # Kolejki bucketów są krótkie (jeden kanał / jedna trasa), więc wystarczy przejrzeć listę
+        bucket.waiting = [pending for pending in bucket.waiting if not pending.turn.done()]
+        if not bucket.waiting:
+            if bucket.token is not None:
+                self._global.withdraw(bucket.token)
+                bucket.token = bucket.token_for = None
+            if self._buckets.get(bucket_key) is bucket:
+                del self._buckets[bucket_key]
+            return
+        pending = min(bucket.waiting)
+        if bucket.token is not None and bucket.token.done():
+            bucket.token = bucket.token_for = None
+            bucket.waiting.remove(pending)
+            bucket.set_busy(True)
+            self.queued[pending.priority] -= 1
+            pending.turn.set_result(True)
+            return
+        if bucket.token is not None:
+            if bucket.token_for[0] <= pending.priority:
+                # Prośba złożona dla co najmniej tak pilnej klasy - token dostanie najpilniejsze w chwili przydziału
+                return
+            # Doszło pilniejsze wywołanie - prośba o token z jego klasą
+            self._global.withdraw(bucket.token)
+        bucket.token_for = (pending.priority, pending.seq)
+        bucket.token = token = self._global.reserve(pending.priority, pending.seq)
+        if token.done():
+            self._grant_next(bucket_key, bucket)
+        else:
+            token.add_done_callback(lambda done: self._on_token(bucket_key, bucket, done))
+
+    def _on_token(self, bucket_key: str, bucket: _BucketQueue, token: asyncio.Future):
+        if not token.cancelled() and bucket.token is token:
+            self._grant_next(bucket_key, bucket)
+
+    def _finish(self, bucket_key: str, bucket: _BucketQueue, pending: _Pending):
+        if pending.supersede_key is not None and bucket.by_key.get(pending.supersede_key) is pending:
+            del bucket.by_key[pending.supersede_key]
+        bucket.set_busy(False)
+        self._grant_next(bucket_key, bucket)
+
+    async def _request(self, original_request, route, args: tuple, kwargs: dict):
+        bucket_key = route.bucket
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = _BucketQueue()
+        pending = self._enqueue(bucket, route)
+        self._grant_next(bucket_key, bucket)
+        try:
+            granted = await pending.turn
+        except asyncio.CancelledError:
+            # Anulowanie zadania anuluje też oczekiwaną kolej; przydzielona (True) zwalnia bucket,
+            # zastąpiona (False) jest już rozliczona
+            if not pending.turn.done():
+                pending.turn.cancel()
+            if pending.turn.cancelled():
+                self.queued[pending.priority] -= 1
+                self._grant_next(bucket_key, bucket)
+            elif pending.turn.result():
+                self._finish(bucket_key, bucket, pending)
+            self._publish(pending, cancelled=True)
+            raise
+        if not granted:
+            return await self._await_superseding(pending)
+        try:
+            waited = time.perf_counter() - pending.enqueued_at
+            # Bucket jest już zajęty przez to wywołanie - odejmujemy tylko czas sprzed przydziału
+            blocked = bucket.busy_total - pending.busy_at_enqueue
+            self.max_wait[pending.priority] = max(self.max_wait[pending.priority], waited)
+            self.waits.record(pending.priority.name.lower(), waited)
+            self.waits.record(f"{pending.priority.name.lower()}:delay", max(0.0, waited - blocked))
+            if self._wait_seconds is not None:
+                self._wait_seconds.observe(waited, pending.priority.name.lower())
+            self.sent[pending.priority] += 1
+            executing_token = _executing_priority.set(pending.priority)
+            try:
+                result = await original_request(route, *args, **kwargs)
+            finally:
+                _executing_priority.reset(executing_token)
+        except asyncio.CancelledError:
+            self._publish(pending, cancelled=True)
+            raise
+        except Exception as e:
+            self._publish(pending, exception=e)
+            raise
+        finally:
+            self._finish(bucket_key, bucket, pending)
+        self._publish(pending, result=result)
+        return result
+
+    async def _await_superseding(self, pending: _Pending):
+        newer = pending.superseded_by
+        if newer.outcome is None:
+            newer.outcome = asyncio.get_running_loop().create_future()
+        try:
+            result = await asyncio.shield(newer.outcome)
+        except asyncio.CancelledError:
+            self._publish(pending, cancelled=True)
+            raise
+        except Exception as e:
+            self._publish(pending, exception=e)
+            raise
+        self._publish(pending, result=result)
+        return result
+
+    @staticmethod
+    def _publish(pending: _Pending, result=None, exception: BaseException | None = None, cancelled: bool = False):
+        outcome = pending.outcome
+        if outcome is None or outcome.done():
+            return
+        if cancelled:
+            outcome.cancel()
+        elif exception is not None:
+            outcome.set_exception(exception)
+        else:
+            outcome.set_result(result)
+
+    def pending_before(self, priority: RestPriority) -> int:
+        """Liczba czekających w kolejkach wywołań pilniejszych niż `priority`."""
+        return sum(count for queued_priority, count in self.queued.items() if queued_priority < priority)
+
+    def wait_percentile(self, priority: RestPriority, q: float, delay_only: bool = False) -> float | None:
+        """Percentyl czasu oczekiwania (s) ostatnich wysłanych wywołań klasy; None bez próbek.
+
+        `delay_only` pomija czas, w którym bucket wywołania miał inne żądanie w locie.
+        """
+        return self.waits.percentile(priority.name.lower() + (":delay" if delay_only else ""), q)
+
+    def stats(self) -> dict:
+        stats = {}
+        for priority in RestPriority:
+            p99, p99_delay = self.wait_percentile(priority, 99), self.wait_percentile(priority, 99, delay_only=True)
+            stats[priority.name.lower()] = {
+                "queued": self.queued[priority], "sent": self.sent[priority], "superseded": self.superseded[priority],
+                "rate_limited": self.rate_limited[priority],
+                "p99_wait_ms": round(p99 * 1000, 1) if p99 is not None else None,
+                "p99_delay_ms": round(p99_delay * 1000, 1) if p99_delay is not None else None,
+                "max_wait_ms": round(self.max_wait[priority] * 1000, 1)}
+        return stats
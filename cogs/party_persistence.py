@@ -0,0 +1,361 @@
+# party_bot/cogs/party_persistence.py
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+def write_json_atomically(path: str, payload) -> int:
+    """Serializuje payload i podmienia plik atomowo (plik tymczasowy + os.replace).
+
+    Zwraca liczbę zapisanych bajtów. Przy awarii w trakcie zapisu stary plik zostaje nienaruszony.
+    """
+    serialized = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(serialized)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(serialized)
+
+
+# Pola skalarne party zapisywane na dysk (poza listami member_ids i pending_join_requests
+# oraz słownikiem pending_join_deadlines: str(user_id) -> termin wygaśnięcia prośby).
+PARTY_SCALAR_FIELDS = (
+    "emblem_message_id", "guild_id", "leader_id", "party_name", "game_name", "category_id",
+    "settings_channel_id", "settings_embed_message_id", "text_channel_id", "voice_channel_id",
+    "voice_channel_id_2", "expiry_timestamp", "next_reminder_timestamp", "reminder_sent_for_current_cycle",
+    "leader_panel_dm_id", "extension_reminder_dm_id",
+)
+
+
+def apply_party_record(parties: dict, record: dict):
+    """Nakłada jeden wpis dziennika na słownik party (party_id -> dane). Używane przy odtwarzaniu stanu."""
+    op = record.get("op")
+    party_id = record.get("party_id")
+    if op == "create":
+        parties[party_id] = record["data"]
+        return
+    party_data = parties.get(party_id)
+    if party_data is None:
+        return
+    if op == "disband":
+        del parties[party_id]
+    elif op == "member_add":
+        if record["user_id"] not in party_data.setdefault("member_ids", []):
+            party_data["member_ids"].append(record["user_id"])
+    elif op == "member_remove":
+        if record["user_id"] in party_data.get("member_ids", []):
+            party_data["member_ids"].remove(record["user_id"])
+    elif op == "pending_add":
+        if record["user_id"] not in party_data.setdefault("pending_join_requests", []):
+            party_data["pending_join_requests"].append(record["user_id"])
+        if record.get("expires_at") is not None:
+            party_data.setdefault("pending_join_deadlines", {})[str(record["user_id"])] = record["expires_at"]
+    elif op == "pending_remove":
+        if record["user_id"] in party_data.get("pending_join_requests", []):
+            party_data["pending_join_requests"].remove(record["user_id"])
+        party_data.get("pending_join_deadlines", {}).pop(str(record["user_id"]), None)
+    elif op == "rename":
+        party_data["party_name"] = record["party_name"]
+    elif op in ("extend", "update"):
+        party_data.update(record["fields"])
+    else:
+        print(f"WARN: Nieznany typ wpisu dziennika party: {op}")
+
+
+class BufferedPartyStore:
+    """Wspólna część magazynów danych party: bufor zmian i grupowy zapis w jednym wątku.
+
+    `append()` jest wołane synchronicznie z pętli zdarzeń i tylko buforuje wpis. Bufor jest
+    zapisywany w osobnym wątku raz na okno `flush_interval_seconds`; `commit()` pozwala
+    poczekać, aż wszystkie dotychczasowe zmiany będą trwałe. Podklasy dostarczają
+    `load()`, `exists()` i `_write_batch_sync()`.
+
+    Nieudana partia wraca do bufora i jest ponawiana sama, z rosnącym odstępem (do
+    `RETRY_MAX_SECONDS`) - nie czeka na kolejną zmianę, więc bezczynny bot też dopisze zaległe wpisy.
+    """
+
+    RETRY_BASE_SECONDS = 1.0
+    RETRY_MAX_SECONDS = 60.0
+
+    def __init__(self, flush_interval_seconds: float, thread_name: str):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+        self._pending: list = []
+        self._pending_future: asyncio.Future | None = None
+        self._inflight_future: asyncio.Future | None = None
+        self._batch_task: asyncio.Task | None = None
+        self.records_appended = 0
+        self.batches_written = 0
+        self.batches_failed = 0
+        self._consecutive_failures = 0
+        # Wywoływane po każdej zapisanej partii: (czas zapisu w s, liczba wpisów, bajty albo None)
+        self.batch_observer: Callable[[float, int, int | None], None] | None = None
+
+    # --- Do nadpisania ---
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    def load(self) -> dict:
+        raise NotImplementedError
+
+    def _encode_record(self, record: dict):
+        return record
+
+    def _write_batch_sync(self, items: list) -> int | None:
+        """Zapisuje partię wpisów; zwraca liczbę zapisanych bajtów, jeśli magazyn ją zna."""
+        raise NotImplementedError
+
+    def _after_batch(self, loop: asyncio.AbstractEventLoop):
+        pass
+
+    def _flush_sync_extra(self, compact: bool):
+        pass
+
+    # --- Zapis ---
+    def append(self, record: dict):
+        self._pending.append(self._encode_record(record))
+        self.records_appended += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync(compact=False)
+            return
+        if self._pending_future is None:
+            self._pending_future = loop.create_future()
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = loop.create_task(self._write_batch_after_delay())
+
+    def schedule_flush(self):
+        """Upewnia się, że oczekujące wpisy zostaną zapisane w najbliższej partii."""
+        if not self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync(compact=False)
+            return
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = loop.create_task(self._write_batch_after_delay())
+
+    async def commit(self) -> bool:
+        """Czeka, aż wszystkie dotychczas dopisane zmiany zostaną trwale zapisane."""
+        future = self._pending_future or self._inflight_future
+        if future is None:
+            return True
+        return await asyncio.shield(future)
+
+    async def _write_batch_after_delay(self, delay: float = None):
+        await asyncio.sleep(self.flush_interval_seconds if delay is None else delay)
+        await self._write_batch()
+
+    def _retry_delay(self) -> float:
+        return min(self.RETRY_BASE_SECONDS * 2 ** (self._consecutive_failures - 1), self.RETRY_MAX_SECONDS)
+
+    async def _write_batch(self):
+        items, future = self._pending, self._pending_future
+        self._pending, self._pending_future = [], None
+        if not items:
+            if future and not future.done(): future.set_result(True)
+            return
+        self._inflight_future = future
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            written_bytes = await loop.run_in_executor(self._executor, self._write_batch_sync, items)
+            self.batches_written += 1
+            self._consecutive_failures = 0
+            if self.batch_observer is not None:
+                self.batch_observer(time.perf_counter() - started, len(items), written_bytes)
+            ok = True
+        except Exception as e:
+            # Wpisy wracają na początek kolejki; ponowienie planujemy od razu, bez czekania na kolejną zmianę
+            self.batches_failed += 1
+            self._consecutive_failures += 1
+            delay = self._retry_delay()
+            print(f"BŁĄD: Zapis zmian party ({type(self).__name__}) nie powiódł się: {e}. "
+                  f"Ponowię za {delay:g} s (próba {self._consecutive_failures}).")
+            self._pending[:0] = items
+            if self._pending_future is None:
+                self._pending_future = loop.create_future()
+            if self._batch_task is None or self._batch_task.done() or self._batch_task is asyncio.current_task():
+                self._batch_task = loop.create_task(self._write_batch_after_delay(delay))
+            ok = False
+        if future and not future.done(): future.set_result(ok)
+        if self._inflight_future is future:
+            self._inflight_future = None
+        self._after_batch(loop)
+
+    def flush_sync(self, compact: bool = True):
+        """Synchroniczny zapis oczekujących wpisów - start, odładowanie coga, zamykanie bota."""
+        if self._batch_task is not None and not self._batch_task.done():
+            self._batch_task.cancel()
+        self._batch_task = None
+        items, future = self._pending, self._pending_future
+        self._pending, self._pending_future = [], None
+        try:
+            if items:
+                self._executor.submit(self._write_batch_sync, items).result()
+                self.batches_written += 1
+            self._flush_sync_extra(compact)
+            ok = True
+        except Exception as e:
+            print(f"BŁĄD: Synchroniczny zapis danych party nie powiódł się: {e}")
+            self._pending[:0] = items
+            ok = False
+        if future and not future.done(): future.set_result(ok)
+
+
+class PartyJournal(BufferedPartyStore):
+    """Dziennik zmian party (append-only) z okresowym zapisem snapshotu.
+
+    Każda zmiana to jedna linia JSON dopisywana do pliku dziennika. Zapisy są grupowane
+    (jeden fsync na okno `fsync_interval_seconds`), a po `compact_every_records` wpisach
+    stan jest zrzucany do snapshotu i dziennik jest czyszczony. Przy starcie odtwarzany jest
+    snapshot i wszystkie wpisy dziennika o numerze większym niż numer snapshotu.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str, build_snapshot: Callable[[], dict],
+                 fsync_interval_seconds: float, compact_every_records: int):
+        super().__init__(fsync_interval_seconds, "party-journal")
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every_records = compact_every_records
+        self._build_snapshot = build_snapshot
+        self._journal_file = None
+        # Przerwany zapis, którego nie dało się wyciąć z pliku - następna partia zaczyna się od nowej linii
+        self._torn_tail = False
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._compaction_task: asyncio.Task | None = None
+        self.bytes_appended = 0
+        self.compactions = 0
+        self.last_snapshot_bytes = 0
+
+    # --- Odczyt przy starcie ---
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def _read_snapshot(self) -> tuple[dict, int]:
+        if not os.path.exists(self.snapshot_path):
+            return {}, 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            corrupt_path = f"{self.snapshot_path}.corrupt-{int(time.time())}"
+            try:
+                os.replace(self.snapshot_path, corrupt_path)
+            except OSError:
+                corrupt_path = self.snapshot_path
+            print(f"BŁĄD KRYTYCZNY: Snapshot danych party {self.snapshot_path} jest uszkodzony ({e}). "
+                  f"Zachowano go jako {corrupt_path}, odtwarzam tylko wpisy z dziennika.")
+            return {}, 0
+        if isinstance(loaded, dict) and "parties" in loaded and "journal_seq" in loaded:
+            return {int(k): v for k, v in loaded["parties"].items()}, int(loaded["journal_seq"])
+        # Stary format: sam słownik party_id -> dane
+        return {int(k): v for k, v in loaded.items()}, 0
+
+    def load(self) -> dict:
+        """Odtwarza stan: snapshot + wpisy dziennika nowsze niż snapshot."""
+        parties, snapshot_seq = self._read_snapshot()
+        last_seq = snapshot_seq
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line: continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"WARN: Pominięto uszkodzony wpis dziennika {self.journal_path}:{line_no} "
+                              f"(najpewniej przerwany zapis).")
+                        continue
+                    seq = record.get("seq", 0)
+                    if seq <= snapshot_seq: continue
+                    apply_party_record(parties, record)
+                    replayed += 1
+                    last_seq = max(last_seq, seq)
+        self._seq = last_seq
+        self._records_since_snapshot = replayed
+        if replayed:
+            print(f"INFO: Odtworzono {replayed} wpisów dziennika party ponad snapshot (seq {snapshot_seq}).")
+        return parties
+
+    # --- Zapis ---
+    def _encode_record(self, record: dict) -> str:
+        self._seq += 1
+        self._records_since_snapshot += 1
+        record["seq"] = self._seq
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+    def _write_batch_sync(self, lines: list[str]) -> int:
+        if self._journal_file is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._journal_file = open(self.journal_path, "ab")
+        data = ("\n" if self._torn_tail else "").encode("utf-8") + "".join(lines).encode("utf-8")
+        offset = os.fstat(self._journal_file.fileno()).st_size
+        try:
+            self._journal_file.write(data)
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+        except OSError:
+            self._discard_torn_write(offset)
+            raise
+        self._torn_tail = False
+        self.bytes_appended += len(data)
+        return len(data)
+
+    def _discard_torn_write(self, offset: int):
+        """Wycina z dziennika część nieudanej partii, żeby ponowiony wpis nie skleił się z urwaną linią."""
+        journal_file, self._journal_file = self._journal_file, None
+        try:
+            journal_file.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self.journal_path, offset)
+        except OSError as e:
+            self._torn_tail = True
+            print(f"WARN: Nie udało się wyciąć przerwanego zapisu z {self.journal_path} ({e}). "
+                  f"Ponowiona partia zacznie się od nowej linii.")
+
+    def _after_batch(self, loop: asyncio.AbstractEventLoop):
+        if self._records_since_snapshot >= self.compact_every_records and (
+                self._compaction_task is None or self._compaction_task.done()):
+            self._compaction_task = loop.create_task(self.compact())
+
+    def _write_snapshot_and_truncate_sync(self, payload: dict):
+        self.last_snapshot_bytes = write_json_atomically(self.snapshot_path, payload)
+        # Snapshot jest już na dysku - wpisy w dzienniku mają seq <= journal_seq i można je usunąć.
+        if self._journal_file is not None:
+            self._journal_file.close()
+        self._journal_file = open(self.journal_path, "wb")
+        os.fsync(self._journal_file.fileno())
+        self._torn_tail = False
+        self.compactions += 1
+
+    def _take_snapshot(self) -> dict:
+        self._records_since_snapshot = 0
+        return {"journal_seq": self._seq, "parties": self._build_snapshot()}
+
+    async def compact(self):
+        """Zrzuca bieżący stan do snapshotu i czyści dziennik."""
+        await self._write_batch()
+        payload = self._take_snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._write_snapshot_and_truncate_sync, payload)
+        except Exception as e:
+            print(f"BŁĄD: Kompaktowanie dziennika party do {self.snapshot_path} nie powiodło się: {e}")
+
+    def _flush_sync_extra(self, compact: bool):
+        if compact:
+            self._executor.submit(self._write_snapshot_and_truncate_sync, self._take_snapshot()).result()
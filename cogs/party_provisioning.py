@@ -0,0 +1,200 @@
+# party_bot/cogs/party_provisioning.py
+
+import asyncio
+
+import disnake
+
+from cogs.party_metrics import LatencyRecorder
+
+
+class PartyRooms:
+    """Kanały party: kategoria, kanał ustawień, tekstowy i dwa głosowe."""
+
+    def __init__(self, category: disnake.CategoryChannel, settings_channel: disnake.TextChannel,
+                 text_channel: disnake.TextChannel, voice_channel: disnake.VoiceChannel,
+                 voice_channel_2: disnake.VoiceChannel):
+        self.category = category
+        self.settings_channel = settings_channel
+        self.text_channel = text_channel
+        self.voice_channel = voice_channel
+        self.voice_channel_2 = voice_channel_2
+
+    @property
+    def channels(self) -> list:
+        return [self.settings_channel, self.text_channel, self.voice_channel, self.voice_channel_2]
+
+    def to_ids(self) -> dict:
+        return {"category_id": self.category.id, "settings_channel_id": self.settings_channel.id,
+                "text_channel_id": self.text_channel.id, "voice_channel_id": self.voice_channel.id,
+                "voice_channel_id_2": self.voice_channel_2.id}
+
+    @classmethod
+    def from_ids(cls, guild: disnake.Guild, ids: dict):
+        """Odtwarza komplet kanałów z zapisanych ID; None, jeśli któregoś brakuje w gildii."""
+        category = guild.get_channel(ids.get("category_id") or 0)
+        channels = [guild.get_channel(ids.get(key) or 0) for key in
+                    ("settings_channel_id", "text_channel_id", "voice_channel_id", "voice_channel_id_2")]
+        if not isinstance(category, disnake.CategoryChannel) or None in channels:
+            return None
+        if any(channel.category_id != category.id for channel in channels):
+            return None
+        return cls(category, *channels)
+
+
+def party_category_overwrites(guild: disnake.Guild, leader: disnake.Member) -> dict:
+    return {
+        guild.default_role: disnake.PermissionOverwrite(
+            view_channel=True, read_messages=True, send_messages=False, connect=False, speak=False,
+            create_public_threads=False, create_private_threads=False, send_messages_in_threads=False
+        ),
+        guild.me: disnake.PermissionOverwrite(
+            view_channel=True, manage_channels=True, manage_permissions=True, read_messages=True,
+            send_messages=True,
+            connect=True, speak=True, create_public_threads=True, create_private_threads=True,
+            send_messages_in_threads=True, manage_threads=True
+        ),
+        leader: disnake.PermissionOverwrite(
+            view_channel=True, read_messages=True, send_messages=True, connect=True, speak=True,
+            manage_messages=True,
+            mute_members=True, deafen_members=True, move_members=True, create_public_threads=True,
+            create_private_threads=True, send_messages_in_threads=True
+        )
+    }
+
+
+def settings_channel_overwrites(guild: disnake.Guild) -> dict:
+    return {
+        guild.default_role: disnake.PermissionOverwrite(send_messages=False, add_reactions=False,
+                                                        create_public_threads=False,
+                                                        create_private_threads=False,
+                                                        send_messages_in_threads=False),
+        guild.me: disnake.PermissionOverwrite(send_messages=True, embed_links=True, manage_messages=True)
+    }
+
+
+def hidden_room_overwrites(guild: disnake.Guild) -> dict:
+    """Uprawnienia kategorii czekającej w puli: niewidoczna dla wszystkich poza botem."""
+    return {
+        guild.default_role: disnake.PermissionOverwrite(view_channel=False),
+        guild.me: disnake.PermissionOverwrite(view_channel=True, manage_channels=True, manage_permissions=True,
+                                              manage_messages=True, read_message_history=True, send_messages=True,
+                                              connect=True, move_members=True),
+    }
+
+
+def party_channel_names(party_name: str, leader: disnake.Member) -> dict:
+    return {"category": f"🎉 {party_name} ({leader.display_name})", "settings": f"📌︱info-{party_name[:20]}",
+            "text": f"💬︱{party_name[:20]}", "voice": f"🔊︱Głos 1 ({party_name[:15]})",
+            "voice_2": f"🔊︱Głos 2 ({party_name[:15]})"}
+
+
+def party_welcome_message(party_name: str, leader: disnake.Member, game_name: str) -> str:
+    return f"Witaj w party **{party_name}**! Lider: {leader.mention}. Gra: **{game_name}**."
+
+
+async def delete_category_with_channels(category: disnake.CategoryChannel, reason: str = None,
+                                        created_channels: list = ()) -> bool:
+    """Usuwa kategorię z kanałami (także świeżo utworzonymi, których gateway mógł jeszcze nie dodać do cache).
+
+    Błędy nie przerywają sprzątania, ale są zgłaszane wynikiem: False, gdy któregoś kanału nie udało się
+    usunąć (kategoria zostaje wtedy razem z nim) albo nie udało się usunąć kategorii. NotFound to sukces.
+    """
+    channels = {channel.id: channel for channel in created_channels}
+    channels.update((channel.id, channel) for channel in category.channels)
+    deleted = True
+    for channel in channels.values():
+        try:
+            await channel.delete(reason=reason)
+        except disnake.NotFound:
+            pass
+        except disnake.HTTPException:
+            deleted = False
+    if not deleted:
+        return False
+    try:
+        await category.delete(reason=reason)
+    except disnake.NotFound:
+        pass
+    except disnake.HTTPException:
+        return False
+    return True
+
+
+class PartyProvisioner:
+    """Tworzenie kanałów party zgodnie z grafem zależności.
+
+    Najpierw kategoria, potem kanał ustawień, tekstowy (+ wiadomość powitalna) i dwa głosowe.
+    Kanały są zlecane razem, ale powstają po kolei: wszystkie idą jednym kubełkiem REST gildii,
+    a HTTPClient disnake trzyma jego blokadę przez całe żądanie (obsługuje też limity 429).
+    Liczba jednoczesnych wywołań w jednej gildii jest ograniczona (`max_concurrent_per_guild`).
+    Czasy poszczególnych kroków trafiają do `latency` (p50/p99).
+    """
+
+    def __init__(self, latency: LatencyRecorder, max_concurrent_per_guild: int):
+        self.latency = latency
+        self.max_concurrent_per_guild = max_concurrent_per_guild
+        self._guild_limits: dict[int, asyncio.Semaphore] = {}
+        self._guild_users: dict[int, int] = {}
+
+    def _guild_limit(self, guild_id: int) -> asyncio.Semaphore:
+        limit = self._guild_limits.get(guild_id)
+        if limit is None:
+            limit = self._guild_limits[guild_id] = asyncio.Semaphore(self.max_concurrent_per_guild)
+        return limit
+
+    async def run_limited(self, guild_id: int, stage: str, coro):
+        limit = self._guild_limit(guild_id)
+        self._guild_users[guild_id] = self._guild_users.get(guild_id, 0) + 1
+        try:
+            async with limit:
+                with self.latency.measure(stage):
+                    return await coro
+        finally:
+            # Nieużywany limit jest zwalniany - klucze DM (kanały liderów) nie zostają w pamięci na zawsze
+            self._guild_users[guild_id] -= 1
+            if not self._guild_users[guild_id]:
+                del self._guild_users[guild_id]
+                del self._guild_limits[guild_id]
+
+    async def _create_text_channel_with_welcome(self, category: disnake.CategoryChannel, name: str,
+                                                welcome: str | None):
+        text_channel = await self.run_limited(category.guild.id, "provision_channel", category.create_text_channel(name=name))
+        if welcome:
+            try:
+                await self.run_limited(category.guild.id, "provision_welcome", text_channel.send(welcome))
+            except disnake.HTTPException as e:
+                print(f"WARN: Nie udało się wysłać powitania na kanale {text_channel.id}: {e}")
+        return text_channel
+
+    async def _create_rooms(self, guild: disnake.Guild, names: dict, category_overwrites: dict,
+                            settings_overwrites: dict | None, welcome: str | None) -> PartyRooms:
+        category = await self.run_limited(guild.id, "provision_category",
+                                       guild.create_category(name=names["category"], overwrites=category_overwrites))
+        settings_kwargs = {"overwrites": settings_overwrites} if settings_overwrites is not None else {}
+        # Cztery POST /guilds/{guild_id}/channels dzielą kubełek None:<guild_id>:/guilds/{guild_id}/channels,
+        # więc disnake wysyła je po kolei - gather() ich nie przyspiesza. Zbiera tylko błędy do sprzątania
+        # i pozwala wysłać powitanie (inny kubełek) zaraz po utworzeniu kanału czatu.
+        results = await asyncio.gather(
+            self.run_limited(guild.id, "provision_channel",
+                          category.create_text_channel(name=names["settings"], **settings_kwargs)),
+            self._create_text_channel_with_welcome(category, names["text"], welcome),
+            self.run_limited(guild.id, "provision_channel", category.create_voice_channel(name=names["voice"])),
+            self.run_limited(guild.id, "provision_channel", category.create_voice_channel(name=names["voice_2"])),
+            return_exceptions=True)
+        error = next((r for r in results if isinstance(r, BaseException)), None)
+        if error is not None:
+            await delete_category_with_channels(
+                category, created_channels=[r for r in results if not isinstance(r, BaseException)])
+            raise error
+        return PartyRooms(category, *results)
+
+    async def create_party_rooms(self, guild: disnake.Guild, leader: disnake.Member, party_name: str,
+                                 game_name: str) -> PartyRooms:
+        """Tworzy kategorię i kanały party. Przy błędzie usuwa to, co zdążyło powstać, i rzuca wyjątek dalej."""
+        return await self._create_rooms(guild, party_channel_names(party_name, leader),
+                                        party_category_overwrites(guild, leader), settings_channel_overwrites(guild),
+                                        party_welcome_message(party_name, leader, game_name))
+
+    async def create_hidden_rooms(self, guild: disnake.Guild, names: dict) -> PartyRooms:
+        """Tworzy ukryty komplet kanałów (dla puli); kanały dziedziczą uprawnienia kategorii."""
+        return await self._create_rooms(guild, names, hidden_room_overwrites(guild), None, None)
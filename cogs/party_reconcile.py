@@ -0,0 +1,58 @@
+# party_bot/cogs/party_reconcile.py
+
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+# check(party_id) -> wynik uzgadniania party, np. "ok", "repaired", "disbanded"
+PartyCheck = Callable[[int], Awaitable[str]]
+
+
+class PartyReconciler:
+    """Uzgadnianie zapisanych party ze stanem gildii po starcie bota.
+
+    Dane party wczytane z dysku mogą wskazywać kanały usunięte, gdy bot był offline.
+    `run()` sprawdza wszystkie party współbieżnie, najwyżej `concurrency` naraz (naprawa
+    albo rozwiązanie party to wywołania REST), i nie blokuje obsługi interakcji w tym czasie.
+    Wyniki `check` są zliczane; `stats()` podaje też czas przebiegu i czas od startu procesu.
+    """
+
+    def __init__(self, check: PartyCheck, concurrency: int, process_started: float):
+        self._check = check
+        self.concurrency = concurrency
+        self.process_started = process_started
+        self.outcomes: Counter = Counter()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    async def _check_one(self, slots: asyncio.Semaphore, party_id: int):
+        async with slots:
+            try:
+                outcome = await self._check(party_id)
+            except Exception as e:
+                outcome = "error"
+                print(f"BŁĄD: Uzgadnianie party {party_id} nie powiodło się: {e}")
+            self.outcomes[outcome] += 1
+
+    async def run(self, party_ids: list[int]):
+        self.started_at = time.monotonic()
+        slots = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._check_one(slots, party_id) for party_id in party_ids))
+        self.finished_at = time.monotonic()
+        print(f"INFO: Uzgodniono {len(party_ids)} party w {self.finished_at - self.started_at:.2f} s: "
+              f"{dict(self.outcomes)}. Od startu do pełnej spójności: {self.cold_start_seconds:.2f} s.")
+
+    @property
+    def cold_start_seconds(self) -> float | None:
+        """Czas od startu procesu do zakończenia uzgadniania (None, dopóki trwa)."""
+        return self.finished_at - self.process_started if self.finished_at is not None else None
+
+    def stats(self) -> dict:
+        return {"outcomes": dict(self.outcomes), "done": self.done,
+                "duration_seconds": round(self.finished_at - self.started_at, 3) if self.done else None,
+                "cold_start_seconds": round(self.cold_start_seconds, 3) if self.done else None}
@@ -0,0 +1,122 @@
+# party_bot/cogs/party_render.py
+
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable
+
+import disnake
+
+# build(party_id) -> (embed, view) albo None, gdy nie ma czego renderować
+RenderBuilder = Callable[[int], "tuple[disnake.Embed, disnake.ui.View | None] | None"]
+# push(party_id, embed, view) -> True, gdy wiadomość na Discordzie została zaktualizowana
+RenderPusher = Callable[[int, disnake.Embed, "disnake.ui.View | None"], Awaitable[bool]]
+# prepare(party_id) - wspólne przygotowanie danych przed renderowaniem partii celów (np. dociągnięcie członków)
+RenderPreparer = Callable[[int], Awaitable[None]]
+
+
+def render_digest(embed: disnake.Embed, view: disnake.ui.View | None) -> str:
+    """Skrót wyrenderowanej wiadomości (embed + komponenty) do porównania z ostatnio wysłaną."""
+    payload = {"embed": embed.to_dict(), "components": view.to_components() if view is not None else []}
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode("utf-8"),
+                           digest_size=16).hexdigest()
+
+
+class PartyRenderQueue:
+    """Kolejka odświeżania wiadomości party (emblemat, embed ustawień), łącząca zmiany w oknie czasowym.
+
+    `mark_dirty()` tylko oznacza cele party do odświeżenia. Wszystkie oznaczenia z okna
+    `coalesce_window_seconds` dają jedno renderowanie na wiadomość, a edycja jest pomijana,
+    jeśli skrót wyrenderowanej treści jest taki sam jak ostatnio wysłany. `prepare()` jest
+    wołane raz na partię oznaczonych celów, przed pierwszym builderem.
+    """
+
+    def __init__(self, targets: dict[str, tuple[RenderBuilder, RenderPusher]], coalesce_window_seconds: float,
+                 prepare: RenderPreparer | None = None):
+        self.targets = targets
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.prepare = prepare
+        self._dirty: dict[int, set[str]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._last_digest: dict[tuple[str, int], str] = {}
+        self.marks_requested = 0
+        self.renders_built = 0
+        self.edits_sent = 0
+        self.edits_skipped_unchanged = 0
+        self.edits_failed = 0
+
+    def mark_dirty(self, party_id: int, *targets: str):
+        targets = targets or tuple(self.targets)
+        self._dirty.setdefault(party_id, set()).update(targets)
+        self.marks_requested += len(targets)
+        task = self._tasks.get(party_id)
+        if task is None or task.done():
+            self._tasks[party_id] = asyncio.get_running_loop().create_task(self._render_party(party_id))
+
+    def forget(self, party_id: int):
+        """Party rozwiązane - porzucamy oczekujące odświeżenia i zapamiętane skróty."""
+        self._dirty.pop(party_id, None)
+        task = self._tasks.pop(party_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        for target in self.targets:
+            self._last_digest.pop((target, party_id), None)
+
+    def invalidate(self, party_id: int, target: str):
+        """Wymusza wysłanie przy następnym renderowaniu (np. wiadomość została utworzona od nowa)."""
+        self._last_digest.pop((target, party_id), None)
+
+    def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._dirty.clear()
+
+    async def _render_party(self, party_id: int):
+        try:
+            while self._dirty.get(party_id):
+                await asyncio.sleep(self.coalesce_window_seconds)
+                dirty_targets = self._dirty.pop(party_id, set())
+                if self.prepare is not None:
+                    try:
+                        await self.prepare(party_id)
+                    except Exception as e:
+                        print(f"BŁĄD: Przygotowanie renderowania party {party_id} nie powiodło się: {e}")
+                for target in self.targets:
+                    if target in dirty_targets:
+                        await self._render_target(party_id, target)
+        finally:
+            if self._tasks.get(party_id) is asyncio.current_task():
+                del self._tasks[party_id]
+
+    async def _render_target(self, party_id: int, target: str):
+        build, push = self.targets[target]
+        try:
+            rendered = build(party_id)
+        except Exception as e:
+            print(f"BŁĄD: Renderowanie '{target}' dla party {party_id} nie powiodło się: {e}")
+            return
+        if rendered is None:
+            return
+        self.renders_built += 1
+        embed, view = rendered
+        digest = render_digest(embed, view)
+        if self._last_digest.get((target, party_id)) == digest:
+            self.edits_skipped_unchanged += 1
+            return
+        if await push(party_id, embed, view):
+            self._last_digest[(target, party_id)] = digest
+            self.edits_sent += 1
+        else:
+            self.edits_failed += 1
+
+    @property
+    def edits_saved(self) -> int:
+        """Ile edycji zaoszczędzono względem odświeżania przy każdym oznaczeniu."""
+        return self.marks_requested - self.edits_sent - self.edits_failed
+
+    def stats(self) -> dict:
+        return {"marks_requested": self.marks_requested, "renders_built": self.renders_built,
+                "edits_sent": self.edits_sent, "edits_skipped_unchanged": self.edits_skipped_unchanged,
+                "edits_failed": self.edits_failed, "edits_saved": self.edits_saved,
+                "pending_parties": len(self._dirty)}
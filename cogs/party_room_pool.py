@@ -0,0 +1,269 @@
+# party_bot/cogs/party_room_pool.py
+
+import asyncio
+import json
+import os
+import time
+
+import disnake
+
+from cogs.party_persistence import write_json_atomically
+from cogs.party_provisioning import (PartyProvisioner, PartyRooms, delete_category_with_channels,
+                                     hidden_room_overwrites, party_category_overwrites, party_channel_names,
+                                     party_welcome_message, settings_channel_overwrites)
+
+# Nazwy kanałów nowo zbudowanego pokoju w puli (i tak są ukryte przed użytkownikami).
+POOL_ROOM_NAMES = {"category": "💤 party-pula", "settings": "info", "text": "czat", "voice": "głos-1",
+                   "voice_2": "głos-2"}
+# Limit Discorda: najwyżej 2 zmiany nazwy kanału na 10 minut (kolejna czeka na 429 nawet kilka minut).
+CHANNEL_RENAME_LIMIT = 2
+CHANNEL_RENAME_WINDOW_SECONDS = 600
+# Usuwanie hurtowe (bulk-delete) obejmuje najwyżej 100 wiadomości młodszych niż 14 dni; starsze idą pojedynczo.
+BULK_DELETE_MAX_MESSAGES = 100
+BULK_DELETE_MAX_AGE_SECONDS = 14 * 24 * 3600
+
+
+class PartyRoomPool:
+    """Pula gotowych, ukrytych kompletów kanałów party (kategoria + 4 kanały), osobno dla każdej gildii.
+
+    `claim()` wydaje pokój z puli: zmiana nazw i nadanie uprawnień party to kilka równoległych
+    edycji zamiast tworzenia kategorii i czterech kanałów. `recycle()` po rozwiązaniu party
+    ukrywa pokój, rozłącza kanały głosowe, czyści wiadomości i oddaje go do puli (o ile pula
+    nie jest pełna). Pokój z historią dłuższą niż `max_recycle_messages` wiadomości na kanał
+    (albo ze starszymi niż 14 dni) nie wraca do puli - usunięcie 5 kanałów jest tańsze niż
+    czyszczenie. `refill()` dobudowuje pulę do `target_size`, ale tylko gdy w gildii od
+    `quiet_period_seconds` nikt nie zakładał party.
+
+    Discord pozwala zmienić nazwę kanału tylko dwa razy na 10 minut, więc przy zwrocie do puli
+    nazw nie zmieniamy, a pokoje są wydawane w kolejności FIFO (najdawniej zwrócony pierwszy).
+    `claim()` zmienia tylko nazwy różne od docelowych i pomija pokoje, których kanały wyczerpały
+    limit zmian nazwy (`note_renamed()` zapisuje też zmiany nazwy party) - gdy takiego pokoju nie
+    ma, party powstaje od zera. Historia zmian nazw jest tylko w pamięci; po restarcie pierwsza
+    zmiana nazwy kanału może więc trafić na 429.
+    Stan puli jest zapisywany w `pool_file`, żeby przetrwał restart.
+    """
+
+    def __init__(self, provisioner: PartyProvisioner, pool_file: str, target_size: int,
+                 quiet_period_seconds: float, max_recycle_messages: int = 50):
+        self.provisioner = provisioner
+        self.pool_file = pool_file
+        self.target_size = target_size
+        self.quiet_period_seconds = quiet_period_seconds
+        self.max_recycle_messages = min(max_recycle_messages, BULK_DELETE_MAX_MESSAGES)
+        self._rooms: dict[int, list[dict]] = {}
+        self._last_activity: dict[int, float] = {}
+        self._refilling: set[int] = set()
+        # Pokoje w trakcie zwrotu do puli (na gildię) - zajmują miejsce w puli już przed pierwszym await
+        self._recycling: dict[int, int] = {}
+        # ID kanału -> czasy (monotonic) zmian nazwy w oknie limitu Discorda
+        self._renamed_at: dict[int, list[float]] = {}
+        self._save_lock = asyncio.Lock()
+        self.claims_hit = 0
+        self.claims_missed = 0
+        self.rooms_recycled = 0
+        self.rooms_built = 0
+        self.recycles_skipped_history = 0
+
+    # --- Stan puli na dysku ---
+    def load(self):
+        if not os.path.exists(self.pool_file):
+            return
+        try:
+            with open(self.pool_file, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            self._rooms = {int(guild_id): rooms for guild_id, rooms in loaded.items()}
+            print(f"INFO: Wczytano pulę pokoi party ({sum(map(len, self._rooms.values()))} pokoi).")
+        except (IOError, json.JSONDecodeError, ValueError, AttributeError) as e:
+            print(f"BŁĄD: Nie udało się wczytać puli pokoi party z {self.pool_file}: {e}. Zaczynam z pustą pulą.")
+
+    async def _save(self):
+        payload = {str(guild_id): list(rooms) for guild_id, rooms in self._rooms.items() if rooms}
+        async with self._save_lock:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, write_json_atomically, self.pool_file, payload)
+            except Exception as e:
+                print(f"BŁĄD: Zapis puli pokoi party do {self.pool_file} nie powiódł się: {e}")
+
+    def size(self, guild_id: int) -> int:
+        return len(self._rooms.get(guild_id, ()))
+
+    def _has_room_for(self, guild_id: int) -> bool:
+        return self.size(guild_id) + self._recycling.get(guild_id, 0) < self.target_size
+
+    def resource_ids(self) -> set[int]:
+        """ID kategorii i kanałów wszystkich pokoi w puli (nie są osieroconymi zasobami party)."""
+        return {channel_id for rooms in self._rooms.values() for ids in rooms for channel_id in ids.values()
+                if channel_id}
+
+    def stats(self) -> dict:
+        return {"rooms_pooled": sum(map(len, self._rooms.values())), "claims_hit": self.claims_hit,
+                "claims_missed": self.claims_missed, "rooms_recycled": self.rooms_recycled,
+                "rooms_built": self.rooms_built, "recycles_skipped_history": self.recycles_skipped_history}
+
+    # --- Limit zmian nazw kanałów ---
+    def note_renamed(self, channel_id: int):
+        """Zapisuje zmianę nazwy kanału (liczy się do limitu 2 zmian na 10 minut)."""
+        self._renamed_at.setdefault(channel_id, []).append(time.monotonic())
+
+    def _can_rename(self, channel_id: int) -> bool:
+        history = self._renamed_at.get(channel_id)
+        if not history:
+            return True
+        cutoff = time.monotonic() - CHANNEL_RENAME_WINDOW_SECONDS
+        history[:] = [renamed_at for renamed_at in history if renamed_at > cutoff]
+        if not history:
+            del self._renamed_at[channel_id]
+            return True
+        return len(history) < CHANNEL_RENAME_LIMIT
+
+    @staticmethod
+    def _target_names(rooms: PartyRooms, names: dict) -> list[tuple]:
+        return [(rooms.category, names["category"]), (rooms.settings_channel, names["settings"]),
+                (rooms.text_channel, names["text"]), (rooms.voice_channel, names["voice"]),
+                (rooms.voice_channel_2, names["voice_2"])]
+
+    def _renames_allowed(self, rooms: PartyRooms, names: dict) -> bool:
+        return all(channel.name == name or self._can_rename(channel.id)
+                   for channel, name in self._target_names(rooms, names))
+
+    # --- Wydawanie pokoju ---
+    async def _edit_channel(self, guild_id: int, channel: disnake.abc.GuildChannel, name: str, overwrites: dict):
+        # Zmieniamy nazwę tylko gdy trzeba - limit zmian nazwy kanału jest bardzo niski
+        changes = {"overwrites": overwrites}
+        if channel.name != name:
+            changes["name"] = name
+        await self.provisioner.run_limited(guild_id, "pool_claim_edit", channel.edit(**changes))
+        if "name" in changes:
+            self.note_renamed(channel.id)
+
+    async def claim(self, guild: disnake.Guild, leader: disnake.Member, party_name: str,
+                    game_name: str) -> PartyRooms | None:
+        """Wydaje pokój z puli przygotowany dla nowego party albo None, jeśli pula jest pusta."""
+        self._last_activity[guild.id] = time.monotonic()
+        names = party_channel_names(party_name, leader)
+        queue = self._rooms.get(guild.id, [])
+        rooms = None
+        pruned = False
+        for ids in list(queue):
+            candidate = PartyRooms.from_ids(guild, ids)
+            if candidate is None:
+                print(f"WARN: Pokój z puli w gildii {guild.id} jest niekompletny (usunięte kanały?) - pomijam.")
+                queue.remove(ids)
+                pruned = True
+                continue
+            # Pokój, którego kanałów nie można teraz przemianować, czeka w puli na koniec okna limitu
+            if self._renames_allowed(candidate, names):
+                queue.remove(ids)
+                rooms = candidate
+                break
+        if rooms is None:
+            if pruned:
+                await self._save()
+            self.claims_missed += 1
+            return None
+        await self._save()
+        category_overwrites = party_category_overwrites(guild, leader)
+        results = await asyncio.gather(
+            *(self._edit_channel(guild.id, channel, name,
+                                 settings_channel_overwrites(guild) if channel is rooms.settings_channel
+                                 else category_overwrites)
+              for channel, name in self._target_names(rooms, names)),
+            return_exceptions=True)
+        error = next((r for r in results if isinstance(r, BaseException)), None)
+        if error is not None:
+            print(f"BŁĄD: Przygotowanie pokoju z puli w gildii {guild.id} nie powiodło się: {error}. "
+                  f"Usuwam pokój, party zostanie utworzone od zera.")
+            await delete_category_with_channels(rooms.category, created_channels=rooms.channels)
+            self.claims_missed += 1
+            return None
+        try:
+            await self.provisioner.run_limited(guild.id, "provision_welcome", rooms.text_channel.send(
+                party_welcome_message(party_name, leader, game_name)))
+        except disnake.HTTPException as e:
+            print(f"WARN: Nie udało się wysłać powitania na kanale {rooms.text_channel.id}: {e}")
+        self.claims_hit += 1
+        return rooms
+
+    # --- Zwrot pokoju do puli ---
+    async def recycle(self, guild: disnake.Guild, party_data: dict) -> bool:
+        """Oddaje kanały rozwiązanego party do puli. False = pula pełna lub pokój niekompletny (usuń go)."""
+        # Miejsce w puli rezerwujemy przed pierwszym await - inaczej równoległe rozwiązania party
+        # przechodzą sprawdzenie rozmiaru naraz i pula rośnie ponad target_size
+        if not self._has_room_for(guild.id):
+            return False
+        rooms = PartyRooms.from_ids(guild, party_data)
+        if rooms is None:
+            return False
+        self._recycling[guild.id] = self._recycling.get(guild.id, 0) + 1
+        run_limited = self.provisioner.run_limited
+        try:
+            # Najpierw ukrycie - po nim nikt nie dopisze wiadomości, więc przejrzana historia jest pełna
+            hidden_overwrites = hidden_room_overwrites(guild)
+            await asyncio.gather(*(run_limited(guild.id, "pool_recycle_hide", channel.edit(overwrites=hidden_overwrites))
+                                   for channel in [rooms.category, *rooms.channels]))
+            histories = await asyncio.gather(*(run_limited(
+                guild.id, "pool_recycle_history", channel.history(limit=self.max_recycle_messages + 1).flatten())
+                for channel in rooms.channels))
+            if not all(self._cheap_to_clear(messages) for messages in histories):
+                self.recycles_skipped_history += 1
+                return False
+            await asyncio.gather(*(run_limited(guild.id, "pool_recycle_move",
+                                               member.move_to(None, reason="Party rozwiązane"))
+                                   for voice_channel in (rooms.voice_channel, rooms.voice_channel_2)
+                                   for member in list(voice_channel.members)))
+            await asyncio.gather(*(run_limited(guild.id, "pool_recycle_purge", channel.delete_messages(messages))
+                                   for channel, messages in zip(rooms.channels, histories) if messages))
+        except disnake.HTTPException as e:
+            print(f"WARN: Nie udało się oczyścić kanałów party w gildii {guild.id} do ponownego użycia: {e}")
+            return False
+        finally:
+            self._recycling[guild.id] -= 1
+            if not self._recycling[guild.id]:
+                del self._recycling[guild.id]
+        # Zarezerwowane miejsce mogło w międzyczasie zająć dobudowywanie puli
+        if self.size(guild.id) >= self.target_size:
+            return False
+        self._rooms.setdefault(guild.id, []).append(rooms.to_ids())
+        self.rooms_recycled += 1
+        await self._save()
+        return True
+
+    def _cheap_to_clear(self, messages: list) -> bool:
+        """Czy historię kanału da się usunąć jednym wywołaniem (bulk-delete albo pojedyncze usunięcie)."""
+        if len(messages) > self.max_recycle_messages:
+            return False
+        oldest_allowed = time.time() - BULK_DELETE_MAX_AGE_SECONDS
+        return len(messages) <= 1 or all(message.created_at.timestamp() > oldest_allowed for message in messages)
+
+    # --- Dobudowywanie puli ---
+    def _is_quiet(self, guild_id: int) -> bool:
+        return time.monotonic() - self._last_activity.get(guild_id, float("-inf")) >= self.quiet_period_seconds
+
+    def prune(self, guild: disnake.Guild) -> int:
+        """Usuwa z puli pokoje, których kanały zniknęły z gildii."""
+        rooms = self._rooms.get(guild.id, [])
+        valid = [ids for ids in rooms if PartyRooms.from_ids(guild, ids) is not None]
+        self._rooms[guild.id] = valid
+        return len(rooms) - len(valid)
+
+    async def refill(self, guild: disnake.Guild):
+        if guild.id in self._refilling or not self._is_quiet(guild.id):
+            return
+        pruned = self.prune(guild)
+        if pruned:
+            await self._save()
+        self._refilling.add(guild.id)
+        try:
+            while self._has_room_for(guild.id) and self._is_quiet(guild.id):
+                rooms = await self.provisioner.create_hidden_rooms(guild, POOL_ROOM_NAMES)
+                if self.size(guild.id) >= self.target_size:
+                    # Pulę w międzyczasie zapełniły pokoje rozwiązanych party
+                    await delete_category_with_channels(rooms.category, created_channels=rooms.channels)
+                    break
+                self._rooms.setdefault(guild.id, []).append(rooms.to_ids())
+                self.rooms_built += 1
+                await self._save()
+        except disnake.HTTPException as e:
+            print(f"BŁĄD: Dobudowanie puli pokoi party w gildii {guild.id} nie powiodło się: {e}")
+        finally:
+            self._refilling.discard(guild.id)
@@ -0,0 +1,146 @@
+# party_bot/cogs/party_router.py
+
+import re
+import time
+from typing import Awaitable, Callable
+
+import disnake
+
+from cogs.party_metrics import LatencyRecorder, MetricsRegistry
+from cogs.party_outbound import RestPriority, rest_priority
+
+CUSTOM_ID_VERSION = "pb1"
+CUSTOM_ID_MAX_LENGTH = 100
+# Discord wymaga pierwszej odpowiedzi na interakcję w ciągu 3 s; powyżej tego progu ostrzegamy.
+FIRST_RESPONSE_WARN_SECONDS = 2.5
+
+# Stare formaty custom_id (opublikowane emblematy, embedy ustawień i panele sprzed zmiany formatu)
+_LEGACY_ACTIONS = {"request_join_party": "join", "settings_request_join": "join", "settings_leave_party": "leave",
+                   "leader_disband": "disband"}
+_LEGACY_EXACT = {"create_new_party_button_from_setup": ("create", None), "join_accept": ("join_accept", None),
+                 "join_reject": ("join_reject", None)}
+_LEGACY_PATTERN = re.compile(r"^(request_join_party|settings_request_join|settings_leave_party|leader_disband)_(\d+)$")
+
+
+class ComponentPayload:
+    """Zdekodowany custom_id: akcja, ID party (opcjonalnie) i dodatkowe argumenty."""
+
+    __slots__ = ("action", "party_id", "args", "legacy")
+
+    def __init__(self, action: str, party_id: int | None, args: tuple = (), legacy: bool = False):
+        self.action = action
+        self.party_id = party_id
+        self.args = args
+        self.legacy = legacy
+
+    def __repr__(self):
+        return f"ComponentPayload({self.action!r}, {self.party_id!r}, {self.args!r})"
+
+
+def encode_custom_id(action: str, party_id: int | None = None, *args) -> str:
+    """Buduje custom_id w formacie `pb1:akcja:party_id[:arg...]`."""
+    parts = [CUSTOM_ID_VERSION, action]
+    if party_id is not None or args:
+        parts.append("" if party_id is None else str(party_id))
+        parts.extend(str(arg) for arg in args)
+    custom_id = ":".join(parts)
+    if len(custom_id) > CUSTOM_ID_MAX_LENGTH:
+        raise ValueError(f"custom_id dłuższy niż {CUSTOM_ID_MAX_LENGTH} znaków: {custom_id}")
+    return custom_id
+
+
+def decode_custom_id(custom_id: str) -> ComponentPayload | None:
+    """Dekoduje custom_id w jednym przebiegu; None dla identyfikatorów spoza routera."""
+    if custom_id.startswith(CUSTOM_ID_VERSION + ":"):
+        parts = custom_id.split(":")
+        try:
+            party_id = int(parts[2]) if len(parts) > 2 and parts[2] else None
+        except ValueError:
+            return None
+        return ComponentPayload(parts[1], party_id, tuple(parts[3:]))
+    exact = _LEGACY_EXACT.get(custom_id)
+    if exact:
+        return ComponentPayload(exact[0], exact[1], legacy=True)
+    match = _LEGACY_PATTERN.match(custom_id)
+    if match:
+        return ComponentPayload(_LEGACY_ACTIONS[match.group(1)], int(match.group(2)), legacy=True)
+    return None
+
+
+class _Route:
+    __slots__ = ("handler", "defer", "ephemeral", "requires_party_id", "view_only")
+
+    def __init__(self, handler, defer: bool, ephemeral: bool, requires_party_id: bool, view_only: bool):
+        self.handler = handler
+        self.defer = defer
+        self.ephemeral = ephemeral
+        self.requires_party_id = requires_party_id
+        self.view_only = view_only
+
+
+class ComponentRouter:
+    """Router interakcji komponentów: akcja z custom_id -> handler (słownik, bez łańcucha startswith).
+
+    Router sam robi `defer()` (chyba że trasa ma `defer=False`), więc pierwsza odpowiedź idzie
+    zaraz po zdekodowaniu. Dla każdej akcji mierzy czas od utworzenia interakcji (znacznik
+    czasu ze snowflake'a - ten sam zegar, według którego Discord liczy 3 s) do pierwszej
+    odpowiedzi oraz czas całego handlera.
+    Trasy `view_only` obsługuje zarejestrowany widok trwały (przez `dispatch(..., from_view=True)`);
+    z listenera trafiają do nich tylko stare custom_id, których żaden widok już nie zna.
+    """
+
+    def __init__(self, latency: LatencyRecorder, metrics: MetricsRegistry | None = None):
+        self.latency = latency
+        self._routes: dict[str, _Route] = {}
+        self.unknown_actions = 0
+        self._interaction_seconds = metrics.histogram(
+            "party_interaction_seconds", "Czas obsługi interakcji komponentów per trasa custom_id i etap.",
+            ("route", "stage")) if metrics is not None else None
+
+    def route(self, action: str, handler: Callable[[disnake.MessageInteraction, ComponentPayload], Awaitable],
+              *, defer: bool = True, ephemeral: bool = True, requires_party_id: bool = True, view_only: bool = False):
+        if action in self._routes:
+            raise ValueError(f"Akcja '{action}' jest już zarejestrowana w routerze.")
+        self._routes[action] = _Route(handler, defer, ephemeral, requires_party_id, view_only)
+
+    def _record_first_response(self, action: str, interaction: disnake.MessageInteraction):
+        elapsed = time.time() - interaction.created_at.timestamp()
+        self.latency.record(f"interaction_first_response:{action}", elapsed)
+        if self._interaction_seconds is not None:
+            self._interaction_seconds.observe(elapsed, action, "first_response")
+        if elapsed > FIRST_RESPONSE_WARN_SECONDS:
+            print(f"WARN: Pierwsza odpowiedź na interakcję '{action}' po {elapsed:.2f} s (limit Discorda: 3 s).")
+
+    async def dispatch(self, interaction: disnake.MessageInteraction, *, from_view: bool = False) -> bool:
+        custom_id = interaction.data.custom_id
+        if not custom_id: return False
+        payload = decode_custom_id(custom_id)
+        if payload is None: return False
+        route = self._routes.get(payload.action)
+        if route is None:
+            self.unknown_actions += 1
+            return False
+        if route.view_only and not from_view and not payload.legacy:
+            return False
+        started = time.perf_counter()
+        if route.defer:
+            # Odpowiedzi i followupy interakcji idą przez webhook interakcji (własne limity, bez
+            # HTTPClient.request), więc omijają kolejki RestScheduler - rest_priority() ich nie dotyczy
+            await interaction.response.defer(ephemeral=route.ephemeral)
+            self._record_first_response(payload.action, interaction)
+        if route.requires_party_id and payload.party_id is None:
+            await interaction.send("Błąd wewnętrzny przycisku (ID party).", ephemeral=True)
+            return True
+        try:
+            # Użytkownik czeka na followup - wywołania REST handlera mają pierwszeństwo przed pracą w tle
+            with rest_priority(RestPriority.INTERACTION):
+                await route.handler(interaction, payload)
+        finally:
+            handler_elapsed = time.perf_counter() - started
+            self.latency.record(f"interaction_handler:{payload.action}", handler_elapsed)
+            if self._interaction_seconds is not None:
+                self._interaction_seconds.observe(handler_elapsed, payload.action, "handler")
+            if not route.defer and interaction.response.is_done():
+                # Handler sam udzielił pierwszej odpowiedzi (np. otworzył modal)
+                self._record_first_response(payload.action, interaction)
+        return True
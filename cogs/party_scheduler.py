@@ -0,0 +1,128 @@
+# party_bot/cogs/party_scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Hashable
+
+
+class DeadlineScheduler:
+    """Harmonogram terminów oparty na kopcu (heapq).
+
+    Każdy termin ma klucz (np. ("expiry", party_id)); ponowne `schedule()` dla tego samego
+    klucza zastępuje poprzedni termin, a `cancel()` go usuwa. Nieaktualne wpisy zostają
+    w kopcu i są pomijane przy zdejmowaniu (leniwe usuwanie). Zadanie w tle śpi do
+    najbliższego terminu i przekazuje do `on_due` listę kluczy, które już minęły,
+    więc koszt jednego przebiegu to O(liczba wymagalnych terminów * log n). Każda paczka
+    terminów jest obsługiwana we własnym zadaniu - wolna paczka (np. czekająca na skrzynkę
+    party albo REST) nie opóźnia kolejnych terminów.
+    """
+
+    def __init__(self, on_due: Callable[[list], Awaitable[None]], clock: Callable[[], float] = time.time,
+                 batch_observer: Callable[[int, float], None] | None = None):
+        self._on_due = on_due
+        self._batch_observer = batch_observer
+        self._clock = clock
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._deadlines: dict[Hashable, float] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._batches: set[asyncio.Task] = set()
+        self.last_batch_size = 0
+        self.last_batch_duration = 0.0
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key) -> bool:
+        return key in self._deadlines
+
+    def deadline_of(self, key) -> float | None:
+        return self._deadlines.get(key)
+
+    def overdue(self, now: float | None = None) -> tuple[int, float]:
+        """(liczba terminów, które już minęły, a nie zostały obsłużone; opóźnienie najstarszego w s)."""
+        now = self._clock() if now is None else now
+        overdue = [when for when in self._deadlines.values() if when <= now]
+        return len(overdue), (now - min(overdue)) if overdue else 0.0
+
+    def schedule(self, key: Hashable, when: float):
+        if self._deadlines.get(key) == when:
+            return
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._rebuild_heap()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def _rebuild_heap(self):
+        self._heap = [(when, next(self._counter), key) for key, when in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def _drop_stale_top(self):
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: float) -> list:
+        due = []
+        self._drop_stale_top()
+        while self._heap and self._heap[0][0] <= now:
+            when, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == when:
+                del self._deadlines[key]
+                due.append(key)
+            self._drop_stale_top()
+        return due
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for batch in self._batches:
+            batch.cancel()
+
+    @property
+    def running_batches(self) -> int:
+        return len(self._batches)
+
+    async def _handle_batch(self, due: list):
+        started = time.perf_counter()
+        try:
+            await self._on_due(due)
+        except Exception as e:
+            print(f"BŁĄD HARMONOGRAMU: Obsługa {len(due)} terminów nie powiodła się: {e}")
+        self.last_batch_size = len(due)
+        self.last_batch_duration = time.perf_counter() - started
+        if self._batch_observer is not None:
+            self._batch_observer(self.last_batch_size, self.last_batch_duration)
+
+    async def _run(self):
+        while True:
+            self._drop_stale_top()
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - self._clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = self.pop_due(self._clock())
+            if not due:
+                continue
+            batch = asyncio.get_running_loop().create_task(self._handle_batch(due))
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
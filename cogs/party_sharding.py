@@ -0,0 +1,240 @@
+# party_bot/cogs/party_sharding.py
+
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from cogs.party_persistence import BufferedPartyStore
+
+
+def shard_id_for_guild(guild_id: int, shard_count: int) -> int:
+    """Ten sam wzór, którego używa Discord do przypisania gildii do sharda."""
+    return (guild_id >> 22) % shard_count
+
+
+def shard_file_path(path: str, shard_id: int) -> str:
+    """party_data.json -> party_data.shard3.json (osobne pliki danych dla każdego sharda)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard_id}{ext}"
+
+
+class ShardLayout:
+    """Liczba shardów i shardy obsługiwane przez ten proces (None = wszystkie)."""
+
+    def __init__(self, shard_count: int, shard_ids: list[int] | None = None):
+        if shard_count < 1:
+            raise ValueError(f"SHARD_COUNT musi być dodatnie, a jest {shard_count}.")
+        self.shard_count = shard_count
+        self.shard_ids = sorted(shard_ids) if shard_ids is not None else list(range(shard_count))
+        invalid = [shard_id for shard_id in self.shard_ids if not 0 <= shard_id < shard_count]
+        if invalid:
+            raise ValueError(f"SHARD_IDS {invalid} spoza zakresu 0..{shard_count - 1}.")
+        self._owned = frozenset(self.shard_ids)
+
+    def __repr__(self):
+        return f"ShardLayout(shard_count={self.shard_count}, shard_ids={self.shard_ids})"
+
+    def shard_of(self, guild_id: int) -> int:
+        return shard_id_for_guild(guild_id, self.shard_count)
+
+    def owns(self, guild_id: int) -> bool:
+        return self.shard_of(guild_id) in self._owned
+
+
+class ShardedPartyStore:
+    """Magazyn danych party podzielony na shardy: osobny magazyn (JSON albo SQLite) na każdy shard.
+
+    Zmiany z PartyRegistry trafiają do magazynu sharda gildii party, a przy starcie każdy
+    obsługiwany shard wczytuje się równolegle, we własnym wątku. Proces ładuje tylko
+    swoje shardy, więc jego rejestr i harmonogram terminów obejmują wyłącznie ich gildie.
+    """
+
+    def __init__(self, layout: ShardLayout, create_store: Callable[[int], BufferedPartyStore]):
+        self.layout = layout
+        self.stores = {shard_id: create_store(shard_id) for shard_id in layout.shard_ids}
+        self._party_shard: dict[int, int] = {}
+
+    def exists(self) -> bool:
+        return any(store.exists() for store in self.stores.values())
+
+    def _load_shard(self, shard_id: int) -> dict:
+        store = self.stores[shard_id]
+        return store.load() if store.exists() else {}
+
+    def load(self) -> dict:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.stores), thread_name_prefix="party-shard-load") as executor:
+            loaded = dict(zip(self.stores, executor.map(self._load_shard, self.stores)))
+        parties = {}
+        for shard_id, shard_parties in loaded.items():
+            for party_id, party_data in shard_parties.items():
+                home_shard = self.layout.shard_of(party_data.get("guild_id") or 0)
+                if home_shard != shard_id:
+                    # Dane z innym SHARD_COUNT - przenosimy party, jeśli jego shard jest nasz
+                    if home_shard not in self.stores:
+                        print(f"WARN: Party {party_id} z pliku sharda {shard_id} należy do sharda {home_shard}, "
+                              f"którego ten proces nie obsługuje - pomijam.")
+                        continue
+                    self.stores[shard_id].append({"op": "disband", "party_id": party_id})
+                    self.stores[home_shard].append({"op": "create", "party_id": party_id, "data": party_data})
+                self._party_shard[party_id] = home_shard
+                parties[party_id] = party_data
+        print(f"INFO: Wczytano {len(parties)} party z {len(self.stores)} shardów "
+              f"w {time.perf_counter() - started:.2f} s.")
+        return parties
+
+    def append(self, record: dict):
+        party_id = record["party_id"]
+        if record["op"] == "create":
+            shard_id = self._party_shard[party_id] = self.layout.shard_of(record["data"]["guild_id"])
+        else:
+            shard_id = self._party_shard.get(party_id)
+        if shard_id is None:
+            print(f"WARN: Zmiana '{record['op']}' dla party {party_id} spoza obsługiwanych shardów - pomijam.")
+            return
+        self.stores[shard_id].append(record)
+        if record["op"] == "disband":
+            self._party_shard.pop(party_id, None)
+
+    @property
+    def batch_observer(self):
+        return next(iter(self.stores.values())).batch_observer
+
+    @batch_observer.setter
+    def batch_observer(self, observer):
+        for store in self.stores.values():
+            store.batch_observer = observer
+
+    def schedule_flush(self):
+        for store in self.stores.values():
+            store.schedule_flush()
+
+    async def commit(self) -> bool:
+        results = await asyncio.gather(*(store.commit() for store in self.stores.values()))
+        return all(results)
+
+    def flush_sync(self, compact: bool = True):
+        for store in self.stores.values():
+            store.flush_sync(compact=compact)
+
+
+class PartyLeaderDirectory:
+    """Wspólny dla wszystkich shardów (i procesów) katalog liderów: leader_id -> party.
+
+    Zasada "jeden lider = jedno party" obejmuje wszystkie gildie, a rejestr procesu zna tylko
+    party swoich shardów. Katalog to mała baza SQLite; `claim()` rezerwuje lidera atomowo
+    (PRIMARY KEY), zanim powstaną kanały party. Zapytania idą przez osobny wątek.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="party-leaders")
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS leaders (leader_id INTEGER PRIMARY KEY, party_id INTEGER, "
+                         "shard_id INTEGER NOT NULL, claimed_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS leaders_party_id ON leaders (party_id)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _claim_sync(self, leader_id: int, shard_id: int) -> bool:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO leaders (leader_id, party_id, shard_id, claimed_at) "
+                                  "VALUES (?, NULL, ?, ?)", (leader_id, shard_id, time.time()))
+        return cursor.rowcount == 1
+
+    async def claim(self, leader_id: int, shard_id: int) -> bool:
+        """Rezerwuje lidera dla nowego party; False, jeśli prowadzi już party (w dowolnym shardzie)."""
+        try:
+            return await self._run(self._claim_sync, leader_id, shard_id)
+        except sqlite3.Error as e:
+            # Bez katalogu nie da się sprawdzić zasady "jeden lider = jedno party" - nie tworzymy party
+            print(f"BŁĄD: Katalog liderów party niedostępny ({e}). Odmawiam utworzenia party dla {leader_id}.")
+            return False
+
+    def _assign_sync(self, leader_id: int, party_id: int):
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE leaders SET party_id = ? WHERE leader_id = ?", (party_id, leader_id))
+
+    async def assign(self, leader_id: int, party_id: int):
+        try:
+            await self._run(self._assign_sync, leader_id, party_id)
+        except sqlite3.Error as e:
+            print(f"BŁĄD: Nie udało się zapisać party {party_id} lidera {leader_id} w katalogu liderów: {e}")
+
+    def _release_sync(self, leader_id: int, party_id: int | None):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM leaders WHERE leader_id = ? AND party_id IS ?", (leader_id, party_id))
+
+    async def release(self, leader_id: int, party_id: int | None):
+        """Zwalnia lidera (party rozwiązane albo nieudane tworzenie - wtedy party_id=None)."""
+        try:
+            await self._run(self._release_sync, leader_id, party_id)
+        except sqlite3.Error as e:
+            print(f"BŁĄD: Nie udało się zwolnić lidera {leader_id} (party {party_id}) w katalogu liderów: {e}")
+
+    def _party_of_sync(self, leader_id: int):
+        return self._connection().execute("SELECT party_id, shard_id FROM leaders WHERE leader_id = ?",
+                                          (leader_id,)).fetchone()
+
+    async def leads_party(self, leader_id: int) -> bool:
+        try:
+            return await self._run(self._party_of_sync, leader_id) is not None
+        except sqlite3.Error as e:
+            print(f"BŁĄD: Odczyt katalogu liderów party nie powiódł się: {e}")
+            return False
+
+    def _shard_of_party_sync(self, party_id: int):
+        row = self._connection().execute("SELECT shard_id FROM leaders WHERE party_id = ?", (party_id,)).fetchone()
+        return row[0] if row else None
+
+    async def shard_of_leader(self, leader_id: int) -> int | None:
+        """Shard party prowadzonego przez lidera (None, gdy nie prowadzi żadnego)."""
+        try:
+            row = await self._run(self._party_of_sync, leader_id)
+        except sqlite3.Error as e:
+            print(f"BŁĄD: Odczyt katalogu liderów party nie powiódł się: {e}")
+            return None
+        return row[1] if row else None
+
+    async def shard_of_party(self, party_id: int) -> int | None:
+        try:
+            return await self._run(self._shard_of_party_sync, party_id)
+        except sqlite3.Error as e:
+            print(f"BŁĄD: Odczyt katalogu liderów party nie powiódł się: {e}")
+            return None
+
+    def _sync_shards_sync(self, shard_ids: list[int], leaders: dict[int, tuple[int, int]]):
+        conn = self._connection()
+        with conn:
+            conn.executemany("DELETE FROM leaders WHERE shard_id = ?", [(shard_id,) for shard_id in shard_ids])
+            conn.executemany("INSERT OR REPLACE INTO leaders (leader_id, party_id, shard_id, claimed_at) "
+                             "VALUES (?, ?, ?, ?)",
+                             [(leader_id, party_id, shard_id, time.time())
+                              for leader_id, (party_id, shard_id) in leaders.items()])
+
+    def sync_shards(self, shard_ids: list[int], leaders: dict[int, tuple[int, int]]):
+        """Przy starcie: wpisy obsługiwanych shardów odtwarzamy z wczytanych danych (leader -> (party, shard))."""
+        self._executor.submit(self._sync_shards_sync, shard_ids, leaders).result()
+
+    def close(self):
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(_close).result()
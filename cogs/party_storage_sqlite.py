@@ -0,0 +1,244 @@
+# party_bot/cogs/party_storage_sqlite.py
+
+# Alternatywny magazyn danych party w SQLite (PARTY_STORAGE_BACKEND = "sqlite" w config.py).
+# Jednorazowa migracja z dotychczasowego pliku JSON (snapshot + dziennik):
+#     python -m cogs.party_storage_sqlite
+
+import os
+import sqlite3
+
+from cogs.party_persistence import BufferedPartyStore, PartyJournal, PARTY_SCALAR_FIELDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parties (
+    party_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    leader_id INTEGER,
+    party_name TEXT,
+    game_name TEXT,
+    emblem_message_id INTEGER,
+    category_id INTEGER,
+    settings_channel_id INTEGER,
+    settings_embed_message_id INTEGER,
+    text_channel_id INTEGER,
+    voice_channel_id INTEGER,
+    voice_channel_id_2 INTEGER,
+    expiry_timestamp REAL,
+    next_reminder_timestamp REAL,
+    reminder_sent_for_current_cycle INTEGER NOT NULL DEFAULT 0,
+    leader_panel_dm_id INTEGER,
+    extension_reminder_dm_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_parties_leader ON parties(leader_id);
+CREATE INDEX IF NOT EXISTS idx_parties_guild ON parties(guild_id);
+CREATE INDEX IF NOT EXISTS idx_parties_expiry ON parties(expiry_timestamp);
+
+CREATE TABLE IF NOT EXISTS members (
+    party_id INTEGER NOT NULL REFERENCES parties(party_id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (party_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_members_user ON members(user_id);
+
+CREATE TABLE IF NOT EXISTS pending_join_requests (
+    party_id INTEGER NOT NULL REFERENCES parties(party_id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (party_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pending_user ON pending_join_requests(user_id);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    party_id INTEGER PRIMARY KEY REFERENCES parties(party_id) ON DELETE CASCADE,
+    reply_due_ts REAL NOT NULL,
+    leader_dm_channel_id INTEGER,
+    reminder_message_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders(reply_due_ts);
+"""
+
+
+class SqlitePartyStore(BufferedPartyStore):
+    """Magazyn danych party w SQLite (tryb WAL).
+
+    Połączenie żyje wyłącznie w dedykowanym wątku magazynu - wszystkie zapytania, także
+    odczyt przy starcie, idą przez ten wątek, więc pętla zdarzeń nigdy nie czeka na dysk.
+    Zmiany z PartyRegistry są zapisywane partiami, jedna transakcja na partię.
+    """
+
+    def __init__(self, db_path: str, flush_interval_seconds: float):
+        super().__init__(flush_interval_seconds, "party-sqlite")
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._party_columns: list[str] = []
+
+    # --- Połączenie (tylko w wątku magazynu) ---
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            existing_columns = [row[1] for row in conn.execute("PRAGMA table_info(parties)")]
+            for field in PARTY_SCALAR_FIELDS:
+                if field not in existing_columns:
+                    conn.execute(f"ALTER TABLE parties ADD COLUMN {field}")
+                    existing_columns.append(field)
+            pending_columns = [row[1] for row in conn.execute("PRAGMA table_info(pending_join_requests)")]
+            if "expires_at" not in pending_columns:
+                conn.execute("ALTER TABLE pending_join_requests ADD COLUMN expires_at REAL")
+            conn.commit()
+            self._party_columns = [c for c in existing_columns if c != "party_id"]
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn, *args):
+        return self._executor.submit(fn, *args).result()
+
+    def close(self):
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._run(_close)
+
+    # --- Odczyt ---
+    def exists(self) -> bool:
+        return os.path.exists(self.db_path) and self._run(self._count_parties_sync) > 0
+
+    def _count_parties_sync(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM parties").fetchone()[0]
+
+    def load(self) -> dict:
+        return self._run(self._load_sync)
+
+    def _load_sync(self) -> dict:
+        conn = self._connection()
+        columns = self._party_columns
+        parties = {}
+        for row in conn.execute(f"SELECT party_id, {', '.join(columns)} FROM parties"):
+            party_data = dict(zip(columns, row[1:]))
+            party_data["reminder_sent_for_current_cycle"] = bool(party_data.get("reminder_sent_for_current_cycle"))
+            party_data["member_ids"] = []
+            party_data["pending_join_requests"] = []
+            party_data["pending_join_deadlines"] = {}
+            party_data["extension_reply"] = None
+            parties[row[0]] = party_data
+        for party_id, user_id in conn.execute("SELECT party_id, user_id FROM members ORDER BY rowid"):
+            if party_id in parties: parties[party_id]["member_ids"].append(user_id)
+        for party_id, user_id, expires_at in conn.execute(
+                "SELECT party_id, user_id, expires_at FROM pending_join_requests ORDER BY rowid"):
+            if party_id not in parties: continue
+            parties[party_id]["pending_join_requests"].append(user_id)
+            if expires_at is not None:
+                parties[party_id]["pending_join_deadlines"][str(user_id)] = expires_at
+        for party_id, reply_due_ts, leader_dm_channel_id, reminder_message_id in conn.execute(
+                "SELECT party_id, reply_due_ts, leader_dm_channel_id, reminder_message_id FROM reminders"):
+            if party_id in parties:
+                parties[party_id]["extension_reply"] = {"reply_due_ts": reply_due_ts,
+                                                        "leader_dm_channel_id": leader_dm_channel_id,
+                                                        "reminder_message_id": reminder_message_id}
+        return parties
+
+    # --- Zapis ---
+    def _insert_party_sync(self, conn: sqlite3.Connection, party_id: int, party_data: dict):
+        columns = self._party_columns
+        conn.execute(
+            f"INSERT OR REPLACE INTO parties (party_id, {', '.join(columns)}) "
+            f"VALUES (?{', ?' * len(columns)})",
+            [party_id] + [party_data.get(c) for c in columns])
+        conn.execute("DELETE FROM members WHERE party_id = ?", (party_id,))
+        conn.executemany("INSERT OR IGNORE INTO members (party_id, user_id) VALUES (?, ?)",
+                         [(party_id, uid) for uid in party_data.get("member_ids", [])])
+        conn.execute("DELETE FROM pending_join_requests WHERE party_id = ?", (party_id,))
+        join_deadlines = party_data.get("pending_join_deadlines") or {}
+        conn.executemany("INSERT OR IGNORE INTO pending_join_requests (party_id, user_id, expires_at) VALUES (?, ?, ?)",
+                         [(party_id, uid, join_deadlines.get(str(uid)))
+                          for uid in party_data.get("pending_join_requests", [])])
+        self._set_extension_reply_sync(conn, party_id, party_data.get("extension_reply"))
+
+    @staticmethod
+    def _set_extension_reply_sync(conn: sqlite3.Connection, party_id: int, reply_info: dict | None):
+        if reply_info:
+            conn.execute(
+                "INSERT OR REPLACE INTO reminders (party_id, reply_due_ts, leader_dm_channel_id, reminder_message_id) "
+                "VALUES (?, ?, ?, ?)",
+                (party_id, reply_info["reply_due_ts"], reply_info.get("leader_dm_channel_id"),
+                 reply_info.get("reminder_message_id")))
+        else:
+            conn.execute("DELETE FROM reminders WHERE party_id = ?", (party_id,))
+
+    def _apply_record_sync(self, conn: sqlite3.Connection, record: dict):
+        op = record["op"]
+        party_id = record["party_id"]
+        if op == "create":
+            self._insert_party_sync(conn, party_id, record["data"])
+        elif op == "disband":
+            conn.execute("DELETE FROM parties WHERE party_id = ?", (party_id,))
+        elif op == "member_add":
+            conn.execute("INSERT OR IGNORE INTO members (party_id, user_id) VALUES (?, ?)", (party_id, record["user_id"]))
+        elif op == "member_remove":
+            conn.execute("DELETE FROM members WHERE party_id = ? AND user_id = ?", (party_id, record["user_id"]))
+        elif op == "pending_add":
+            conn.execute("INSERT OR IGNORE INTO pending_join_requests (party_id, user_id, expires_at) VALUES (?, ?, ?)",
+                         (party_id, record["user_id"], record.get("expires_at")))
+        elif op == "pending_remove":
+            conn.execute("DELETE FROM pending_join_requests WHERE party_id = ? AND user_id = ?",
+                         (party_id, record["user_id"]))
+        elif op == "rename":
+            conn.execute("UPDATE parties SET party_name = ? WHERE party_id = ?", (record["party_name"], party_id))
+        elif op in ("extend", "update"):
+            if "extension_reply" in record["fields"]:
+                self._set_extension_reply_sync(conn, party_id, record["fields"]["extension_reply"])
+            fields = {k: v for k, v in record["fields"].items() if k in self._party_columns}
+            unknown_fields = set(record["fields"]) - set(fields) - {"extension_reply"}
+            if unknown_fields:
+                print(f"WARN: Pominięto nieznane pola party w SQLite: {sorted(unknown_fields)}")
+            if fields:
+                assignments = ", ".join(f"{k} = ?" for k in fields)
+                conn.execute(f"UPDATE parties SET {assignments} WHERE party_id = ?", [*fields.values(), party_id])
+        else:
+            print(f"WARN: Nieznany typ zmiany party dla SQLite: {op}")
+
+    def _write_batch_sync(self, records: list[dict]):
+        conn = self._connection()
+        with conn:
+            for record in records:
+                self._apply_record_sync(conn, record)
+
+    def _flush_sync_extra(self, compact: bool):
+        if compact:
+            self._run(lambda: self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    def import_parties(self, parties: dict):
+        """Wstawia komplet party w jednej transakcji (migracja)."""
+        def _import():
+            conn = self._connection()
+            with conn:
+                for party_id, party_data in parties.items():
+                    self._insert_party_sync(conn, party_id, party_data)
+        self._run(_import)
+
+
+def migrate_json_to_sqlite(snapshot_path: str, journal_path: str, db_path: str) -> int:
+    """Jednorazowa migracja: odtwarza stan z pliku JSON (+ dziennika) i zapisuje go do bazy SQLite."""
+    parties = PartyJournal(snapshot_path, journal_path, dict, 0, 1 << 62).load()
+    store = SqlitePartyStore(db_path, 0)
+    try:
+        if store.exists():
+            print(f"BŁĄD: Baza {db_path} zawiera już dane party - migracja przerwana, nic nie zmieniono.")
+            return 0
+        store.import_parties(parties)
+    finally:
+        store.close()
+    print(f"INFO: Zmigrowano {len(parties)} party z {snapshot_path} do {db_path}.")
+    return len(parties)
+
+
+if __name__ == "__main__":
+    import config
+    from cogs.party_manager import PARTY_JOURNAL_FILE, PARTY_SQLITE_FILE
+
+    migrate_json_to_sqlite(config.PARTY_DATA_FILE, PARTY_JOURNAL_FILE, PARTY_SQLITE_FILE)
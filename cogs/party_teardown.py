@@ -0,0 +1,127 @@
+# party_bot/cogs/party_teardown.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import disnake
+
+# run_limited(scope_id, stage, coro) - ogranicza równoległe wywołania per gildia i mierzy czas (PartyProvisioner)
+RunLimited = Callable[[int, str, Awaitable], Awaitable]
+
+
+class PartyTeardown:
+    """Równoległe usuwanie kanałów i wiadomości rozwiązywanych party.
+
+    Kanały jednego party są usuwane jednocześnie (limit per gildia z `run_limited`), a naraz
+    sprząta się najwyżej `max_parallel_parties` party. `scope_id` to ID gildii, a dla wiadomości
+    w DM - ID kanału DM. NotFound oznacza, że obiektu już nie ma, i jest traktowane jak sukces.
+    Pozostałe HTTPException nie są połykane: nieudane usunięcie trafia do `failures`
+    i `schedule_retry(key, when)` planuje ponowienie z rosnącym odstępem, aż do `max_attempts` prób.
+    Forbidden to porażka trwała: jest liczona i nie jest ponawiana. `delete_tree()` usuwa kategorię
+    dopiero po jej kanałach - gdy któryś czeka na ponowienie, kategoria czeka razem z nim.
+
+    Ponowienia są trzymane tylko w pamięci. Po restarcie kanały i emblematy, których nie udało się
+    usunąć, znajdzie kolektor osieroconych obiektów; panele lidera w DM zostają.
+    """
+
+    def __init__(self, run_limited: RunLimited, max_parallel_parties: int,
+                 schedule_retry: Callable[[tuple, float], None], retry_delay_seconds: float, max_attempts: int = 5):
+        self._run_limited = run_limited
+        self.party_slots = asyncio.Semaphore(max_parallel_parties)
+        self._schedule_retry = schedule_retry
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_attempts = max_attempts
+        self.failures: dict[tuple, dict] = {}
+        # Usunięcia wstrzymane do czasu usunięcia innych obiektów: klucz -> dane usunięcia + "waiting" (klucze)
+        self.blocked: dict[tuple, dict] = {}
+        self.deleted = 0
+        self.failed = 0
+        self.abandoned = 0
+        self.forbidden = 0
+
+    @staticmethod
+    def _key(target) -> tuple:
+        return type(target).__name__, target.id
+
+    async def _delete_once(self, scope_id: int, target, reason: str | None) -> bool:
+        stage = "teardown_channel" if isinstance(target, disnake.abc.GuildChannel) else "teardown_message"
+        try:
+            coro = target.delete(reason=reason) if reason is not None else target.delete()
+            await self._run_limited(scope_id, stage, coro)
+        except disnake.NotFound:
+            pass
+        self.deleted += 1
+        return True
+
+    async def delete(self, scope_id: int, target, reason: str = None, attempt: int = 1) -> bool:
+        """Usuwa kanał albo wiadomość; przy błędzie zapisuje próbę do ponowienia i zwraca False."""
+        key = self._key(target)
+        try:
+            await self._delete_once(scope_id, target, reason)
+            self.failures.pop(key, None)
+            return True
+        except disnake.Forbidden as e:
+            # Ponowienie nic nie da - porażka trwała (także gdy przyszła przy ponowieniu)
+            self.failed += 1
+            self.forbidden += 1
+            self.failures.pop(key, None)
+            print(f"BŁĄD: Brak uprawnień do usunięcia {key[0]} {target.id} (zakres {scope_id}): {e}")
+        except disnake.HTTPException as e:
+            self.failed += 1
+            if attempt >= self.max_attempts:
+                self.failures.pop(key, None)
+                self.abandoned += 1
+                print(f"BŁĄD: Porzucono usuwanie {key[0]} {target.id} po {attempt} próbach: {e}")
+                return False
+            self.failures[key] = {"scope_id": scope_id, "target": target, "reason": reason, "attempt": attempt,
+                                  "error": str(e)}
+            self._schedule_retry(key, time.time() + self.retry_delay_seconds * attempt)
+            print(f"WARN: Usunięcie {key[0]} {target.id} nie powiodło się ({e}), ponowię (próba {attempt}).")
+        return False
+
+    async def delete_all(self, scope_id: int, targets: list, reason: str = None) -> bool:
+        results = await asyncio.gather(*(self.delete(scope_id, target, reason) for target in targets))
+        return all(results)
+
+    async def delete_tree(self, scope_id: int, children: list, parent, reason: str = None) -> bool:
+        """Usuwa kanały, a potem ich kategorię. Kategoria nie znika przed kanałami, które czekają na ponowienie."""
+        results = await asyncio.gather(*(self.delete(scope_id, child, reason) for child in children))
+        if all(results):
+            return await self.delete(scope_id, parent, reason)
+        waiting = {self._key(child) for child, deleted in zip(children, results) if not deleted}
+        if not waiting <= self.failures.keys():
+            # Części kanałów nie da się usunąć - kategoria zostaje razem z nimi (sprzątnie ją kolektor osieroconych)
+            print(f"WARN: Kategoria {parent.id} zostaje - nie wszystkie jej kanały dało się usunąć (zakres {scope_id}).")
+            return False
+        self.blocked[self._key(parent)] = {"scope_id": scope_id, "target": parent, "reason": reason,
+                                           "waiting": waiting}
+        return False
+
+    async def retry(self, key: tuple) -> bool:
+        failure = self.failures.get(key)
+        if failure is None:
+            return True
+        result = await self.delete(failure["scope_id"], failure["target"], failure["reason"], failure["attempt"] + 1)
+        if key not in self.failures:
+            await self._release_blocked(key, result)
+        return result
+
+    async def _release_blocked(self, key: tuple, deleted: bool):
+        """Ponowienie `key` się rozstrzygnęło: zwalnia albo porzuca usunięcia, które na nie czekały."""
+        for blocked_key, blocked in list(self.blocked.items()):
+            if key not in blocked["waiting"]:
+                continue
+            if not deleted:
+                del self.blocked[blocked_key]
+                print(f"WARN: Porzucono usunięcie {blocked_key[0]} {blocked_key[1]} - "
+                      f"nie udało się usunąć {key[0]} {key[1]}.")
+                continue
+            blocked["waiting"].discard(key)
+            if not blocked["waiting"]:
+                del self.blocked[blocked_key]
+                await self.delete(blocked["scope_id"], blocked["target"], blocked["reason"])
+
+    def stats(self) -> dict:
+        return {"deleted": self.deleted, "failed": self.failed, "abandoned": self.abandoned,
+                "forbidden": self.forbidden, "pending_retries": len(self.failures), "blocked": len(self.blocked)}
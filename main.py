@@ -2,7 +2,10 @@
 
 import disnake
 from disnake.ext import commands
+
+from cogs.party_cluster import shard_ids_from_env
 import os
+import sys
 import traceback
 
 try:
@@ -19,18 +22,32 @@ intents_config.reactions = True
 intents_config.message_content = True
 intents_config.members = True
 
-bot = commands.Bot(command_prefix=config.DEFAULT_COMMAND_PREFIX, intents=intents_config)
+# SHARD_COUNT w config.py włącza AutoShardedBot; SHARD_IDS wybiera shardy obsługiwane przez ten proces
+# (w klastrze uruchamianym przez cluster.py shardy procesu przychodzą w zmiennej środowiskowej).
+SHARD_COUNT = getattr(config, "SHARD_COUNT", None)
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix=config.DEFAULT_COMMAND_PREFIX, intents=intents_config,
+                                  shard_count=SHARD_COUNT,
+                                  shard_ids=shard_ids_from_env() or getattr(config, "SHARD_IDS", None))
+else:
+    bot = commands.Bot(command_prefix=config.DEFAULT_COMMAND_PREFIX, intents=intents_config)
 
 @bot.event
 async def on_ready():
     print(f'Zalogowano jako {bot.user.name} (ID: {bot.user.id})')
     print(f"Bot połączony z {len(bot.guilds)} serwerami.")
+    if SHARD_COUNT:
+        print(f"Shardy tego procesu: {sorted(bot.shards)} z {bot.shard_count}.")
     print(f"Prefix komend: {config.DEFAULT_COMMAND_PREFIX}")
     activity = disnake.Activity(type=disnake.ActivityType.watching, name="aktywnosc party!")
     await bot.change_presence(activity=activity)
     print("Bot jest gotowy do działania.")
     print("------")
 
+@bot.event
+async def on_shard_ready(shard_id: int):
+    print(f"INFO: Shard {shard_id} gotowy.")
+
 # --- NOWE, POPRAWIONE ŁADOWANIE COGÓW ---
 # Ładujemy tylko konkretny Cog, a nie wszystko z katalogu
 COGS_TO_LOAD = [
@@ -62,3 +79,7 @@ if __name__ == "__main__":
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
     else:
         bot.run(config.BOT_TOKEN)
+        # Po zamknięciu bota zapisujemy zmiany party, które jeszcze czekały na zapis w tle
+        party_manager_module = sys.modules.get('cogs.party_manager')
+        if party_manager_module:
+            party_manager_module.flush_party_data_sync()